@@ -0,0 +1,5 @@
+import time
+
+# Taken when the package is first imported, before app.main pulls in FastAPI
+# and the routers; /health/ready reports the difference as app_import_seconds.
+IMPORT_STARTED = time.perf_counter()
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import AsyncIterator, Deque, Dict, Optional
+
+from .config import settings
+
+# Peak working-set bytes per uploaded byte. Zipped formats (xlsx, bundles,
+# parquet) expand far more than plain CSV once loaded into DataFrames.
+MEMORY_FACTORS = {
+    ".xlsx": 12.0,
+    ".xlsm": 12.0,
+    ".zip": 12.0,
+    ".parquet": 8.0,
+    ".csv": 4.0,
+}
+DEFAULT_MEMORY_FACTOR = 8.0
+BASE_MEMORY_BYTES = 64 * 1024 * 1024
+# A pickled incremental state unpickles to roughly its file size, and is
+# held next to the new tours merged into it.
+STATE_MEMORY_FACTOR = 2.0
+
+# Weight of the newest observation in the moving averages.
+_EWMA_ALPHA = 0.2
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when an analysis cannot be queued or waited too long for a slot."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    client_id: str
+    cost: int
+    enqueued_at: float
+    granted: asyncio.Future = field(repr=False)
+
+
+class AdmissionController:
+    """Admits analyses under a concurrency limit and a memory budget.
+
+    Each request is costed from its upload size (plus its base state for
+    incremental runs). It runs at once while
+    fewer than ``max_concurrent`` analyses are running and its cost fits
+    in the remaining budget. A request larger than the whole budget still
+    runs, but only alone. Everything else waits in per-client FIFO queues
+    that are served round-robin, so one client's burst cannot hold back
+    the others. The queue is bounded globally and per client. Requests
+    are rejected up front with a wait estimate (used for Retry-After)
+    instead of piling up until memory runs out. The dispatcher never skips
+    ahead of the next client's head, so large jobs are not starved by a
+    stream of small ones.
+
+    All state lives on the event loop, so no locking is needed. The limits
+    are per process; see ``get_admission_controller`` for multi-worker runs.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrent: int,
+        memory_budget_bytes: int,
+        max_queue: int,
+        max_client_queue: int,
+        queue_timeout_seconds: float,
+        workers: int = 1,
+    ) -> None:
+        self.max_concurrent = max(max_concurrent, 1)
+        self.workers = workers
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_queue = max_queue
+        self.max_client_queue = max_client_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._queued = 0
+        self._running = 0
+        self._memory_in_use = 0
+        self._service_seconds: Optional[float] = None
+        self._wait_seconds: Optional[float] = None
+        self._counters: Dict[str, int] = {
+            "admitted_total": 0,
+            "queued_total": 0,
+            "rejected_total": 0,
+            "timed_out_total": 0,
+            "completed_total": 0,
+        }
+
+    def estimate_cost(self, upload_bytes: int, suffix: str) -> int:
+        factor = MEMORY_FACTORS.get(suffix.lower(), DEFAULT_MEMORY_FACTOR)
+        return BASE_MEMORY_BYTES + int(upload_bytes * factor)
+
+    def estimate_state_cost(self, state_bytes: int) -> int:
+        """Extra memory for continuing from a stored incremental state."""
+        return int(state_bytes * STATE_MEMORY_FACTOR)
+
+    def estimated_wait_seconds(self, ahead: Optional[int] = None) -> float:
+        """Expected wait for a request with ``ahead`` queued requests before it."""
+        if ahead is None:
+            ahead = self._queued
+        if self._running < self.max_concurrent and not ahead:
+            return 0.0
+        # Until a first analysis finishes, assume it takes the queue timeout / 4.
+        service = self._service_seconds or self.queue_timeout_seconds / 4
+        return math.ceil((ahead + 1) / self.max_concurrent) * service
+
+    @asynccontextmanager
+    async def slot(self, client_id: str, cost: int) -> AsyncIterator[None]:
+        await self.acquire(client_id, cost)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(cost, time.monotonic() - started)
+
+    async def acquire(self, client_id: str, cost: int) -> None:
+        now = time.monotonic()
+        if not self._queued and self._fits(cost):
+            self._grant(cost, waited=0.0)
+            return
+
+        client_queue = self._queues.get(client_id)
+        if self._queued >= self.max_queue:
+            self._reject("Analysis queue is full")
+        if client_queue is not None and len(client_queue) >= self.max_client_queue:
+            self._reject("Too many queued analyses for this client")
+        if self.estimated_wait_seconds() > self.queue_timeout_seconds:
+            self._reject("Estimated wait exceeds the queue timeout")
+
+        ticket = _Ticket(client_id, cost, now, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(client_id, deque()).append(ticket)
+        self._queued += 1
+        self._counters["queued_total"] += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.granted), self.queue_timeout_seconds)
+        except asyncio.TimeoutError:
+            if ticket.granted.done():
+                return
+            self._withdraw(ticket)
+            self._counters["timed_out_total"] += 1
+            self._reject("Timed out waiting for an analysis slot")
+        except asyncio.CancelledError:
+            # The client went away: give back a slot granted meanwhile.
+            if ticket.granted.done():
+                self.release(cost, 0.0, completed=False)
+            else:
+                self._withdraw(ticket)
+            raise
+
+    def release(self, cost: int, elapsed: float, *, completed: bool = True) -> None:
+        self._running -= 1
+        self._memory_in_use -= cost
+        if completed:
+            self._counters["completed_total"] += 1
+            self._service_seconds = _ewma(self._service_seconds, elapsed)
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "queued": self._queued,
+            "queued_clients": len(self._queues),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "memory_in_use_mb": round(self._memory_in_use / 2**20, 1),
+            "memory_budget_mb": round(self.memory_budget_bytes / 2**20, 1),
+            "avg_service_seconds": _rounded(self._service_seconds),
+            "avg_wait_seconds": _rounded(self._wait_seconds),
+            "estimated_wait_seconds": round(self.estimated_wait_seconds(), 2),
+            **self._counters,
+        }
+
+    def _fits(self, cost: int) -> bool:
+        if self._running >= self.max_concurrent:
+            return False
+        # An oversized request may still run, but only on an idle service.
+        return self._running == 0 or self._memory_in_use + cost <= self.memory_budget_bytes
+
+    def _grant(self, cost: int, *, waited: float) -> None:
+        self._running += 1
+        self._memory_in_use += cost
+        self._counters["admitted_total"] += 1
+        self._wait_seconds = _ewma(self._wait_seconds, waited)
+
+    def _dispatch(self) -> None:
+        while self._queues:
+            client_id, client_queue = next(iter(self._queues.items()))
+            ticket = client_queue[0]
+            if not self._fits(ticket.cost):
+                return
+            client_queue.popleft()
+            self._queued -= 1
+            if client_queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            self._grant(ticket.cost, waited=time.monotonic() - ticket.enqueued_at)
+            ticket.granted.set_result(None)
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        client_queue = self._queues.get(ticket.client_id)
+        if client_queue is None or ticket not in client_queue:
+            return
+        client_queue.remove(ticket)
+        self._queued -= 1
+        if not client_queue:
+            del self._queues[ticket.client_id]
+        # The withdrawn ticket may have been blocking the head of the rotation.
+        self._dispatch()
+
+    def _reject(self, message: str) -> None:
+        self._counters["rejected_total"] += 1
+        raise AdmissionRejected(message, retry_after=max(self.estimated_wait_seconds(), 1.0))
+
+
+def _ewma(previous: Optional[float], value: float) -> float:
+    return value if previous is None else (1 - _EWMA_ALPHA) * previous + _EWMA_ALPHA * value
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+@lru_cache()
+def get_admission_controller() -> AdmissionController:
+    # One controller per worker process, so each enforces its share of the
+    # service-wide limits. A request queues in the worker that accepted it.
+    workers = max(settings.web_concurrency, 1)
+    return AdmissionController(
+        max_concurrent=max(settings.admission_max_concurrent // workers, 1),
+        memory_budget_bytes=settings.admission_memory_budget_mb * 2**20 // workers,
+        max_queue=max(math.ceil(settings.admission_max_queue / workers), 1),
+        max_client_queue=max(math.ceil(settings.admission_client_queue / workers), 1),
+        queue_timeout_seconds=settings.admission_queue_timeout_seconds,
+        workers=workers,
+    )
@@ -0,0 +1,340 @@
+from __future__ import annotations
+
+import json
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from ..config import settings
+from ..services.types import ChargingRegime, ExportFormat, TrendResolution
+
+if TYPE_CHECKING:
+    from ..services.analysis_store import AnalysisStore
+
+router = APIRouter(prefix="/api/analyses", tags=["analyses"])
+
+# Handlers are sync, so the lazy service imports below run in the threadpool
+# rather than on the event loop.
+
+
+@router.get("")
+def list_analyses(
+    vehicleid: Optional[int] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+) -> List[Dict[str, object]]:
+    return _store().list(
+        vehicleid=vehicleid,
+        start_date=start_date,
+        end_date=end_date,
+        limit=limit,
+    )
+
+
+@router.get("/{analysis_id}")
+def get_analysis(analysis_id: str) -> Dict[str, object]:
+    with _analysis_errors():
+        return _store().get(analysis_id)
+
+
+@router.get("/{analysis_id}/trend")
+def get_trend(
+    analysis_id: str,
+    resolution: TrendResolution = "day",
+    max_points: Optional[int] = Query(None, ge=2),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+) -> Dict[str, object]:
+    from ..services.trend import downsample_lttb, trend_records
+
+    with _analysis_errors():
+        frame = _store().trend(
+            analysis_id,
+            resolution,
+            start_date=start_date,
+            end_date=end_date,
+        )
+    points = downsample_lttb(frame, max_points or settings.trend_max_points)
+    return {
+        "analysis_id": analysis_id,
+        "resolution": resolution,
+        "total_points": len(frame),
+        "trend": trend_records(points, resolution),
+    }
+
+
+@router.delete("/{analysis_id}", status_code=204)
+def delete_analysis(analysis_id: str) -> None:
+    from ..services.incremental import get_state_store
+    from ..services.tour_archive import get_tour_archive
+
+    with _analysis_errors():
+        _store().delete(analysis_id)
+    get_state_store().delete(analysis_id)
+    get_tour_archive().delete(analysis_id)
+
+
+@router.get("/{analysis_id}/diff/{other_id}")
+def diff_analyses(
+    analysis_id: str,
+    other_id: str,
+    changed_only: bool = True,
+) -> Dict[str, object]:
+    with _analysis_errors():
+        return _store().diff(analysis_id, other_id, changed_only=changed_only)
+
+
+@router.get("/{analysis_id}/vehicles/{vehicleid}/tours")
+def get_vehicle_tours(analysis_id: str, vehicleid: int) -> Dict[str, object]:
+    from ..services.tour_archive import ArchiveNotFoundError, daily_energy, get_tour_archive
+
+    with _analysis_errors():
+        summary = _store().summary(analysis_id)
+    archive = get_tour_archive()
+    try:
+        tours = archive.vehicle_tours(analysis_id, vehicleid)
+        exclude_outliers = archive.excludes_outliers(analysis_id)
+    except ArchiveNotFoundError as exc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No enriched tours retained for analysis {exc}",
+        ) from exc
+    if tours.empty:
+        raise HTTPException(status_code=404, detail=f"Vehicle {vehicleid} has no tours in this analysis")
+
+    days = daily_energy(
+        tours,
+        float(summary["energy_limit_kwh"]),
+        exclude_outliers=exclude_outliers,
+    )
+    tours["date"] = tours["date"].astype(str)
+    days["date"] = days["date"].astype(str)
+    return {
+        "analysis_id": analysis_id,
+        "vehicleid": vehicleid,
+        "energy_limit_kwh": summary["energy_limit_kwh"],
+        "tour_count": len(tours),
+        "tours": _records(tours),
+        "days": _records(days.round(2)),
+    }
+
+
+@router.get("/{analysis_id}/charging")
+def simulate_charging(
+    analysis_id: str,
+    battery_capacity_kwh: Optional[float] = Query(None, gt=0),
+    depot_charger_kw: Optional[float] = Query(None, ge=0),
+    opportunity_charger_kw: Optional[float] = Query(None, ge=0),
+    min_charge_gap_minutes: Optional[float] = Query(None, ge=0),
+) -> Dict[str, object]:
+    from ..services.soc_simulation import simulate_soc, summarise_simulation
+
+    tours, parameters = _charging_inputs(
+        analysis_id,
+        battery_capacity_kwh=battery_capacity_kwh,
+        depot_charger_kw=depot_charger_kw,
+        opportunity_charger_kw=opportunity_charger_kw,
+        min_charge_gap_minutes=min_charge_gap_minutes,
+    )
+    return {
+        "analysis_id": analysis_id,
+        **summarise_simulation(simulate_soc(tours, parameters), parameters),
+    }
+
+
+@router.get("/{analysis_id}/load-profile")
+def get_load_profile(
+    analysis_id: str,
+    resolution_minutes: Optional[int] = Query(None, ge=1),
+    regime: ChargingRegime = "depot",
+    battery_capacity_kwh: Optional[float] = Query(None, gt=0),
+    depot_charger_kw: Optional[float] = Query(None, ge=0),
+    opportunity_charger_kw: Optional[float] = Query(None, ge=0),
+    min_charge_gap_minutes: Optional[float] = Query(None, ge=0),
+) -> Dict[str, object]:
+    from ..services.load_profile import LoadProfileError, charging_sections
+
+    tours, parameters = _charging_inputs(
+        analysis_id,
+        battery_capacity_kwh=battery_capacity_kwh,
+        depot_charger_kw=depot_charger_kw,
+        opportunity_charger_kw=opportunity_charger_kw,
+        min_charge_gap_minutes=min_charge_gap_minutes,
+    )
+    try:
+        _, profile = charging_sections(
+            tours,
+            parameters,
+            resolution_minutes=resolution_minutes,
+            regime=regime,
+        )
+    except LoadProfileError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"analysis_id": analysis_id, "parameters": parameters.to_dict(), **profile}
+
+
+@router.get("/{analysis_id}/optimise")
+def optimise_fleet(
+    analysis_id: str,
+    budget: float = Query(..., ge=0),
+    frontier_points: int = Query(20, ge=2, le=200),
+    opportunity_surcharge: Optional[float] = Query(None, ge=0),
+) -> Dict[str, object]:
+    import pandas as pd
+
+    from ..services.excel_processor import TechnologyParameters
+    from ..services.fleet_optimizer import (
+        OptimisationError,
+        conversion_candidates,
+        conversion_capex,
+        optimise_conversions,
+    )
+
+    with _analysis_errors():
+        analysis = _store().get(analysis_id)
+    tco_parameters = {
+        key: TechnologyParameters.from_dict(values)
+        for key, values in analysis["tco_parameters"].items()
+    }
+    capex = conversion_capex(tco_parameters)
+
+    opportunity_feasible = None
+    simulation = analysis.get("charging_simulation")
+    if simulation:
+        opportunity_feasible = pd.Series(
+            {row["vehicleid"]: row["opportunity_feasible"] for row in simulation["vehicles"]}
+        )
+    candidates = conversion_candidates(
+        pd.DataFrame(analysis["vehicles"]),
+        capex,
+        opportunity_feasible=opportunity_feasible,
+        opportunity_surcharge=opportunity_surcharge,
+    )
+    try:
+        result = optimise_conversions(candidates, budget, frontier_points=frontier_points)
+    except OptimisationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"analysis_id": analysis_id, "capex_per_vehicle": round(capex, 2), **result}
+
+
+@router.get("/{analysis_id}/statistics")
+def get_statistics(
+    analysis_id: str,
+    k: Optional[int] = Query(None, ge=1, le=100),
+    bins: Optional[int] = Query(None, ge=1, le=200),
+) -> Dict[str, object]:
+    import pandas as pd
+
+    from ..services.statistics import distribution_summary, economy_extremes
+
+    with _analysis_errors():
+        analysis = _store().get(analysis_id)
+    vehicles = pd.DataFrame(analysis["vehicles"])
+    if vehicles.empty:
+        raise HTTPException(status_code=404, detail="Analysis has no vehicles")
+    return {
+        "analysis_id": analysis_id,
+        "economy_extremes": economy_extremes(vehicles, k or settings.statistics_top_k),
+        "distribution": distribution_summary(
+            vehicles,
+            bins or settings.statistics_histogram_bins,
+        ),
+    }
+
+
+@router.get("/{analysis_id}/export/vehicles")
+def export_vehicles(analysis_id: str, format: ExportFormat = "csv") -> StreamingResponse:
+    import pandas as pd
+
+    from ..services.analysis_store import VEHICLE_FIELDS
+    from ..services.export import iter_export
+
+    with _analysis_errors():
+        batches = _store().iter_vehicles(analysis_id, settings.export_batch_rows)
+    frames = (pd.DataFrame(rows, columns=VEHICLE_FIELDS) for rows in batches)
+    return _export_response(
+        iter_export(format, "vehicles", VEHICLE_FIELDS, frames),
+        format=format,
+        filename=f"analysis-{analysis_id}-vehicles",
+    )
+
+
+@router.get("/{analysis_id}/export/tours")
+def export_tours(analysis_id: str, format: ExportFormat = "csv") -> StreamingResponse:
+    from ..services.export import iter_export
+    from ..services.tour_archive import (
+        ENRICHED_TOUR_COLUMNS,
+        ArchiveNotFoundError,
+        get_tour_archive,
+    )
+
+    try:
+        batches = get_tour_archive().iter_batches(analysis_id, settings.export_batch_rows)
+    except ArchiveNotFoundError as exc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No enriched tours retained for analysis {exc}",
+        ) from exc
+    return _export_response(
+        iter_export(format, "tours", ENRICHED_TOUR_COLUMNS, batches),
+        format=format,
+        filename=f"analysis-{analysis_id}-tours",
+    )
+
+
+def _export_response(
+    body: Iterator[bytes],
+    *,
+    format: ExportFormat,
+    filename: str,
+) -> StreamingResponse:
+    from ..services.export import MEDIA_TYPES
+
+    # No Content-Length is known up front, so the body goes out chunked.
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+
+def _charging_inputs(analysis_id: str, **overrides: Optional[float]):
+    from ..services.soc_simulation import SIMULATION_COLUMNS, ChargingParameters
+    from ..services.tour_archive import ArchiveNotFoundError, get_tour_archive
+
+    with _analysis_errors():
+        summary = _store().summary(analysis_id)
+    try:
+        # Outliers the analysis excluded stay out of the re-simulation too.
+        tours = get_tour_archive().load_columns(analysis_id, SIMULATION_COLUMNS, counted_only=True)
+    except ArchiveNotFoundError as exc:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No enriched tours retained for analysis {exc}",
+        ) from exc
+    parameters = ChargingParameters.from_settings(float(summary["energy_limit_kwh"]), **overrides)
+    return tours, parameters
+
+
+def _records(frame) -> List[Dict[str, object]]:
+    # to_json renders timestamps as ISO strings and NaN as null in one pass.
+    return json.loads(frame.to_json(orient="records", date_format="iso", date_unit="s"))
+
+
+def _store() -> AnalysisStore:
+    from ..services.analysis_store import get_analysis_store
+
+    return get_analysis_store()
+
+
+@contextmanager
+def _analysis_errors() -> Iterator[None]:
+    from ..services.analysis_store import AnalysisNotFoundError
+
+    try:
+        yield
+    except AnalysisNotFoundError as exc:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis {exc}") from exc
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from fastapi import APIRouter, Body, File, HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from ..warmup import warm_analysis_stack
+from .uploads import WORKBOOK_SUFFIXES, persist_upload, upload_suffix
+
+if TYPE_CHECKING:
+    from ..services.parameter_profiles import ParameterProfile
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+
+@router.get("")
+def list_profiles() -> List[Dict[str, object]]:
+    from ..services.parameter_profiles import get_profile_store
+
+    return [profile.to_dict() for profile in get_profile_store().list()]
+
+
+@router.post("", status_code=201)
+def create_profile(payload: Dict[str, Any] = Body(...)) -> Dict[str, object]:
+    from ..services.parameter_profiles import ProfileConflictError, get_profile_store
+
+    try:
+        profile = get_profile_store().create(payload.get("name", ""), payload)
+    except ProfileConflictError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return profile.to_dict()
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str) -> Dict[str, object]:
+    return resolve_profile(profile_id).to_dict()
+
+
+@router.delete("/{profile_id}", status_code=204)
+def delete_profile(profile_id: str) -> None:
+    from ..services.parameter_profiles import ProfileNotFoundError, get_profile_store
+
+    try:
+        get_profile_store().delete(profile_id)
+    except ProfileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="Unknown parameter profile") from exc
+
+
+@router.post("/{profile_id}/diff")
+async def diff_profile(profile_id: str, file: UploadFile = File(...)) -> Dict[str, object]:
+    await run_in_threadpool(warm_analysis_stack)
+    from ..services.excel_processor import ExcelProcessor
+    from ..services.parameter_profiles import diff_parameters
+    from ..services.validation import InputValidationError, scan_workbook_headers
+
+    profile = resolve_profile(profile_id)
+    if upload_suffix(file) not in WORKBOOK_SUFFIXES:
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+
+    with TemporaryDirectory(prefix="maeva-") as tmp_dir:
+        workbook_path = await persist_upload(file, Path(tmp_dir), "workbook")
+        try:
+            # Rejects corrupt, non-xlsx and sheetless uploads before the parameter read.
+            scan_workbook_headers(workbook_path, ["TCO-calculation"])
+            workbook_parameters = ExcelProcessor(workbook_path).read_tco_parameters()
+        except InputValidationError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        except ValueError as exc:
+            raise HTTPException(
+                status_code=400, detail="TCO-calculation sheet has non-numeric parameters"
+            ) from exc
+    return diff_parameters(profile, workbook_parameters)
+
+
+def resolve_profile(profile_id: str) -> ParameterProfile:
+    from ..services.parameter_profiles import ProfileNotFoundError, get_profile_store
+
+    try:
+        return get_profile_store().get(profile_id)
+    except ProfileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="Unknown parameter profile") from exc
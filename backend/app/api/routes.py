@@ -1,13 +1,32 @@
+from __future__ import annotations
+
 import logging
+import math
+import uuid
+from functools import partial
 from pathlib import Path
-from tempfile import NamedTemporaryFile
-from typing import Any
+from tempfile import TemporaryDirectory
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
 
+from ..admission import AdmissionRejected, get_admission_controller
 from ..config import settings
 from ..services.ai_client import AISummaryError, generate_ai_summary
-from ..services.excel_processor import ExcelProcessor
+from ..services.types import TrendResolution
+from ..warmup import warm_analysis_stack
+from .profiles import resolve_profile
+from .uploads import WORKBOOK_SUFFIXES, persist_upload, upload_suffix
+
+if TYPE_CHECKING:
+    from ..services.excel_processor import AnalysisOptions, AnalysisPayload, ExcelProcessor
+    from ..services.incremental import IncrementalState
+    from ..services.parameter_profiles import ParameterProfile
+    from ..services.tabular_processor import ParameterSet
+
+# The pandas/openpyxl analysis stack is imported inside the handlers (after
+# warm_analysis_stack) so importing this module stays cheap at cold start.
 
 logger = logging.getLogger(__name__)
 
@@ -15,53 +34,302 @@ router = APIRouter(prefix="/api", tags=["analysis"])
 
 
 @router.post("/analyze")
-async def analyze_workbook(file: UploadFile = File(...)) -> Any:
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="No file provided")
-    suffix = Path(file.filename).suffix.lower()
-    if suffix not in {".xlsx", ".xlsm"}:
-        raise HTTPException(status_code=400, detail="Unsupported file format")
+async def analyze_workbook(
+    request: Request,
+    file: Optional[UploadFile] = File(None),
+    tours: Optional[UploadFile] = File(None),
+    vehicles: Optional[UploadFile] = File(None),
+    parameters: Optional[str] = Form(None),
+    profile_id: Optional[str] = Form(None),
+    base_analysis_id: Optional[str] = Form(None),
+    trend_resolution: TrendResolution = Form("day"),
+    trend_points: Optional[int] = Form(None, ge=2),
+    battery_capacity_kwh: Optional[float] = Form(None, gt=0),
+    depot_charger_kw: Optional[float] = Form(None, ge=0),
+    opportunity_charger_kw: Optional[float] = Form(None, ge=0),
+    load_profile_minutes: Optional[int] = Form(None, ge=1),
+    exclude_outliers: Optional[bool] = Form(None),
+    extremes_k: Optional[int] = Form(None, ge=1, le=100),
+    histogram_bins: Optional[int] = Form(None, ge=1, le=200),
+) -> Any:
+    await run_in_threadpool(warm_analysis_stack)
+    from ..services.excel_processor import AnalysisOptions
+    from ..services.incremental import IncrementalStateError, get_state_store
+    from ..services.load_profile import LoadProfileError, check_resolution
+    from ..services.validation import InputValidationError
 
-    try:
-        with NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            contents = await file.read()
-            tmp.write(contents)
-            tmp.flush()
-            temp_path = Path(tmp.name)
-    except Exception as exc:  # pragma: no cover - defensive
-        raise HTTPException(status_code=500, detail="Failed to persist upload") from exc
+    if load_profile_minutes is not None:
+        try:
+            check_resolution(load_profile_minutes)
+        except LoadProfileError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+    state_bytes = 0
+    if base_analysis_id:
+        state_bytes = await run_in_threadpool(get_state_store().size, base_analysis_id)
+        if state_bytes is None:
+            raise HTTPException(status_code=404, detail="Unknown base analysis")
+    charging_overrides = {
+        name: value
+        for name, value in (
+            ("battery_capacity_kwh", battery_capacity_kwh),
+            ("depot_charger_kw", depot_charger_kw),
+            ("opportunity_charger_kw", opportunity_charger_kw),
+        )
+        if value is not None
+    }
 
+    admission = get_admission_controller()
+    uploads = [upload for upload in (file, tours, vehicles) if upload is not None and upload.filename]
+    cost = admission.estimate_state_cost(state_bytes) + sum(
+        admission.estimate_cost(upload.size or 0, upload_suffix(upload)) for upload in uploads
+    )
     try:
-        processor = ExcelProcessor(temp_path)
-        result = processor.analyse()
-
-        ai_summary = None
-        if settings.enable_ai_summary:
-            try:
-                ai_summary = await generate_ai_summary(result.to_dict())
-            except AISummaryError as exc:
-                logger.warning("AI summary unavailable: %s", exc)
-                ai_summary = {
-                    "headline": "Automated interpretation unavailable",
-                    "bullets": [
-                        "The AI assistant could not process this report at the moment.",
-                    ],
-                    "cautions": [str(exc)],
-                }
-            except Exception as exc:  # pragma: no cover - defensive logging
-                logger.exception("Unexpected AI summary error")
-                ai_summary = {
-                    "headline": "Automated interpretation unavailable",
-                    "bullets": [
-                        "An unexpected error occurred while contacting the AI service.",
-                    ],
-                    "cautions": ["Check backend logs for ai_summary stack trace."],
-                }
-
-        result.ai_summary = ai_summary
-        return result.to_dict()
-    finally:
+        async with admission.slot(_client_id(request), cost):
+            # Queued requests hold no profile or base state until they run.
+            profile, base_state, base_tours = await run_in_threadpool(
+                _load_inputs, profile_id, base_analysis_id
+            )
+            options = AnalysisOptions(
+                base_state=base_state,
+                base_tours=base_tours,
+                trend_resolution=trend_resolution,
+                trend_max_points=trend_points or settings.trend_max_points,
+                charging_overrides=charging_overrides,
+                load_profile_resolution_minutes=load_profile_minutes,
+                exclude_outliers=exclude_outliers,
+                extremes_k=extremes_k,
+                histogram_bins=histogram_bins,
+            )
+            with TemporaryDirectory(prefix="maeva-") as tmp_dir:
+                work_dir = Path(tmp_dir)
+                try:
+                    processor = await _build_processor(
+                        work_dir=work_dir,
+                        file=file,
+                        tours=tours,
+                        vehicles=vehicles,
+                        parameters=parameters,
+                        profile=profile,
+                        options=options,
+                    )
+                    result = await run_in_threadpool(processor.analyse)
+                except (InputValidationError, IncrementalStateError) as exc:
+                    raise HTTPException(status_code=400, detail=str(exc)) from exc
+            await run_in_threadpool(
+                _retain_result,
+                result,
+                processor,
+                base_analysis_id=base_analysis_id,
+                charging_overrides=charging_overrides,
+                load_profile_minutes=load_profile_minutes,
+                source_name=_source_name(file, tours),
+            )
+    except AdmissionRejected as exc:
+        raise HTTPException(
+            status_code=503,
+            detail=str(exc),
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        ) from exc
+
+    await _attach_ai_summary(result, processor)
+    return result.to_dict()
+
+
+def _retain_result(
+    result: AnalysisPayload,
+    processor: ExcelProcessor,
+    *,
+    base_analysis_id: Optional[str],
+    charging_overrides: Dict[str, float],
+    load_profile_minutes: Optional[int],
+    source_name: Optional[str],
+) -> None:
+    from ..services.analysis_store import get_analysis_store
+    from ..services.incremental import get_state_store
+    from ..services.load_profile import ChargingState
+    from ..services.soc_simulation import SIMULATION_COLUMNS, ChargingParameters
+    from ..services.tour_archive import ArchiveNotFoundError, get_tour_archive
+
+    result.analysis_id = uuid.uuid4().hex
+    archived = False
+    if processor.enriched_tours is not None:
         try:
-            temp_path.unlink(missing_ok=True)
-        except OSError:
+            get_tour_archive().save(
+                result.analysis_id,
+                processor.enriched_tours,
+                base_analysis_id=base_analysis_id,
+                replaced_vehicles=processor.replaced_vehicles,
+                exclude_outliers=result.exclude_outliers,
+            )
+            archived = True
+        except ArchiveNotFoundError:
+            # The base predates tour retention; its exports answer 404 instead
+            # of serving a partial tour history.
             pass
+    if base_analysis_id and archived and result.charging_simulation is None:
+        # The base kept no simulation to continue (or used other charging
+        # parameters): simulate the retained history once and keep the end
+        # state, so the next incremental run continues from it.
+        charging = ChargingState.simulate(
+            get_tour_archive().load_columns(
+                result.analysis_id,
+                SIMULATION_COLUMNS,
+                counted_only=True,
+            ),
+            ChargingParameters.from_settings(result.energy_limit_kwh, **charging_overrides),
+        )
+        result.charging_simulation, result.load_profile = charging.sections(load_profile_minutes)
+        if processor.state is not None:
+            processor.state.charging = charging
+    if processor.state is not None:
+        get_state_store().save(result.analysis_id, processor.state)
+    get_analysis_store().save(
+        result,
+        source_name=source_name,
+        base_analysis_id=base_analysis_id,
+        vehicle_days=processor.state.vehicle_days if processor.state is not None else None,
+    )
+
+
+def _load_inputs(
+    profile_id: Optional[str],
+    base_analysis_id: Optional[str],
+) -> Tuple[Optional[ParameterProfile], Optional[IncrementalState], Optional[Callable[..., Any]]]:
+    from ..services.incremental import get_state_store
+
+    profile = resolve_profile(profile_id) if profile_id else None
+    if not base_analysis_id:
+        return profile, None, None
+    base_state = get_state_store().load(base_analysis_id)
+    if base_state is None:
+        # Deleted while the request was queued.
+        raise HTTPException(status_code=404, detail="Unknown base analysis")
+    return profile, base_state, _base_tours(base_analysis_id)
+
+
+def _base_tours(base_analysis_id: str) -> Optional[Callable[..., Any]]:
+    from ..services.tour_archive import ArchiveNotFoundError, get_tour_archive
+
+    archive = get_tour_archive()
+    try:
+        archive.segments(base_analysis_id)
+    except ArchiveNotFoundError:
+        # The base predates tour retention; outliers are judged on the new tours alone.
+        return None
+    return partial(archive.load_columns, base_analysis_id)
+
+
+def _client_id(request: Request) -> str:
+    # Teams behind one proxy can identify themselves to get separate queues.
+    client_id = request.headers.get("X-Client-Id")
+    if client_id:
+        return client_id[:64]
+    return request.client.host if request.client is not None else "anonymous"
+
+
+async def _build_processor(
+    *,
+    work_dir: Path,
+    file: Optional[UploadFile],
+    tours: Optional[UploadFile],
+    vehicles: Optional[UploadFile],
+    parameters: Optional[str],
+    profile: Optional[ParameterProfile],
+    options: AnalysisOptions,
+) -> ExcelProcessor:
+    from ..services.excel_processor import ExcelProcessor
+    from ..services.tabular_processor import (
+        BUNDLE_SUFFIXES,
+        TABULAR_SUFFIXES,
+        TabularProcessor,
+        extract_bundle,
+    )
+
+    if file is not None and file.filename:
+        suffix = upload_suffix(file)
+        if suffix in WORKBOOK_SUFFIXES:
+            workbook_path = await persist_upload(file, work_dir, "workbook")
+            if profile is None:
+                return ExcelProcessor(workbook_path, options=options)
+            return ExcelProcessor(
+                workbook_path,
+                tco_parameters=profile.tco_parameters,
+                energy_limit_kwh=profile.energy_limit_kwh,
+                options=options,
+            )
+        if suffix not in BUNDLE_SUFFIXES:
+            raise HTTPException(status_code=400, detail="Unsupported file format")
+
+        bundle = extract_bundle(await persist_upload(file, work_dir, "bundle"), work_dir)
+        if parameters is None and bundle.parameters_path is not None:
+            parameters = bundle.parameters_path.read_text(encoding="utf-8")
+        return TabularProcessor(
+            bundle.tours_path,
+            bundle.vehicles_path,
+            _require_parameters(parameters, profile),
+            options,
+        )
+
+    if tours is None or vehicles is None or not tours.filename or not vehicles.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    for upload in (tours, vehicles):
+        if upload_suffix(upload) not in TABULAR_SUFFIXES:
+            raise HTTPException(status_code=400, detail="Unsupported file format")
+
+    return TabularProcessor(
+        await persist_upload(tours, work_dir, "tours"),
+        await persist_upload(vehicles, work_dir, "vehicles"),
+        _require_parameters(parameters, profile),
+        options,
+    )
+
+
+def _source_name(file: Optional[UploadFile], tours: Optional[UploadFile]) -> Optional[str]:
+    upload = file if file is not None and file.filename else tours
+    return upload.filename if upload is not None else None
+
+
+def _require_parameters(
+    parameters: Optional[str],
+    profile: Optional[ParameterProfile],
+) -> ParameterSet:
+    from ..services.tabular_processor import TelemetryInputError, load_parameter_document
+
+    if not parameters:
+        if profile is not None:
+            return profile.to_parameter_set()
+        raise TelemetryInputError("TCO parameters are required for CSV/Parquet uploads")
+    return load_parameter_document(parameters)
+
+
+async def _attach_ai_summary(result: AnalysisPayload, processor: ExcelProcessor) -> None:
+    from ..services.trend import daily_trend_frame
+
+    ai_summary = None
+    if settings.enable_ai_summary:
+        daily = None
+        if processor.state is not None:
+            daily = daily_trend_frame(processor.state.vehicle_days)
+        try:
+            ai_summary = await generate_ai_summary(result.to_dict(), daily)
+            logger.info("AI summary prompt metrics: %s", ai_summary["metrics"])
+        except AISummaryError as exc:
+            logger.warning("AI summary unavailable: %s", exc)
+            ai_summary = {
+                "headline": "Automated interpretation unavailable",
+                "bullets": [
+                    "The AI assistant could not process this report at the moment.",
+                ],
+                "cautions": [str(exc)],
+            }
+        except Exception as exc:  # pragma: no cover - defensive logging
+            logger.exception("Unexpected AI summary error")
+            ai_summary = {
+                "headline": "Automated interpretation unavailable",
+                "bullets": [
+                    "An unexpected error occurred while contacting the AI service.",
+                ],
+                "cautions": ["Check backend logs for ai_summary stack trace."],
+            }
+
+    result.ai_summary = ai_summary
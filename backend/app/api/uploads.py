@@ -0,0 +1,21 @@
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+
+WORKBOOK_SUFFIXES = {".xlsx", ".xlsm"}
+_UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def upload_suffix(upload: UploadFile) -> str:
+    return Path(upload.filename or "").suffix.lower()
+
+
+async def persist_upload(upload: UploadFile, work_dir: Path, stem: str) -> Path:
+    target = work_dir / f"{stem}{upload_suffix(upload)}"
+    try:
+        with target.open("wb") as sink:
+            while chunk := await upload.read(_UPLOAD_CHUNK_BYTES):
+                sink.write(chunk)
+    except Exception as exc:  # pragma: no cover - defensive
+        raise HTTPException(status_code=500, detail="Failed to persist upload") from exc
+    return target
@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 from dataclasses import dataclass
 from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 
 
@@ -19,13 +20,47 @@ def _get_float(value: Optional[str], default: float) -> float:
         return default
 
 
+def _get_int(value: Optional[str], default: int) -> int:
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
 @dataclass(frozen=True)
 class Settings:
     google_api_key: Optional[str]
     enable_ai_summary: bool
     google_model: str
     ai_timeout_seconds: float
+    ai_token_budget: int
     default_energy_limit_kwh: float
+    data_dir: Path
+    trend_max_points: int
+    warmup_on_start: bool
+    static_precompress: bool
+    archive_row_group_rows: int
+    export_batch_rows: int
+    battery_capacity_kwh: Optional[float]
+    depot_charger_kw: float
+    opportunity_charger_kw: float
+    min_charge_gap_minutes: float
+    load_profile_resolution_minutes: int
+    outlier_mad_threshold: float
+    max_average_speed_kmh: float
+    exclude_outliers: bool
+    statistics_top_k: int
+    statistics_histogram_bins: int
+    validation_sample_rows: int
+    web_concurrency: int
+    admission_max_concurrent: int
+    admission_memory_budget_mb: int
+    admission_max_queue: int
+    admission_client_queue: int
+    admission_queue_timeout_seconds: float
+
+
+_DEFAULT_DATA_DIR = Path(__file__).resolve().parent.parent / "data"
 
 
 @lru_cache()
@@ -35,7 +70,39 @@ def get_settings() -> Settings:
         enable_ai_summary=_get_bool(os.getenv("ENABLE_AI_SUMMARY"), default=False),
         google_model=os.getenv("GOOGLE_AI_MODEL", "models/gemini-pro"),
         ai_timeout_seconds=_get_float(os.getenv("AI_TIMEOUT_SECONDS"), default=12.0),
+        ai_token_budget=_get_int(os.getenv("AI_TOKEN_BUDGET"), default=1_200),
         default_energy_limit_kwh=_get_float(os.getenv("DEFAULT_ENERGY_LIMIT_KWH"), default=1000.0),
+        data_dir=Path(os.getenv("MAEVA_DATA_DIR") or _DEFAULT_DATA_DIR),
+        trend_max_points=_get_int(os.getenv("TREND_MAX_POINTS"), default=500),
+        warmup_on_start=_get_bool(os.getenv("WARMUP_ON_START"), default=True),
+        static_precompress=_get_bool(os.getenv("STATIC_PRECOMPRESS"), default=True),
+        archive_row_group_rows=_get_int(os.getenv("ARCHIVE_ROW_GROUP_ROWS"), default=50_000),
+        export_batch_rows=_get_int(os.getenv("EXPORT_BATCH_ROWS"), default=10_000),
+        # Unset capacity falls back to the workbook's daily energy limit.
+        battery_capacity_kwh=_get_float(os.getenv("BATTERY_CAPACITY_KWH"), default=0.0) or None,
+        depot_charger_kw=_get_float(os.getenv("DEPOT_CHARGER_KW"), default=100.0),
+        opportunity_charger_kw=_get_float(os.getenv("OPPORTUNITY_CHARGER_KW"), default=350.0),
+        min_charge_gap_minutes=_get_float(os.getenv("MIN_CHARGE_GAP_MINUTES"), default=20.0),
+        load_profile_resolution_minutes=_get_int(
+            os.getenv("LOAD_PROFILE_RESOLUTION_MINUTES"), default=15
+        ),
+        outlier_mad_threshold=_get_float(os.getenv("OUTLIER_MAD_THRESHOLD"), default=3.5),
+        max_average_speed_kmh=_get_float(os.getenv("MAX_AVERAGE_SPEED_KMH"), default=120.0),
+        exclude_outliers=_get_bool(os.getenv("EXCLUDE_OUTLIERS"), default=False),
+        statistics_top_k=_get_int(os.getenv("STATISTICS_TOP_K"), default=5),
+        statistics_histogram_bins=_get_int(os.getenv("STATISTICS_HISTOGRAM_BINS"), default=20),
+        validation_sample_rows=_get_int(os.getenv("VALIDATION_SAMPLE_ROWS"), default=5),
+        # Worker processes serving the app (gunicorn.conf.py exports it). The
+        # ADMISSION_* limits are service-wide: each worker enforces an even
+        # share, at least one slot. Run a single worker to enforce them exactly.
+        web_concurrency=_get_int(os.getenv("WEB_CONCURRENCY"), default=1),
+        admission_max_concurrent=_get_int(os.getenv("ADMISSION_MAX_CONCURRENT"), default=2),
+        admission_memory_budget_mb=_get_int(os.getenv("ADMISSION_MEMORY_BUDGET_MB"), default=2_048),
+        admission_max_queue=_get_int(os.getenv("ADMISSION_MAX_QUEUE"), default=16),
+        admission_client_queue=_get_int(os.getenv("ADMISSION_CLIENT_QUEUE"), default=4),
+        admission_queue_timeout_seconds=_get_float(
+            os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS"), default=120.0
+        ),
     )
 
 
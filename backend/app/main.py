@@ -1,13 +1,38 @@
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import AsyncIterator
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 
+from . import IMPORT_STARTED
+from .admission import get_admission_controller
+from .api.analyses import router as analyses_router
+from .api.profiles import router as profiles_router
 from .api.routes import router as analysis_router
+from .config import settings
+from .static_files import PrecompressedStaticFiles
+from .warmup import is_ready, start_background_warmup, warmup_status
 
-app = FastAPI(title="Maeva TCO Analyzer", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Serve /health immediately and pull pandas/openpyxl in behind it.
+    if settings.warmup_on_start:
+        start_background_warmup()
+    if _needs_precompress():
+        threading.Thread(
+            target=_frontend.precompress,
+            name="static-precompress",
+            daemon=True,
+        ).start()
+    yield
+
+
+app = FastAPI(title="Maeva TCO Analyzer", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,12 +43,24 @@ app.add_middleware(
 )
 
 app.include_router(analysis_router)
+app.include_router(profiles_router)
+app.include_router(analyses_router)
 
 _STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
-_INDEX_FILE = _STATIC_DIR / "index.html"
+_frontend = (
+    PrecompressedStaticFiles(directory=_STATIC_DIR) if _STATIC_DIR.exists() else None
+)
+
+
+def precompress_frontend() -> None:
+    """Precompress the bundled frontend now; gunicorn runs this once in the master."""
+    if _needs_precompress():
+        _frontend.precompress()
+
 
-if _STATIC_DIR.exists():
-    app.mount("/", StaticFiles(directory=_STATIC_DIR, html=True), name="frontend")
+def _needs_precompress() -> bool:
+    # Forked workers inherit the master's variants and skip their own pass.
+    return _frontend is not None and settings.static_precompress and not _frontend.precompressed
 
 
 @app.get("/health")
@@ -31,8 +68,23 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
-@app.get("/{full_path:path}")
-async def spa_fallback(full_path: str) -> FileResponse:
-    if _INDEX_FILE.exists():
-        return FileResponse(_INDEX_FILE)
-    raise HTTPException(status_code=404, detail="Not Found")
+@app.get("/health/ready")
+def readiness() -> JSONResponse:
+    status = warmup_status()
+    status["app_import_seconds"] = APP_IMPORT_SECONDS
+    return JSONResponse(status, status_code=200 if is_ready() else 503)
+
+
+@app.get("/health/admission")
+def admission_metrics() -> dict[str, object]:
+    """Analysis concurrency, queue depth and wait-time estimates."""
+    return get_admission_controller().metrics()
+
+
+# Mounted after the API and health routes: a mount at "/" matches every path.
+# It also answers unknown client-side routes with index.html.
+if _frontend is not None:
+    app.mount("/", _frontend, name="frontend")
+
+
+APP_IMPORT_SECONDS = round(time.perf_counter() - IMPORT_STARTED, 4)
@@ -1,60 +1,54 @@
 from __future__ import annotations
 
 import json
-from typing import Any, Dict
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 import httpx
 
 from ..config import settings
+from .ai_digest import build_digest, dumps_compact, estimate_tokens
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-class AISummaryError(RuntimeError):
-    """Raised when the AI summary process fails."""
+_INSTRUCTION = (
+    "You are a fleet electrification consultant. Analyse the provided KPI JSON and produce a concise interpretation. "
+    "Focus on BEV feasibility, cost efficiency, and operational risks. Compact tables list their column names under "
+    "\"columns\". Return valid JSON with the schema: "
+    "{\"headline\": string, \"bullets\": string[3], \"cautions\": string[<=3]}. Do not include markdown."
+)
 
 
-def _build_ai_payload(analysis: Dict[str, Any]) -> Dict[str, Any]:
-    vehicles = analysis.get("vehicles", [])
-    economy = analysis.get("economy_extremes", {})
-    savers = economy.get("top_savers", [])
-    risks = economy.get("top_risks", [])
-
-    condensed = {
-        "overview": {
-            "energy_limit_kwh": analysis.get("energy_limit_kwh"),
-            "period_months": analysis.get("period_months"),
-            "total_vehicles": analysis.get("total_vehicles"),
-            "total_tours": analysis.get("total_tours"),
-            "total_mileage": analysis.get("total_mileage"),
-        },
-        "feasibility_breakdown": analysis.get("feasibility_breakdown", {}),
-        "cost_efficiency_breakdown": analysis.get("cost_efficiency_breakdown", {}),
-        "both_yes_count": analysis.get("both_yes_count"),
-        "fuel_summary": analysis.get("fuel_summary", []),
-        "top_savers": savers[:3],
-        "top_risks": risks[:3],
-        "daily_trend": analysis.get("daily_trend", [])[-7:],
-    }
-    # include aggregate stats if available
-    if vehicles:
-        condensed["sample"] = vehicles[:5]
-    return condensed
+class AISummaryError(RuntimeError):
+    """Raised when the AI summary process fails."""
 
 
-def _compose_prompt(data: Dict[str, Any]) -> str:
-    instruction = (
-        "You are a fleet electrification consultant. Analyse the provided KPI JSON and produce a concise interpretation. "
-        "Focus on BEV feasibility, cost efficiency, and operational risks. Return valid JSON with the schema: "
-        "{\"headline\": string, \"bullets\": string[3], \"cautions\": string[<=3]}. Do not include markdown."
+def _compose_prompt(
+    analysis: Dict[str, Any],
+    daily: Optional["pd.DataFrame"] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Prompt text plus a size report; the digest gets what the instruction leaves."""
+    header = f"{_INSTRUCTION}\n\nDATA:\n"
+    digest, report = build_digest(
+        analysis,
+        max(settings.ai_token_budget - estimate_tokens(header), 0),
+        daily,
     )
-    payload = json.dumps(data, ensure_ascii=False)
-    return f"{instruction}\n\nDATA:\n{payload}"
+    prompt = f"{header}{dumps_compact(digest)}"
+    report.update(prompt_chars=len(prompt), prompt_tokens_estimate=estimate_tokens(prompt))
+    return prompt, report
 
 
-async def generate_ai_summary(analysis: Dict[str, Any]) -> Dict[str, Any]:
+async def generate_ai_summary(
+    analysis: Dict[str, Any],
+    daily: Optional["pd.DataFrame"] = None,
+) -> Dict[str, Any]:
+    """``daily`` is the full daily trend frame the trend slopes are fitted on."""
     if not settings.google_api_key:
         raise AISummaryError("AI summary disabled: missing GOOGLE_API_KEY")
 
-    prompt = _compose_prompt(_build_ai_payload(analysis))
+    prompt, metrics = _compose_prompt(analysis, daily)
 
     body = {
         "contents": [
@@ -76,14 +70,19 @@ async def generate_ai_summary(analysis: Dict[str, Any]) -> Dict[str, Any]:
     endpoint = f"https://generativelanguage.googleapis.com/v1beta/{model}:generateContent"
     params = {"key": settings.google_api_key}
 
+    started = time.perf_counter()
     async with httpx.AsyncClient(timeout=settings.ai_timeout_seconds) as client:
         response = await client.post(endpoint, params=params, json=body)
         try:
             response.raise_for_status()
         except httpx.HTTPStatusError as exc:  # pragma: no cover - depends on external service
             raise AISummaryError(f"AI service error: {exc.response.status_code}") from exc
+    metrics["latency_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
 
     payload = response.json()
+    usage = payload.get("usageMetadata") or {}
+    metrics["prompt_tokens"] = usage.get("promptTokenCount")
+    metrics["output_tokens"] = usage.get("candidatesTokenCount")
     candidates = payload.get("candidates") or []
     if not candidates:
         raise AISummaryError("AI service returned no candidates")
@@ -117,5 +116,6 @@ async def generate_ai_summary(analysis: Dict[str, Any]) -> Dict[str, Any]:
         "bullets": [str(item) for item in bullets[:5]],
         "cautions": [str(item) for item in (cautions or [])[:5]],
         "raw": combined,
+        "metrics": metrics,
     }
 
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from .types import TrendResolution
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# numpy/pandas are imported inside _trend: routes imports this module through
+# ai_client, and the analysis stack must stay out of the cold-start import.
+
+# Rough size of one token for JSON-heavy prompts; close enough to budget with
+# and cheaper than shipping a tokenizer.
+CHARS_PER_TOKEN = 4
+
+TREND_FIELDS = ("tour_count", "mileage_sum", "energy_sum")
+DIGEST_PERCENTILES = ("p5", "p50", "p95")
+
+_PERIOD_DAYS: Dict[TrendResolution, float] = {"day": 1.0, "week": 7.0, "month": 30.44}
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def dumps_compact(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_digest(
+    analysis: Dict[str, Any],
+    token_budget: int,
+    daily: Optional["pd.DataFrame"] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Condense an analysis into a prompt digest that fits ``token_budget``.
+
+    Sections are added in priority order. Each offers progressively smaller
+    variants, and the largest variant that still fits is kept; a section
+    with no fitting variant is dropped. ``daily`` is the full daily trend
+    frame (``daily_trend_frame``); without it the trend section is left out,
+    since ``analysis["daily_trend"]`` may be downsampled. Returns the digest
+    and a size report.
+    """
+    digest: Dict[str, Any] = {}
+    # Sizes are tracked in characters: rounding each section up to whole
+    # tokens separately would let the total drift past the budget.
+    used_chars = len(dumps_compact(digest))
+    dropped: List[str] = []
+    for name, build in _SECTIONS:
+        # Only the trend section reads the full daily series.
+        variants = _trend(analysis, daily) if build is _trend else build(analysis)
+        if not variants:
+            continue
+        for variant in variants:
+            # '"name":<variant>' inside the enclosing braces, plus a comma after the first.
+            added = len(dumps_compact({name: variant})) - 2 + (1 if digest else 0)
+            if math.ceil((used_chars + added) / CHARS_PER_TOKEN) <= token_budget:
+                digest[name] = variant
+                used_chars += added
+                break
+        else:
+            dropped.append(name)
+    report = {
+        "token_budget": token_budget,
+        "digest_tokens_estimate": estimate_tokens(dumps_compact(digest)),
+        "sections": list(digest),
+        "dropped_sections": dropped,
+    }
+    return digest, report
+
+
+def _overview(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    full = {
+        "energy_limit_kwh": analysis.get("energy_limit_kwh"),
+        "period_months": _round(analysis.get("period_months")),
+        "vehicles": analysis.get("total_vehicles"),
+        "tours": analysis.get("total_tours"),
+        "mileage_km": _round(analysis.get("total_mileage"), 0),
+        "energy_kwh": _round(analysis.get("total_energy_kwh"), 0),
+        "feasible": analysis.get("feasibility_breakdown", {}),
+        "cost_efficient": analysis.get("cost_efficiency_breakdown", {}),
+        "both_yes": analysis.get("both_yes_count"),
+    }
+    core = {key: full[key] for key in ("vehicles", "feasible", "cost_efficient", "both_yes")}
+    return [full, core]
+
+
+def _fuel_mix(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = analysis.get("fuel_summary") or []
+    if not rows:
+        return []
+    # One row per fuel type as [vehicles, feasible, cost_efficient, avg_economy].
+    table = {
+        row["fueltypes"]: [
+            row["vehicles"],
+            row["feasible"],
+            row["cost_efficient"],
+            _round(row["avg_economy"], 0),
+        ]
+        for row in rows
+    }
+    largest = sorted(rows, key=lambda row: row["vehicles"], reverse=True)[:3]
+    return [
+        {"columns": ["vehicles", "feasible", "cost_efficient", "avg_economy"], "rows": table},
+        {
+            "columns": ["vehicles", "feasible", "cost_efficient", "avg_economy"],
+            "rows": {row["fueltypes"]: table[row["fueltypes"]] for row in largest},
+        },
+    ]
+
+
+def _distribution(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    distribution = analysis.get("distribution")
+    if not distribution:
+        return []
+
+    def percentiles(groups: Optional[List[str]]) -> Dict[str, Any]:
+        return {
+            field: {
+                group: [stats["percentiles"].get(key) for key in DIGEST_PERCENTILES]
+                for group, stats in values["groups"].items()
+                if groups is None or group in groups
+            }
+            for field, values in distribution["fields"].items()
+        }
+
+    return [
+        {"percentiles": list(DIGEST_PERCENTILES), "fields": percentiles(None)},
+        {"percentiles": list(DIGEST_PERCENTILES), "fields": percentiles(["all"])},
+    ]
+
+
+def _extremes(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    economy = analysis.get("economy_extremes") or {}
+    if not economy.get("top_savers") and not economy.get("top_risks"):
+        return []
+
+    def compact(rows: List[Dict[str, Any]], count: int) -> List[List[Any]]:
+        return [
+            [row["vehicleid"], row["fueltypes"], _round(row["economy_per_year"], 0)]
+            for row in rows[:count]
+        ]
+
+    return [
+        {
+            "columns": ["vehicleid", "fuel", "economy_per_year"],
+            "top_savers": compact(economy.get("top_savers", []), count),
+            "top_risks": compact(economy.get("top_risks", []), count),
+        }
+        for count in (3, 1)
+    ]
+
+
+def _outliers(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    quality = analysis.get("tour_quality")
+    if not quality:
+        return []
+    reasons = {reason: count for reason, count in quality["by_reason"].items() if count}
+    return [
+        {
+            "tours_checked": quality["tours_checked"],
+            "outlier_tours": quality["outlier_tours"],
+            "excluded_from_tco": quality["excluded_from_tco"],
+            "by_reason": reasons,
+        },
+        {"outlier_tours": quality["outlier_tours"], "tours_checked": quality["tours_checked"]},
+    ]
+
+
+def _charging(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    simulation = analysis.get("charging_simulation")
+    if not simulation:
+        return []
+    full = {
+        "simulated": simulation["vehicles_simulated"],
+        "depot_feasible": simulation["depot_feasible_vehicles"],
+        "opportunity_feasible": simulation["opportunity_feasible_vehicles"],
+        "battery_kwh": simulation["parameters"]["battery_capacity_kwh"],
+    }
+    profile = analysis.get("load_profile")
+    if profile:
+        full["peak_kw"] = profile["peak_kw"]
+        full["p95_kw"] = profile["percentiles_kw"].get("p95")
+    return [full, {key: full[key] for key in ("simulated", "depot_feasible", "opportunity_feasible")}]
+
+
+def _trend(
+    analysis: Dict[str, Any],
+    daily: Optional["pd.DataFrame"] = None,
+) -> List[Dict[str, Any]]:
+    """Least-squares slopes over the full daily series.
+
+    The fit never uses the LTTB points in ``daily_trend``: LTTB keeps the
+    extremes on purpose, which would bias a regression. Days without tours
+    count as zero. ``slope_per_period`` is the change in the period total
+    from one period to the next, i.e. the daily slope times the period
+    length squared.
+    """
+    if daily is None or len(daily) < 2:
+        return []
+    import numpy as np
+
+    series = daily.asfreq("D", fill_value=0)
+    days = np.arange(len(series), dtype=np.float64)
+    resolution = analysis.get("trend_resolution") or "day"
+    period = _PERIOD_DAYS[resolution]
+
+    slopes: Dict[str, Dict[str, Optional[float]]] = {}
+    for field in TREND_FIELDS:
+        values = series[field].to_numpy(dtype=np.float64)
+        per_day = float(np.polyfit(days, values, 1)[0])
+        mean = float(values.mean())
+        slopes[field] = {
+            "slope_per_period": _round(per_day * period * period),
+            "change_pct": _round(per_day * days[-1] / mean * 100.0, 1) if mean else None,
+        }
+    return [
+        {
+            "resolution": resolution,
+            "from": series.index[0].strftime("%Y-%m-%d"),
+            "to": series.index[-1].strftime("%Y-%m-%d"),
+            "slopes": slopes,
+        },
+        {"resolution": resolution, "change_pct": {f: s["change_pct"] for f, s in slopes.items()}},
+    ]
+
+
+def _round(value: Any, digits: int = 2) -> Any:
+    return round(float(value), digits) if value is not None else None
+
+
+_SECTIONS: List[Tuple[str, Callable[..., List[Dict[str, Any]]]]] = [
+    ("overview", _overview),
+    ("fuel_mix", _fuel_mix),
+    ("distribution", _distribution),
+    ("extremes", _extremes),
+    ("outliers", _outliers),
+    ("trend", _trend),
+    ("charging", _charging),
+]
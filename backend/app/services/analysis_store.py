@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from .excel_processor import AnalysisPayload, VehicleAnalysis
+from .storage import connect, database_path
+from .trend import (
+    TREND_COLUMNS,
+    TREND_RESOLUTIONS,
+    TrendResolution,
+    daily_trend_frame,
+    resample_trend,
+)
+
+
+class AnalysisNotFoundError(LookupError):
+    """Raised when an analysis id is not in the store."""
+
+
+VEHICLE_FIELDS = list(VehicleAnalysis.__dataclass_fields__)
+
+# Columns compared by the per-vehicle diff; numeric ones also get a delta.
+DIFF_NUMERIC_FIELDS = [
+    "tour_count",
+    "annual_mileage",
+    "annual_energy_kwh",
+    "infeasible_days",
+    "feasible_rate",
+    "cost_bev",
+    "economy_per_year",
+]
+DIFF_FLAG_FIELDS = ["feasibility_flag", "cost_efficiency_flag", "both"]
+
+_SUMMARY_FIELDS = [
+    "analysis_id",
+    "created_at",
+    "source_name",
+    "base_analysis_id",
+    "start_date",
+    "end_date",
+    "energy_limit_kwh",
+    "period_months",
+    "total_vehicles",
+    "total_tours",
+    "total_mileage",
+    "total_energy_kwh",
+    "both_yes_count",
+]
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS analyses (
+        analysis_id TEXT PRIMARY KEY,
+        created_at TEXT NOT NULL,
+        source_name TEXT,
+        base_analysis_id TEXT,
+        start_date TEXT,
+        end_date TEXT,
+        energy_limit_kwh REAL,
+        period_months REAL,
+        total_vehicles INTEGER,
+        total_tours INTEGER,
+        total_mileage REAL,
+        total_energy_kwh REAL,
+        both_yes_count INTEGER,
+        feasibility_breakdown TEXT,
+        cost_efficiency_breakdown TEXT,
+        details TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_analyses_period ON analyses (start_date, end_date)",
+    "CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS analysis_vehicles (
+        analysis_id TEXT NOT NULL REFERENCES analyses (analysis_id) ON DELETE CASCADE,
+        vehicleid INTEGER NOT NULL,
+        licenseno TEXT,
+        fueltypes TEXT,
+        total_mileage REAL,
+        total_fuel REAL,
+        total_energy_kwh REAL,
+        tour_count INTEGER,
+        feasible_tours INTEGER,
+        infeasible_tours INTEGER,
+        feasible_days INTEGER,
+        infeasible_days INTEGER,
+        total_days INTEGER,
+        avg_consumption_per_100km REAL,
+        annual_mileage REAL,
+        annual_energy_kwh REAL,
+        cost_diesel REAL,
+        cost_lng REAL,
+        cost_bev REAL,
+        economy_per_year REAL,
+        feasibility_flag TEXT,
+        cost_efficiency_flag TEXT,
+        both TEXT,
+        feasible_rate REAL,
+        PRIMARY KEY (analysis_id, vehicleid)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_analysis_vehicles_vehicle ON analysis_vehicles (vehicleid, analysis_id)",
+    """
+    CREATE TABLE IF NOT EXISTS analysis_trend (
+        analysis_id TEXT NOT NULL REFERENCES analyses (analysis_id) ON DELETE CASCADE,
+        resolution TEXT NOT NULL,
+        period TEXT NOT NULL,
+        tour_count INTEGER,
+        mileage_sum REAL,
+        fuel_sum REAL,
+        energy_sum REAL,
+        feasible_tours INTEGER,
+        row_count INTEGER,
+        PRIMARY KEY (analysis_id, resolution, period)
+    )
+    """,
+]
+
+
+class AnalysisStore:
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self._initialised = False
+
+    def save(
+        self,
+        payload: AnalysisPayload,
+        *,
+        source_name: Optional[str] = None,
+        base_analysis_id: Optional[str] = None,
+        vehicle_days: Optional[pd.DataFrame] = None,
+    ) -> None:
+        if not payload.analysis_id:
+            raise ValueError("Analysis payload has no analysis_id")
+        details = {
+            "fuel_summary": payload.fuel_summary,
+            "economy_extremes": payload.economy_extremes,
+            "tco_parameters": payload.tco_parameters,
+            "insights": payload.insights,
+            "incremental": payload.incremental,
+            "charging_simulation": payload.charging_simulation,
+            "load_profile": payload.load_profile,
+            "tour_quality": payload.tour_quality,
+            "distribution": payload.distribution,
+            "validation": payload.validation,
+            "exclude_outliers": payload.exclude_outliers,
+        }
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    payload.analysis_id,
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    source_name,
+                    base_analysis_id,
+                    payload.start_date or None,
+                    payload.end_date or None,
+                    float(payload.energy_limit_kwh),
+                    float(payload.period_months),
+                    int(payload.total_vehicles),
+                    int(payload.total_tours),
+                    float(payload.total_mileage),
+                    float(payload.total_energy_kwh),
+                    int(payload.both_yes_count),
+                    json.dumps(payload.feasibility_breakdown),
+                    json.dumps(payload.cost_efficiency_breakdown),
+                    json.dumps(details, default=str),
+                ),
+            )
+            placeholders = ", ".join("?" for _ in VEHICLE_FIELDS)
+            conn.executemany(
+                f"INSERT OR REPLACE INTO analysis_vehicles (analysis_id, {', '.join(VEHICLE_FIELDS)}) "
+                f"VALUES (?, {placeholders})",
+                (
+                    (payload.analysis_id, *(row[name] for name in VEHICLE_FIELDS))
+                    for row in (vehicle.to_dict() for vehicle in payload.vehicles)
+                ),
+            )
+            if vehicle_days is not None:
+                # Every resolution is materialised once so later trend requests
+                # are a primary-key range read rather than a re-aggregation.
+                daily = daily_trend_frame(vehicle_days)
+                trend_placeholders = ", ".join("?" for _ in TREND_COLUMNS)
+                for resolution in TREND_RESOLUTIONS:
+                    frame = resample_trend(daily, resolution)
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO analysis_trend "
+                        f"(analysis_id, resolution, period, {', '.join(TREND_COLUMNS)}) "
+                        f"VALUES (?, ?, ?, {trend_placeholders})",
+                        (
+                            (payload.analysis_id, resolution, period.strftime("%Y-%m-%d"), *values)
+                            for period, values in zip(
+                                frame.index,
+                                frame[TREND_COLUMNS].itertuples(index=False, name=None),
+                            )
+                        ),
+                    )
+
+    def list(
+        self,
+        *,
+        vehicleid: Optional[int] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, object]]:
+        clauses: List[str] = []
+        params: List[object] = []
+        if vehicleid is not None:
+            clauses.append(
+                "EXISTS (SELECT 1 FROM analysis_vehicles v "
+                "WHERE v.vehicleid = ? AND v.analysis_id = a.analysis_id)"
+            )
+            params.append(int(vehicleid))
+        # Analyses whose covered period overlaps the requested window.
+        if start_date:
+            clauses.append("a.end_date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("a.start_date <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        params.append(int(limit))
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join('a.' + name for name in _SUMMARY_FIELDS)}, "
+                "a.feasibility_breakdown, a.cost_efficiency_breakdown "
+                f"FROM analyses a {where} ORDER BY a.created_at DESC LIMIT ?",
+                params,
+            ).fetchall()
+        return [_summary_from_row(row) for row in rows]
+
+    def summary(self, analysis_id: str) -> Dict[str, object]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_SUMMARY_FIELDS)}, feasibility_breakdown, "
+                "cost_efficiency_breakdown FROM analyses WHERE analysis_id = ?",
+                (analysis_id,),
+            ).fetchone()
+        if row is None:
+            raise AnalysisNotFoundError(analysis_id)
+        return _summary_from_row(row)
+
+    def get(self, analysis_id: str) -> Dict[str, object]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM analyses WHERE analysis_id = ?",
+                (analysis_id,),
+            ).fetchone()
+            if row is None:
+                raise AnalysisNotFoundError(analysis_id)
+            vehicles = conn.execute(
+                f"SELECT {', '.join(VEHICLE_FIELDS)} FROM analysis_vehicles "
+                "WHERE analysis_id = ? ORDER BY vehicleid",
+                (analysis_id,),
+            ).fetchall()
+
+        result = _summary_from_row(row)
+        result.update(json.loads(row["details"] or "{}"))
+        result["vehicles"] = [dict(vehicle) for vehicle in vehicles]
+        return result
+
+    def iter_vehicles(self, analysis_id: str, batch_rows: int) -> Iterator[List[tuple]]:
+        """Batches of ``VEHICLE_FIELDS`` rows in vehicleid order.
+
+        The id is checked up front; each batch is then a separate keyset query
+        on the primary key, so no connection stays open while a caller streams.
+        """
+        with self._connect() as conn:
+            if conn.execute(
+                "SELECT 1 FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone() is None:
+                raise AnalysisNotFoundError(analysis_id)
+        return self._vehicle_batches(analysis_id, batch_rows)
+
+    def _vehicle_batches(self, analysis_id: str, batch_rows: int) -> Iterator[List[tuple]]:
+        last_vehicleid = None
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT {', '.join(VEHICLE_FIELDS)} FROM analysis_vehicles "
+                    "WHERE analysis_id = ? AND (? IS NULL OR vehicleid > ?) "
+                    "ORDER BY vehicleid LIMIT ?",
+                    (analysis_id, last_vehicleid, last_vehicleid, int(batch_rows)),
+                ).fetchall()
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+            last_vehicleid = rows[-1]["vehicleid"]
+
+    def trend(
+        self,
+        analysis_id: str,
+        resolution: TrendResolution,
+        *,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+    ) -> pd.DataFrame:
+        clauses = ["analysis_id = ?", "resolution = ?"]
+        params: List[object] = [analysis_id, resolution]
+        if start_date:
+            clauses.append("period >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("period <= ?")
+            params.append(end_date)
+
+        with self._connect() as conn:
+            if conn.execute(
+                "SELECT 1 FROM analyses WHERE analysis_id = ?", (analysis_id,)
+            ).fetchone() is None:
+                raise AnalysisNotFoundError(analysis_id)
+            rows = conn.execute(
+                f"SELECT period, {', '.join(TREND_COLUMNS)} FROM analysis_trend "
+                f"WHERE {' AND '.join(clauses)} ORDER BY period",
+                params,
+            ).fetchall()
+
+        frame = pd.DataFrame(
+            [tuple(row)[1:] for row in rows],
+            columns=TREND_COLUMNS,
+            index=pd.DatetimeIndex([row["period"] for row in rows], name="date"),
+        )
+        return frame
+
+    def delete(self, analysis_id: str) -> None:
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM analyses WHERE analysis_id = ?",
+                (analysis_id,),
+            ).rowcount
+        if not deleted:
+            raise AnalysisNotFoundError(analysis_id)
+
+    def diff(
+        self,
+        base_id: str,
+        other_id: str,
+        *,
+        changed_only: bool = True,
+    ) -> Dict[str, object]:
+        with self._connect() as conn:
+            summaries = {
+                row["analysis_id"]: _summary_from_row(row)
+                for row in conn.execute(
+                    f"SELECT {', '.join(_SUMMARY_FIELDS)}, feasibility_breakdown, "
+                    "cost_efficiency_breakdown FROM analyses WHERE analysis_id IN (?, ?)",
+                    (base_id, other_id),
+                )
+            }
+            for analysis_id in (base_id, other_id):
+                if analysis_id not in summaries:
+                    raise AnalysisNotFoundError(analysis_id)
+
+            compared = ["licenseno", "fueltypes", *DIFF_NUMERIC_FIELDS, *DIFF_FLAG_FIELDS]
+            columns = ", ".join(
+                f"b.{name} AS base_{name}, o.{name} AS other_{name}" for name in compared
+            )
+            # Both sides are range scans on the (analysis_id, vehicleid) primary key;
+            # the second SELECT adds vehicles that only exist in the other analysis.
+            rows = conn.execute(
+                f"""
+                SELECT b.vehicleid AS vehicleid, {columns}
+                FROM analysis_vehicles b
+                LEFT JOIN analysis_vehicles o
+                    ON o.analysis_id = :other AND o.vehicleid = b.vehicleid
+                WHERE b.analysis_id = :base
+                UNION ALL
+                SELECT o.vehicleid AS vehicleid, {columns}
+                FROM analysis_vehicles o
+                LEFT JOIN analysis_vehicles b
+                    ON b.analysis_id = :base AND b.vehicleid = o.vehicleid
+                WHERE o.analysis_id = :other AND b.vehicleid IS NULL
+                ORDER BY vehicleid
+                """,
+                {"base": base_id, "other": other_id},
+            ).fetchall()
+
+        vehicles: List[Dict[str, object]] = []
+        status_counts = {"added": 0, "removed": 0, "changed": 0, "unchanged": 0}
+        for row in rows:
+            entry = _diff_row(row)
+            status_counts[entry["status"]] += 1
+            if changed_only and entry["status"] == "unchanged":
+                continue
+            vehicles.append(entry)
+
+        base_summary = summaries[base_id]
+        other_summary = summaries[other_id]
+        return {
+            "base": base_summary,
+            "other": other_summary,
+            "feasibility_breakdown_delta": _breakdown_delta(
+                base_summary["feasibility_breakdown"],
+                other_summary["feasibility_breakdown"],
+            ),
+            "cost_efficiency_breakdown_delta": _breakdown_delta(
+                base_summary["cost_efficiency_breakdown"],
+                other_summary["cost_efficiency_breakdown"],
+            ),
+            "vehicle_status_counts": status_counts,
+            "vehicles": vehicles,
+        }
+
+    def _connect(self):
+        if not self._initialised:
+            with connect(self.db_path) as conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            self._initialised = True
+        return connect(self.db_path)
+
+
+def _summary_from_row(row: sqlite3.Row) -> Dict[str, object]:
+    summary: Dict[str, object] = {name: row[name] for name in _SUMMARY_FIELDS}
+    summary["feasibility_breakdown"] = json.loads(row["feasibility_breakdown"] or "{}")
+    summary["cost_efficiency_breakdown"] = json.loads(row["cost_efficiency_breakdown"] or "{}")
+    return summary
+
+
+def _diff_row(row: sqlite3.Row) -> Dict[str, object]:
+    in_base = row["base_tour_count"] is not None
+    in_other = row["other_tour_count"] is not None
+    entry: Dict[str, object] = {
+        "vehicleid": row["vehicleid"],
+        "licenseno": row["other_licenseno"] if in_other else row["base_licenseno"],
+        "fueltypes": row["other_fueltypes"] if in_other else row["base_fueltypes"],
+    }
+    changed = False
+    for name in DIFF_NUMERIC_FIELDS:
+        base_value = row[f"base_{name}"]
+        other_value = row[f"other_{name}"]
+        entry[name] = {
+            "base": base_value,
+            "other": other_value,
+            "delta": (
+                other_value - base_value
+                if base_value is not None and other_value is not None
+                else None
+            ),
+        }
+        changed = changed or base_value != other_value
+    for name in DIFF_FLAG_FIELDS:
+        base_value = row[f"base_{name}"]
+        other_value = row[f"other_{name}"]
+        entry[name] = {"base": base_value, "other": other_value}
+        changed = changed or base_value != other_value
+
+    if not in_base:
+        entry["status"] = "added"
+    elif not in_other:
+        entry["status"] = "removed"
+    else:
+        entry["status"] = "changed" if changed else "unchanged"
+    return entry
+
+
+def _breakdown_delta(base: Dict[str, int], other: Dict[str, int]) -> Dict[str, int]:
+    return {
+        key: int(other.get(key, 0)) - int(base.get(key, 0))
+        for key in sorted(set(base) | set(other))
+    }
+
+
+@lru_cache()
+def get_analysis_store() -> AnalysisStore:
+    return AnalysisStore(database_path())
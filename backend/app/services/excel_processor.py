@@ -1,20 +1,99 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional
+from typing import Any, Callable, Dict, List, Mapping, Optional
 
 import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
 
 from ..config import settings
-
-
-TechnologyKey = Literal["diesel", "lng", "bev"]
-
-
-@dataclass
+from .incremental import VEHICLE_DAY_AGGREGATIONS, VEHICLE_DAY_KEYS, IncrementalState
+from .load_profile import ChargingState, ChargingStateError
+from .soc_simulation import ChargingParameters
+from .statistics import distribution_summary, economy_extremes
+from .trend import (
+    daily_trend_frame,
+    downsample_lttb,
+    resample_trend,
+    trend_records,
+)
+from .types import TechnologyKey, TrendResolution
+from .validation import (
+    INPUT_TOUR_COLUMNS,
+    REQUIRED_TOUR_COLUMNS,
+    InputValidationError,
+    ValidationReport,
+    check_headers,
+    scan_workbook_headers,
+    validate_tours,
+    validate_vehicles,
+)
+
+
+TOUR_COLUMNS = [
+    "tourid",
+    "vehicleid",
+    "starttime",
+    "endtime",
+    "mileage",
+    "fuelconsumption",
+    "estimated electricity consumption (kWh)",
+    "feasible tour",
+    "feasible day",
+    "infeasible day",
+]
+VEHICLE_COLUMNS = ["vehicleid", "licenseno", "fueltypes"]
+
+# Row of each parameter in the TCO-calculation sheet (columns B/C/D = diesel/LNG/BEV).
+TCO_PARAMETER_ROWS = {
+    "vehicle_price": 2,
+    "lifetime_years": 3,
+    "subsidy_pct": 4,
+    "residual_pct": 5,
+    "replacement_value": 6,
+    "maintenance_per_km": 7,
+    "tax": 8,
+    "insurance": 9,
+    "tyre_life_km": 10,
+    "tyre_count": 11,
+    "tyre_cost": 12,
+    "own_fuel_share": 13,
+    "own_fuel_price": 14,
+    "external_fuel_price": 15,
+    "lubricant_pct": 16,
+    "adblue_pct": 17,
+    "adblue_price": 18,
+    "battery_cost": 19,
+    "battery_life_km": 20,
+    "toll_ct_per_km": 21,
+    "toll_share_pct": 22,
+    "interest_pct": 23,
+    "overhead_pct": 24,
+}
+# Checked in this order; a tour is labelled with the first reason that applies.
+OUTLIER_REASONS = (
+    "zero mileage",
+    "negative mileage",
+    "negative fuel",
+    "implausible speed",
+    "consumption outlier",
+)
+# Robust statistics need a few tours per vehicle before they mean anything.
+OUTLIER_MIN_SAMPLE = 5
+# Archived tour columns an incremental run needs to re-judge a vehicle's history.
+HISTORY_COLUMNS = [*INPUT_TOUR_COLUMNS, "outlier"]
+
+TCO_PARAMETER_COLUMNS: Dict[TechnologyKey, int] = {
+    "diesel": 2,
+    "lng": 3,
+    "bev": 4,
+}
+
+
+@dataclass(frozen=True)
 class TechnologyParameters:
     vehicle_price: float
     lifetime_years: float
@@ -43,6 +122,21 @@ class TechnologyParameters:
     def to_dict(self) -> Dict[str, float]:
         return asdict(self)
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TechnologyParameters":
+        names = [item.name for item in fields(cls)]
+        missing = [name for name in names if name not in data]
+        if missing:
+            raise ValueError(f"Missing TCO parameters: {', '.join(missing)}")
+        values: Dict[str, float] = {}
+        for name in names:
+            raw = data[name]
+            try:
+                values[name] = float(raw if raw is not None else 0)
+            except (TypeError, ValueError) as exc:
+                raise ValueError(f"TCO parameter {name!r} is not numeric") from exc
+        return cls(**values)
+
 
 @dataclass
 class VehicleAnalysis:
@@ -115,12 +209,22 @@ class AnalysisPayload:
     both_yes_count: int
     economy_extremes: Dict[str, List[Dict[str, float]]]
     daily_trend: List[Dict[str, float]]
+    trend_resolution: TrendResolution
     tco_parameters: Dict[str, Dict[str, float]]
     insights: Dict[str, str]
+    incremental: Optional[Dict[str, int]] = None
+    charging_simulation: Optional[Dict[str, object]] = None
+    load_profile: Optional[Dict[str, object]] = None
+    tour_quality: Optional[Dict[str, object]] = None
+    distribution: Optional[Dict[str, object]] = None
+    validation: Optional[Dict[str, object]] = None
+    exclude_outliers: bool = False
+    analysis_id: Optional[str] = None
     ai_summary: Optional[Dict[str, Any]] = None
 
     def to_dict(self) -> Dict[str, object]:
         return {
+            "analysis_id": self.analysis_id,
             "energy_limit_kwh": float(self.energy_limit_kwh),
             "period_months": float(self.period_months),
             "start_date": self.start_date,
@@ -136,37 +240,169 @@ class AnalysisPayload:
             "both_yes_count": int(self.both_yes_count),
             "economy_extremes": self.economy_extremes,
             "daily_trend": self.daily_trend,
+            "trend_resolution": self.trend_resolution,
             "tco_parameters": self.tco_parameters,
             "insights": self.insights,
+            "incremental": self.incremental,
+            "charging_simulation": self.charging_simulation,
+            "load_profile": self.load_profile,
+            "tour_quality": self.tour_quality,
+            "distribution": self.distribution,
+            "validation": self.validation,
+            "exclude_outliers": self.exclude_outliers,
             "ai_summary": self.ai_summary,
         }
 
 
+@dataclass(frozen=True)
+class AnalysisOptions:
+    base_state: Optional[IncrementalState] = None
+    # Reads the base analysis's retained tours, as TourArchive.load_columns
+    # does, for vehicles an incremental run has to rebuild from their history.
+    base_tours: Optional[Callable[..., pd.DataFrame]] = None
+    trend_resolution: TrendResolution = "day"
+    trend_max_points: Optional[int] = None
+    # Keyword overrides for ChargingParameters.from_settings; unset values
+    # come from settings, capacity from the energy limit.
+    charging_overrides: Optional[Dict[str, float]] = None
+    load_profile_resolution_minutes: Optional[int] = None
+    # None follows the EXCLUDE_OUTLIERS setting.
+    exclude_outliers: Optional[bool] = None
+    # None follows STATISTICS_TOP_K / STATISTICS_HISTOGRAM_BINS.
+    extremes_k: Optional[int] = None
+    histogram_bins: Optional[int] = None
+
+
 class ExcelProcessor:
-    def __init__(self, workbook_path: Path) -> None:
+    def __init__(
+        self,
+        workbook_path: Path,
+        tco_parameters: Optional[Mapping[TechnologyKey, TechnologyParameters]] = None,
+        energy_limit_kwh: Optional[float] = None,
+        options: Optional[AnalysisOptions] = None,
+    ) -> None:
         self.workbook_path = Path(workbook_path)
+        # Parameters from a stored profile replace the TCO-calculation sheet entirely.
+        self.tco_parameters = tco_parameters
+        self.energy_limit_kwh = energy_limit_kwh
+        self.options = options or AnalysisOptions()
+        self.state: Optional[IncrementalState] = None
+        self.enriched_tours: Optional[pd.DataFrame] = None
+        # Vehicles whose whole history is in enriched_tours (incremental runs).
+        self.replaced_vehicles: List[int] = []
 
     def analyse(self) -> AnalysisPayload:
+        validation = ValidationReport()
+        self._check_headers(validation)
         energy_limit, period_months, tco_params = self._read_parameters()
-        tours_df = self._load_tours()
-        vehicles_df = self._load_vehicles()
+        vehicles_df = validate_vehicles(
+            self._load_vehicles(), validation, settings.validation_sample_rows
+        )
+        known_vehicles = vehicles_df
+        exclude_outliers = self._exclude_outliers()
+        outlier_thresholds = self._outlier_thresholds()
+        if self.options.base_state is not None:
+            # Checked before any tour is read; extend() checks again on merge.
+            self.options.base_state.check_compatible(
+                energy_limit_kwh=energy_limit,
+                exclude_outliers=exclude_outliers,
+                outlier_thresholds=outlier_thresholds,
+            )
+            known_vehicles = pd.concat([self.options.base_state.vehicles, vehicles_df])
+        tours_df = validate_tours(
+            self._load_tours(),
+            known_vehicles["vehicleid"],
+            validation,
+            settings.validation_sample_rows,
+        )
+        if tours_df.empty:
+            raise InputValidationError(
+                f"No valid tours to analyse ({validation.tours_quarantined} of "
+                f"{validation.tours_checked} quarantined)"
+            )
+
+        incremental_summary: Optional[Dict[str, int]] = None
+        history: Optional[pd.DataFrame] = None
+        if self.options.base_state is None:
+            statistics = self._consumption_statistics(self._consumption_sample(tours_df))
+        else:
+            tours_df, incremental_summary = self.options.base_state.select_new_tours(tours_df)
+            statistics, rejudged = self._merged_statistics(tours_df)
+            rebuilt = self._late_vehicles(tours_df)
+            history = self._load_history(np.union1d(rejudged, rebuilt))
+        if history is not None:
+            tours_df = pd.concat(
+                [
+                    tours_df.assign(_ingested=True),
+                    history.rename(columns={"outlier": "_archived_outlier"}).assign(
+                        _ingested=False
+                    ),
+                ],
+                ignore_index=True,
+            )
 
         tours_df = self._prepare_tours(
             tours=tours_df,
-            vehicles=vehicles_df,
+            vehicles=known_vehicles,
             energy_limit=energy_limit,
+            statistics=statistics,
         )
-
-        if not period_months or period_months <= 0:
-            period_months = self._infer_period_months(tours_df)
+        ingested = pd.Series(True, index=tours_df.index)
+        if history is not None:
+            tours_df, ingested = self._keep_changed_history(tours_df, rebuilt)
 
         tours_df["feasible tour"] = tours_df["feasible tour"].fillna(0).astype(int)
         tours_df["feasible day"] = tours_df["feasible day"].fillna(0).astype(int)
         tours_df["infeasible day"] = tours_df["infeasible day"].fillna(0).astype(int)
+        self.enriched_tours = tours_df
+        tour_quality = self._summarise_tour_quality(
+            tours_df[ingested.to_numpy()], excluded=exclude_outliers
+        )
 
-        vehicle_totals = self._aggregate_vehicle_metrics(tours_df)
+        counted_tours = tours_df[tours_df["outlier"] == 0] if exclude_outliers else tours_df
+        vehicle_days = self._aggregate_vehicle_days(counted_tours)
+        tour_ids = pd.Index(tours_df["tourid"].dropna().unique())
+        consumption = self._consumption_sample(tours_df[ingested.to_numpy()])
+        charging = self._simulate_charging(counted_tours, energy_limit)
+        if self.options.base_state is not None:
+            state = self.options.base_state.extend(
+                energy_limit_kwh=energy_limit,
+                exclude_outliers=exclude_outliers,
+                outlier_thresholds=outlier_thresholds,
+                vehicle_days=vehicle_days,
+                vehicles=vehicles_df,
+                tour_ids=tour_ids,
+                consumption=consumption,
+                outlier_statistics=statistics,
+                charging=charging,
+                replaced_vehicles=self.replaced_vehicles,
+            )
+            vehicle_days = state.vehicle_days
+            vehicles_df = state.vehicles
+        else:
+            state = IncrementalState(
+                energy_limit_kwh=energy_limit,
+                vehicle_days=vehicle_days,
+                vehicles=vehicles_df,
+                tour_ids=tour_ids,
+                exclude_outliers=exclude_outliers,
+                outlier_thresholds=outlier_thresholds,
+                consumption=consumption,
+                outlier_statistics=statistics,
+                charging=charging,
+            )
+        if vehicle_days.empty:
+            raise InputValidationError(
+                f"All tours were excluded as outliers ({int(tours_df['outlier'].sum())} flagged)"
+            )
+        self.state = state
+
+        if not period_months or period_months <= 0:
+            period_months = self._infer_period_months(vehicle_days)
+
+        vehicle_totals = self._aggregate_vehicle_metrics(vehicle_days)
         vehicle_totals = vehicle_totals.join(
-            self._aggregate_daily_flags(tours_df),
+            self._aggregate_daily_flags(vehicle_days, energy_limit),
             how="left",
         )
         vehicle_totals[["feasible_days", "infeasible_days"]] = (
@@ -222,65 +458,48 @@ class ExcelProcessor:
         fuel_summary["avg_economy"] = fuel_summary["avg_economy"].round(2)
         fuel_summary["total_economy"] = fuel_summary["total_economy"].round(2)
 
-        daily_trend = (
-            tours_df.groupby("date")
-            .agg(
-                tour_count=("tourid", "count"),
-                mileage_sum=("mileage", "sum"),
-                fuel_sum=("fuelconsumption", "sum"),
-                energy_sum=("estimated electricity consumption (kWh)", "sum"),
-                feasible_rate=("feasible tour", lambda x: float((x == 1).mean())),
-            )
-            .reset_index()
+        daily_frame = daily_trend_frame(vehicle_days)
+        trend_frame = downsample_lttb(
+            resample_trend(daily_frame, self.options.trend_resolution),
+            self.options.trend_max_points,
         )
-        daily_trend["date"] = daily_trend["date"].astype(str)
+        daily_trend = trend_records(trend_frame, self.options.trend_resolution)
 
-        economy_sorted = vehicles_df.sort_values("economy_per_year")
-        economy_extremes = {
-            "top_savers": economy_sorted.tail(5)[
-                [
-                    "vehicleid",
-                    "licenseno",
-                    "fueltypes",
-                    "economy_per_year",
-                    "cost_bev",
-                ]
-            ]
-            .sort_values("economy_per_year", ascending=False)
-            .to_dict("records"),
-            "top_risks": economy_sorted.head(5)[
-                [
-                    "vehicleid",
-                    "licenseno",
-                    "fueltypes",
-                    "economy_per_year",
-                    "cost_bev",
-                ]
-            ]
-            .to_dict("records"),
-        }
+        economy = economy_extremes(
+            vehicles_df,
+            self.options.extremes_k or settings.statistics_top_k,
+        )
+        distribution = distribution_summary(
+            vehicles_df,
+            self.options.histogram_bins or settings.statistics_histogram_bins,
+        )
 
         insights = self._build_insights(
             fuel_summary=fuel_summary,
             feasibility_counts=feasibility_counts,
             cost_efficiency_counts=cost_efficiency_counts,
             both_yes_count=both_yes_count,
-            economy_extremes=economy_extremes,
+            economy_extremes=economy,
             tco_params=tco_params,
             energy_limit=energy_limit,
         )
 
+        charging_simulation: Optional[Dict[str, object]] = None
+        load_profile: Optional[Dict[str, object]] = None
+        if charging is not None:
+            charging_simulation, load_profile = charging.sections(
+                self.options.load_profile_resolution_minutes
+            )
+
         payload = AnalysisPayload(
             energy_limit_kwh=energy_limit,
             period_months=period_months,
-            start_date=str(min(daily_trend["date"], default="")),
-            end_date=str(max(daily_trend["date"], default="")),
+            start_date=_format_date(daily_frame.index.min()),
+            end_date=_format_date(daily_frame.index.max()),
             total_vehicles=len(results),
-            total_tours=int(len(tours_df)),
-            total_mileage=float(tours_df["mileage"].sum()),
-            total_energy_kwh=float(
-                tours_df["estimated electricity consumption (kWh)"].sum()
-            ),
+            total_tours=int(vehicle_days["row_count"].sum()),
+            total_mileage=float(vehicle_days["mileage"].sum()),
+            total_energy_kwh=float(vehicle_days["energy_kwh"].sum()),
             vehicles=results,
             fuel_summary=fuel_summary.to_dict("records"),
             feasibility_breakdown={k: int(v) for k, v in feasibility_counts.items()},
@@ -288,31 +507,117 @@ class ExcelProcessor:
                 k: int(v) for k, v in cost_efficiency_counts.items()
             },
             both_yes_count=both_yes_count,
-            economy_extremes=economy_extremes,
-            daily_trend=daily_trend.round(2).to_dict("records"),
+            economy_extremes=economy,
+            daily_trend=daily_trend,
+            trend_resolution=self.options.trend_resolution,
             tco_parameters={k: v.to_dict() for k, v in tco_params.items()},
             insights=insights,
+            incremental=incremental_summary,
+            charging_simulation=charging_simulation,
+            load_profile=load_profile,
+            tour_quality=tour_quality,
+            distribution=distribution,
+            validation=validation.to_dict(),
+            exclude_outliers=exclude_outliers,
         )
         return payload
 
+    def _merged_statistics(
+        self, tours: pd.DataFrame
+    ) -> tuple[Optional[pd.DataFrame], np.ndarray]:
+        """Outlier statistics over base and new tours, and the vehicles to re-judge.
+
+        An archived tour's flag only changes when the merged median, MAD or
+        sample size moves it across the threshold. That is checked against
+        the consumption sample and statistics kept in the base state, so the
+        archive is read for those vehicles alone. Without them every touched
+        vehicle is re-judged from its history.
+        """
+        base = self.options.base_state
+        vehicleids = tours["vehicleid"].unique()
+        if base.consumption is None or base.outlier_statistics is None:
+            return None, vehicleids
+        archived = base.consumption[base.consumption.index.isin(vehicleids)]
+        statistics = self._consumption_statistics(
+            pd.concat([archived, self._consumption_sample(tours)])
+        )
+        before = self._consumption_outliers(archived, base.outlier_statistics)
+        after = self._consumption_outliers(archived, statistics)
+        return statistics, archived.index[before != after].unique().to_numpy()
+
+    def _late_vehicles(self, tours: pd.DataFrame) -> np.ndarray:
+        """Vehicles with new tours before their last simulated one.
+
+        Their SoC cannot continue from the stored end state, so they are
+        re-simulated from their whole history.
+        """
+        charging = self.options.base_state.charging
+        if charging is None:
+            return np.array([], dtype=np.int64)
+        return charging.late_vehicles(tours)
+
+    def _simulate_charging(
+        self, tours: pd.DataFrame, energy_limit: float
+    ) -> Optional[ChargingState]:
+        parameters = ChargingParameters.from_settings(
+            energy_limit,
+            **(self.options.charging_overrides or {}),
+        )
+        base = self.options.base_state
+        if base is None:
+            return ChargingState.simulate(tours, parameters)
+        if base.charging is None or base.charging.parameters != parameters:
+            # Nothing to continue from; the caller re-simulates over the
+            # retained tour history instead.
+            return None
+        try:
+            return base.charging.extend(tours, rebuilt=self.replaced_vehicles)
+        except ChargingStateError:
+            # Late tours of a base without retained history.
+            return None
+
+    def _load_history(self, vehicleids: np.ndarray) -> Optional[pd.DataFrame]:
+        if self.options.base_tours is None or not len(vehicleids):
+            return None
+        history = self.options.base_tours(
+            HISTORY_COLUMNS,
+            vehicleids=[int(vehicleid) for vehicleid in vehicleids],
+        )
+        return history if not history.empty else None
+
+    def _keep_changed_history(
+        self, tours: pd.DataFrame, rebuilt: np.ndarray
+    ) -> tuple[pd.DataFrame, pd.Series]:
+        """Keep the new tours plus the full history of vehicles that are rebuilt.
+
+        Medians and MADs now include the new tours, so some archived tours
+        may be judged differently than before. Those vehicles, and the
+        ``rebuilt`` ones whose SoC has to be simulated again, are rebuilt
+        from their whole history. That keeps flags and totals identical to
+        a full analysis of the same tours; all other vehicles only add their
+        new tours.
+        """
+        archived = ~tours["_ingested"].astype(bool)
+        changed = archived & (tours["_archived_outlier"] != tours["outlier"])
+        self.replaced_vehicles = sorted(
+            {int(v) for v in tours.loc[changed, "vehicleid"].unique()}
+            | {int(v) for v in rebuilt}
+        )
+        keep = ~archived | tours["vehicleid"].isin(self.replaced_vehicles)
+        kept = tours.loc[keep].reset_index(drop=True)
+        ingested = kept["_ingested"].astype(bool)
+        return kept.drop(columns=["_ingested", "_archived_outlier"]), ingested
+
     def _prepare_tours(
         self,
         *,
         tours: pd.DataFrame,
         vehicles: pd.DataFrame,
         energy_limit: float,
+        statistics: Optional[pd.DataFrame] = None,
     ) -> pd.DataFrame:
+        # validate_tours has already typed the columns and quarantined bad rows.
         df = tours.copy()
-
-        df["starttime"] = (
-            pd.to_datetime(df["starttime"], errors="coerce", utc=True)
-            .dt.tz_convert(None)
-        )
-        df["endtime"] = (
-            pd.to_datetime(df.get("endtime"), errors="coerce", utc=True)
-            .dt.tz_convert(None)
-        )
-        df = df.dropna(subset=["starttime"])
         df["date"] = df["starttime"].dt.date
 
         vehicles_map = (
@@ -328,12 +633,10 @@ class ExcelProcessor:
         }
         df["_fuel_multiplier"] = df["_fueltypes"].map(multipliers).fillna(0.0)
 
-        df["fuelconsumption"] = pd.to_numeric(df["fuelconsumption"], errors="coerce")
-        df["mileage"] = pd.to_numeric(df["mileage"], errors="coerce")
-
         df["estimated electricity consumption (kWh)"] = (
             df["fuelconsumption"].fillna(0.0) * df["_fuel_multiplier"]
         )
+        self._enrich_tours(df, statistics)
 
         energy_series = df["estimated electricity consumption (kWh)"]
         df["feasibility by tourid"] = np.where(
@@ -355,11 +658,12 @@ class ExcelProcessor:
         df = df.sort_values(["vehicleid", "date", "starttime", "tourid"]).reset_index(drop=True)
 
         grouped_keys = ["vehicleid", "date"]
-        daily_energy = (
-            df.groupby(grouped_keys)["estimated electricity consumption (kWh)"]
-            .transform("sum")
-        )
-        df["_daily_total_energy"] = daily_energy
+        daily_source = df["estimated electricity consumption (kWh)"]
+        if self._exclude_outliers():
+            daily_source = daily_source.where(df["outlier"] == 0, 0.0)
+        df["_daily_total_energy"] = daily_source.groupby(
+            [df["vehicleid"], df["date"]]
+        ).transform("sum")
 
         sequence = df.groupby(grouped_keys).cumcount()
         group_sizes = df.groupby(grouped_keys)["tourid"].transform("size")
@@ -390,11 +694,121 @@ class ExcelProcessor:
         return df
 
     @staticmethod
-    def _infer_period_months(tours_df: pd.DataFrame) -> float:
-        if tours_df.empty:
+    def _enrich_tours(df: pd.DataFrame, statistics: Optional[pd.DataFrame] = None) -> None:
+        """Add duration, speed and consumption columns and flag implausible tours.
+
+        Consumption outliers are judged per vehicle with the robust z-score
+        ``0.6745 * |x - median| / MAD`` (grouped medians, linear in rows).
+        ``statistics`` replaces the per-vehicle median/MAD of ``df`` when
+        the vehicles' full history is not in the frame. Zero or negative
+        mileage, negative fuel and implausible speeds are flagged outright;
+        a missing mileage is not. ``outlier reason`` keeps the first
+        matching reason.
+        """
+        duration = (df["endtime"] - df["starttime"]).dt.total_seconds() / 3600.0
+        duration = duration.where(duration > 0)
+        mileage = df["mileage"]
+        df["duration (h)"] = duration
+        df["average speed (km/h)"] = mileage.div(duration).where(mileage > 0)
+        df["consumption (per 100 km)"] = ExcelProcessor._consumption(df)
+
+        consumption = df["consumption (per 100 km)"].set_axis(df["vehicleid"].to_numpy())
+        if statistics is None:
+            statistics = ExcelProcessor._consumption_statistics(consumption.dropna())
+        consumption_outlier = ExcelProcessor._consumption_outliers(consumption, statistics)
+
+        reasons = np.select(
+            [
+                (mileage == 0).to_numpy(),
+                (mileage < 0).to_numpy(),
+                (df["fuelconsumption"] < 0).to_numpy(),
+                (df["average speed (km/h)"] > settings.max_average_speed_kmh).to_numpy(),
+                consumption_outlier,
+            ],
+            list(OUTLIER_REASONS),
+            default="",
+        )
+        df["outlier reason"] = reasons
+        df["outlier"] = (reasons != "").astype(int)
+
+    @staticmethod
+    def _consumption(tours: pd.DataFrame) -> pd.Series:
+        mileage = tours["mileage"]
+        return tours["fuelconsumption"].div(mileage.where(mileage > 0)).mul(100.0)
+
+    @staticmethod
+    def _consumption_sample(tours: pd.DataFrame) -> pd.Series:
+        """Known per-100 km consumption of ``tours``, indexed by vehicleid."""
+        return (
+            ExcelProcessor._consumption(tours)
+            .set_axis(tours["vehicleid"].to_numpy())
+            .dropna()
+        )
+
+    @staticmethod
+    def _consumption_statistics(sample: pd.Series) -> pd.DataFrame:
+        by_vehicle = sample.groupby(level=0)
+        median = by_vehicle.median()
+        deviation = (sample - median.reindex(sample.index).to_numpy()).abs()
+        return pd.DataFrame(
+            {
+                "median": median,
+                "mad": deviation.groupby(level=0).median(),
+                "sample": by_vehicle.count(),
+            }
+        )
+
+    @staticmethod
+    def _consumption_outliers(consumption: pd.Series, statistics: pd.DataFrame) -> np.ndarray:
+        # Vehicles missing from statistics have no sample and flag nothing.
+        per_tour = statistics.reindex(consumption.index)
+        mad = per_tour["mad"].to_numpy()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            robust_z = (
+                0.6745 * np.abs(consumption.to_numpy() - per_tour["median"].to_numpy())
+            ) / np.where(mad > 0, mad, np.nan)
+        return (per_tour["sample"].to_numpy() >= OUTLIER_MIN_SAMPLE) & (
+            robust_z > settings.outlier_mad_threshold
+        )
+
+    def _exclude_outliers(self) -> bool:
+        if self.options.exclude_outliers is None:
+            return settings.exclude_outliers
+        return self.options.exclude_outliers
+
+    @staticmethod
+    def _outlier_thresholds() -> Dict[str, float]:
+        return {
+            "mad_threshold": float(settings.outlier_mad_threshold),
+            "max_average_speed_kmh": float(settings.max_average_speed_kmh),
+            "min_sample": float(OUTLIER_MIN_SAMPLE),
+        }
+
+    @staticmethod
+    def _summarise_tour_quality(tours: pd.DataFrame, *, excluded: bool) -> Dict[str, object]:
+        # Incremental runs describe the newly ingested tours only.
+        reasons = tours.loc[tours["outlier"] == 1, "outlier reason"].value_counts()
+        medians = tours[
+            ["duration (h)", "average speed (km/h)", "consumption (per 100 km)"]
+        ].median()
+        return {
+            "tours_checked": int(len(tours)),
+            "outlier_tours": int(tours["outlier"].sum()),
+            "excluded_from_tco": excluded,
+            "by_reason": {reason: int(reasons.get(reason, 0)) for reason in OUTLIER_REASONS},
+            "median_duration_h": _rounded(medians["duration (h)"]),
+            "median_speed_kmh": _rounded(medians["average speed (km/h)"]),
+            "median_consumption_per_100km": _rounded(medians["consumption (per 100 km)"]),
+            "mad_threshold": settings.outlier_mad_threshold,
+            "max_average_speed_kmh": settings.max_average_speed_kmh,
+        }
+
+    @staticmethod
+    def _infer_period_months(vehicle_days: pd.DataFrame) -> float:
+        if vehicle_days.empty:
             return 0.0
-        start = tours_df["starttime"].min()
-        end = tours_df["starttime"].max()
+        start = vehicle_days["first_start"].min()
+        end = vehicle_days["last_start"].max()
         if pd.isna(start) or pd.isna(end):
             return 0.0
         delta_days = (end - start).days
@@ -471,6 +885,18 @@ class ExcelProcessor:
             ),
         }
 
+    def read_tco_parameters(self) -> Dict[TechnologyKey, TechnologyParameters]:
+        wb = load_workbook(
+            filename=self.workbook_path,
+            read_only=True,
+            data_only=True,
+            keep_vba=True,
+        )
+        try:
+            return self._read_tco_sheet(wb)
+        finally:
+            wb.close()
+
     def _read_parameters(self) -> tuple[float, Optional[float], Dict[TechnologyKey, TechnologyParameters]]:
         wb = load_workbook(
             filename=self.workbook_path,
@@ -481,11 +907,14 @@ class ExcelProcessor:
         try:
             tours_sheet = wb["tours"]
             raw_energy_limit = tours_sheet["AE1"].value
-            energy_limit = (
-                float(raw_energy_limit)
-                if raw_energy_limit not in (None, "")
-                else settings.default_energy_limit_kwh
-            )
+            if self.energy_limit_kwh is not None:
+                energy_limit = float(self.energy_limit_kwh)
+            elif raw_energy_limit not in (None, ""):
+                energy_limit = _cell_number(
+                    raw_energy_limit, sheet="tours", cell="AE1", field="energy limit (kWh)"
+                )
+            else:
+                energy_limit = settings.default_energy_limit_kwh
 
             raw_period_months = tours_sheet["AG3"].value
             period_months: Optional[float]
@@ -497,83 +926,99 @@ class ExcelProcessor:
                 except (TypeError, ValueError):
                     period_months = None
 
-            tco_sheet = wb["TCO-calculation"]
-            rows_map = {
-                "vehicle_price": 2,
-                "lifetime_years": 3,
-                "subsidy_pct": 4,
-                "residual_pct": 5,
-                "replacement_value": 6,
-                "maintenance_per_km": 7,
-                "tax": 8,
-                "insurance": 9,
-                "tyre_life_km": 10,
-                "tyre_count": 11,
-                "tyre_cost": 12,
-                "own_fuel_share": 13,
-                "own_fuel_price": 14,
-                "external_fuel_price": 15,
-                "lubricant_pct": 16,
-                "adblue_pct": 17,
-                "adblue_price": 18,
-                "battery_cost": 19,
-                "battery_life_km": 20,
-                "toll_ct_per_km": 21,
-                "toll_share_pct": 22,
-                "interest_pct": 23,
-                "overhead_pct": 24,
-            }
-            col_map: Dict[TechnologyKey, str] = {
-                "diesel": "B",
-                "lng": "C",
-                "bev": "D",
-            }
-
-            parameters: Dict[TechnologyKey, TechnologyParameters] = {}
-            for key, col in col_map.items():
-                values = {
-                    field: float(tco_sheet[f"{col}{row}"].value or 0)
-                    for field, row in rows_map.items()
-                }
-                parameters[key] = TechnologyParameters(**values)
+            if self.tco_parameters is not None:
+                parameters = dict(self.tco_parameters)
+            else:
+                parameters = self._read_tco_sheet(wb)
         finally:
             wb.close()
 
         return energy_limit, period_months, parameters
 
+    @staticmethod
+    def _read_tco_sheet(wb) -> Dict[TechnologyKey, TechnologyParameters]:
+        # Read-only worksheets re-scan the sheet for every random cell lookup, so
+        # the whole B2:D24 block is pulled in a single row pass instead.
+        tco_sheet = wb["TCO-calculation"]
+        first_row = min(TCO_PARAMETER_ROWS.values())
+        last_row = max(TCO_PARAMETER_ROWS.values())
+        first_col = min(TCO_PARAMETER_COLUMNS.values())
+        last_col = max(TCO_PARAMETER_COLUMNS.values())
+        block = {
+            first_row + offset: row
+            for offset, row in enumerate(
+                tco_sheet.iter_rows(
+                    min_row=first_row,
+                    max_row=last_row,
+                    min_col=first_col,
+                    max_col=last_col,
+                    values_only=True,
+                )
+            )
+        }
+
+        parameters: Dict[TechnologyKey, TechnologyParameters] = {}
+        for key, col in TCO_PARAMETER_COLUMNS.items():
+            values = {}
+            for field, row in TCO_PARAMETER_ROWS.items():
+                cells = block.get(row) or ()
+                index = col - first_col
+                value = cells[index] if index < len(cells) else None
+                values[field] = _cell_number(
+                    value or 0,
+                    sheet="TCO-calculation",
+                    cell=f"{get_column_letter(col)}{row}",
+                    field=f"{key} {field}",
+                )
+            parameters[key] = TechnologyParameters(**values)
+        return parameters
+
+    def _check_headers(self, report: ValidationReport) -> None:
+        sheets = ["tours", "vehicles"]
+        if self.tco_parameters is None:
+            sheets.append("TCO-calculation")
+        headers = scan_workbook_headers(self.workbook_path, sheets)
+        check_headers(
+            headers["tours"],
+            sheet="tours",
+            required=REQUIRED_TOUR_COLUMNS,
+            expected=INPUT_TOUR_COLUMNS,
+            report=report,
+        )
+        check_headers(
+            headers["vehicles"],
+            sheet="vehicles",
+            required=VEHICLE_COLUMNS,
+            expected=VEHICLE_COLUMNS,
+            report=report,
+        )
+
     def _load_tours(self) -> pd.DataFrame:
-        base_columns = [
-            "tourid",
-            "vehicleid",
-            "starttime",
-            "endtime",
-            "mileage",
-            "fuelconsumption",
-            "estimated electricity consumption (kWh)",
-            "feasible tour",
-            "feasible day",
-            "infeasible day",
-        ]
+        # The tours sheet also carries the AE/AG parameter cells; skip those columns.
         df = pd.read_excel(
             self.workbook_path,
             sheet_name="tours",
+            usecols=lambda name: name in TOUR_COLUMNS,
         )
-
-        missing_columns = [col for col in base_columns if col not in df.columns]
-        for col in missing_columns:
-            df[col] = np.nan
-
-        return df[base_columns]
+        return self._conform_tours(df)
 
     def _load_vehicles(self) -> pd.DataFrame:
         df = pd.read_excel(
             self.workbook_path,
             sheet_name="vehicles",
-            usecols=["vehicleid", "licenseno", "fueltypes"],
+            usecols=VEHICLE_COLUMNS,
         )
         df["fueltypes"] = df["fueltypes"].apply(self._normalise_fuel_type)
         return df
 
+    @staticmethod
+    def _conform_tours(df: pd.DataFrame) -> pd.DataFrame:
+        missing_columns = [col for col in TOUR_COLUMNS if col not in df.columns]
+        for col in missing_columns:
+            df[col] = np.nan
+
+        return df[TOUR_COLUMNS]
+
     @staticmethod
     def _normalise_fuel_type(value: Optional[str]) -> str:
         if not isinstance(value, str):
@@ -592,17 +1037,35 @@ class ExcelProcessor:
         return text
 
     @staticmethod
-    def _aggregate_vehicle_metrics(df: pd.DataFrame) -> pd.DataFrame:
-        grouped = df.groupby("vehicleid").agg(
-            total_mileage=("mileage", "sum"),
-            total_fuel=("fuelconsumption", "sum"),
+    def _aggregate_vehicle_days(df: pd.DataFrame) -> pd.DataFrame:
+        # Per-(vehicle, day) sums are the unit every downstream total is built
+        # from, which is what lets an incremental run merge new days in.
+        grouped = df.groupby(VEHICLE_DAY_KEYS).agg(
             tour_count=("tourid", "count"),
-            feasible_tours=("feasible tour", lambda x: int((x == 1).sum())),
-            infeasible_tours=("feasible tour", lambda x: int((x == 0).sum())),
-            total_energy_kwh=(
-                "estimated electricity consumption (kWh)",
-                "sum",
-            ),
+            row_count=("vehicleid", "size"),
+            mileage=("mileage", "sum"),
+            fuel=("fuelconsumption", "sum"),
+            energy_kwh=("estimated electricity consumption (kWh)", "sum"),
+            feasible_tours=("feasible tour", "sum"),
+            first_start=("starttime", "min"),
+            last_start=("starttime", "max"),
+        )
+        return grouped[list(VEHICLE_DAY_AGGREGATIONS)]
+
+    @staticmethod
+    def _aggregate_vehicle_metrics(vehicle_days: pd.DataFrame) -> pd.DataFrame:
+        per_vehicle = vehicle_days.groupby(level="vehicleid").sum(numeric_only=True)
+        grouped = pd.DataFrame(
+            {
+                "total_mileage": per_vehicle["mileage"],
+                "total_fuel": per_vehicle["fuel"],
+                "tour_count": per_vehicle["tour_count"].astype(int),
+                "feasible_tours": per_vehicle["feasible_tours"].astype(int),
+                "infeasible_tours": (
+                    per_vehicle["row_count"] - per_vehicle["feasible_tours"]
+                ).astype(int),
+                "total_energy_kwh": per_vehicle["energy_kwh"],
+            }
         )
         grouped["avg_consumption_per_100km"] = (
             grouped["total_fuel"]
@@ -618,12 +1081,15 @@ class ExcelProcessor:
         return grouped
 
     @staticmethod
-    def _aggregate_daily_flags(df: pd.DataFrame) -> pd.DataFrame:
-        flagged = df.groupby("vehicleid").agg(
-            feasible_days=("feasible day", lambda x: int((x == 1).sum())),
-            infeasible_days=("infeasible day", lambda x: int((x == 1).sum())),
+    def _aggregate_daily_flags(vehicle_days: pd.DataFrame, energy_limit: float) -> pd.DataFrame:
+        energy = vehicle_days["energy_kwh"]
+        flags = pd.DataFrame(
+            {
+                "feasible_days": (energy <= energy_limit).astype(int),
+                "infeasible_days": (energy > energy_limit).astype(int),
+            }
         )
-        return flagged
+        return flags.groupby(level="vehicleid").sum()
 
     def _compute_vehicle_row(
         self,
@@ -797,3 +1263,22 @@ class ExcelProcessor:
                 return avg_consumption * 7.0
             return 0.0
         return 0.0
+
+
+def _cell_number(value: Any, *, sheet: str, cell: str, field: str) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError) as exc:
+        raise InputValidationError(
+            f"{sheet}!{cell} ({field}) must be a number, got {value!r}"
+        ) from exc
+
+
+def _format_date(value: Any) -> str:
+    if value is None or pd.isna(value):
+        return ""
+    return value.strftime("%Y-%m-%d")
+
+
+def _rounded(value: float) -> Optional[float]:
+    return round(float(value), 2) if pd.notna(value) else None
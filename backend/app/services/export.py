@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Iterable, Iterator, List
+
+import pandas as pd
+
+from .types import ExportFormat
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Excel's hard row limit per sheet, header included.
+XLSX_MAX_ROWS = 1_048_576
+
+_FILE_CHUNK_BYTES = 1024 * 1024
+
+
+def iter_export(
+    fmt: ExportFormat,
+    sheet_title: str,
+    columns: List[str],
+    batches: Iterable[pd.DataFrame],
+) -> Iterator[bytes]:
+    if fmt == "xlsx":
+        return iter_xlsx(sheet_title, columns, batches)
+    return iter_csv(columns, batches)
+
+
+def iter_csv(columns: List[str], batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Encode batches as CSV one at a time; only the current batch is held."""
+    yield pd.DataFrame(columns=columns).to_csv(index=False).encode("utf-8")
+    for batch in batches:
+        if batch.empty:
+            continue
+        # reindex: segments archived before a column existed export it empty.
+        yield batch.reindex(columns=columns).to_csv(header=False, index=False).encode("utf-8")
+
+
+def iter_xlsx(
+    sheet_title: str,
+    columns: List[str],
+    batches: Iterable[pd.DataFrame],
+) -> Iterator[bytes]:
+    """Write batches through openpyxl's write-only mode and stream the saved file.
+
+    Write-only worksheets spool rows to disk, and the finished zip is read
+    back in fixed-size chunks, so memory stays bounded by one batch. Rows
+    beyond Excel's sheet limit continue on ``<title> (2)``, ``<title> (3)``, ...
+    """
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet_number = 1
+    sheet = workbook.create_sheet(title=sheet_title)
+    sheet.append(columns)
+    sheet_rows = 1
+
+    for batch in batches:
+        if batch.empty:
+            continue
+        # NaN/NaT are not valid cell values; write them as empty cells.
+        frame = batch.reindex(columns=columns)
+        frame = frame.astype(object).where(frame.notna(), None)
+        for row in frame.itertuples(index=False, name=None):
+            if sheet_rows >= XLSX_MAX_ROWS:
+                sheet_number += 1
+                sheet = workbook.create_sheet(title=f"{sheet_title} ({sheet_number})")
+                sheet.append(columns)
+                sheet_rows = 1
+            sheet.append(row)
+            sheet_rows += 1
+
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        workbook.save(path)
+        with open(path, "rb") as saved:
+            while chunk := saved.read(_FILE_CHUNK_BYTES):
+                yield chunk
+    finally:
+        os.unlink(path)
+
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .excel_processor import TechnologyParameters
+from .types import TechnologyKey
+
+CANDIDATE_COLUMNS = ["vehicleid", "licenseno", "fueltypes", "economy_per_year", "capex"]
+
+
+class OptimisationError(ValueError):
+    """Raised when conversion candidates or budgets are invalid."""
+
+
+def conversion_capex(tco_parameters: Mapping[TechnologyKey, TechnologyParameters]) -> float:
+    """Net BEV purchase price, using the same subsidy base as the TCO calculation."""
+    bev = tco_parameters["bev"]
+    base_price = tco_parameters["diesel"].vehicle_price
+    subsidy = max(bev.vehicle_price - base_price, 0.0) * bev.subsidy_pct / 100.0
+    return float(bev.vehicle_price - subsidy)
+
+
+def conversion_candidates(
+    vehicles: pd.DataFrame,
+    capex: float,
+    *,
+    opportunity_feasible: Optional[pd.Series] = None,
+    opportunity_surcharge: Optional[float] = None,
+) -> pd.DataFrame:
+    """Vehicles worth converting: feasible and saving money once electrified.
+
+    With a surcharge and the SoC simulation's opportunity feasibility, vehicles
+    that only work with opportunity charging become candidates at a higher capex.
+    """
+    frame = vehicles.assign(capex=capex)
+    feasible = frame["feasibility_flag"] == "yes"
+    if opportunity_surcharge is not None and opportunity_feasible is not None:
+        via_opportunity = ~feasible & frame["vehicleid"].map(opportunity_feasible).eq(True)
+        frame.loc[via_opportunity, "capex"] = capex + opportunity_surcharge
+        feasible = feasible | via_opportunity
+    return frame.loc[feasible & (frame["economy_per_year"] > 0), CANDIDATE_COLUMNS].reset_index(
+        drop=True
+    )
+
+
+def optimise_conversions(
+    candidates: pd.DataFrame,
+    budget: float,
+    *,
+    frontier_points: int = 20,
+) -> Dict[str, object]:
+    """Best conversion set for ``budget`` plus a savings-vs-budget frontier.
+
+    Within one capex class, "highest savings first" is optimal, so a class
+    contributes a prefix of its sorted savings. One class (uniform capex) is
+    then a single prefix sum. Two classes (depot vs opportunity vehicles, the
+    only ones ``conversion_candidates`` produces) are solved exactly by trying
+    every prefix length of the first class, fully vectorised. More classes
+    would make it a general 0/1 knapsack and are rejected.
+    """
+    if budget < 0:
+        raise OptimisationError("Budget must not be negative")
+    if frontier_points < 2:
+        raise OptimisationError("Frontier needs at least two budget levels")
+    if (candidates["capex"] <= 0).any():
+        raise OptimisationError("Conversion capex must be positive")
+    classes = np.unique(candidates["capex"].to_numpy(dtype=np.float64))
+    if len(classes) > 2:
+        raise OptimisationError("Candidates must share at most two capex values")
+
+    savings = candidates["economy_per_year"].to_numpy(dtype=np.float64)
+    costs = candidates["capex"].to_numpy(dtype=np.float64)
+    total_capex = float(costs.sum())
+    levels = np.linspace(0.0, max(budget, total_capex), frontier_points)
+
+    if len(classes) <= 1:
+        method = "greedy"
+        selected, frontier = _greedy(savings, costs, budget, levels)
+    else:
+        method = "two_class"
+        selected, frontier = _two_class(savings, costs, classes, budget, levels)
+
+    chosen = candidates.iloc[selected].sort_values("economy_per_year", ascending=False)
+    capex_total = float(chosen["capex"].sum())
+    annual_savings = float(chosen["economy_per_year"].sum())
+    return {
+        "budget": float(budget),
+        "method": method,
+        "candidate_vehicles": int(len(candidates)),
+        "selected_vehicles": int(len(chosen)),
+        "capex_total": round(capex_total, 2),
+        "annual_savings": round(annual_savings, 2),
+        "payback_years": round(capex_total / annual_savings, 2) if annual_savings > 0 else None,
+        "budget_remaining": round(float(budget) - capex_total, 2),
+        "selected": chosen.round(2).to_dict("records"),
+        "frontier": frontier,
+    }
+
+
+def _greedy(
+    savings: np.ndarray,
+    costs: np.ndarray,
+    budget: float,
+    levels: np.ndarray,
+) -> Tuple[np.ndarray, List[Dict[str, float]]]:
+    order = np.argsort(-savings, kind="stable")
+    unit = costs[0] if len(costs) else 1.0
+    prefix = np.concatenate(([0.0], np.cumsum(savings[order])))
+    counts = np.minimum(np.floor(levels / unit + 1e-9).astype(np.int64), len(order))
+    frontier = [
+        _frontier_point(level, int(count), count * unit, prefix[count])
+        for level, count in zip(levels, counts)
+    ]
+    take = min(int(math.floor(budget / unit + 1e-9)), len(order))
+    return order[:take], frontier
+
+
+def _two_class(
+    savings: np.ndarray,
+    costs: np.ndarray,
+    classes: np.ndarray,
+    budget: float,
+    levels: np.ndarray,
+) -> Tuple[np.ndarray, List[Dict[str, float]]]:
+    members = [np.flatnonzero(costs == cost) for cost in classes]
+    orders = [members[i][np.argsort(-savings[members[i]], kind="stable")] for i in (0, 1)]
+    prefixes = [np.concatenate(([0.0], np.cumsum(savings[order]))) for order in orders]
+    first_counts = np.arange(len(orders[0]) + 1)
+
+    def best(level: float) -> Tuple[int, int]:
+        room = level - first_counts * classes[0]
+        second = np.clip(np.floor(room / classes[1] + 1e-9), 0, len(orders[1])).astype(np.int64)
+        value = np.where(room >= -1e-9, prefixes[0][first_counts] + prefixes[1][second], -np.inf)
+        pick = int(np.argmax(value))
+        return pick, int(second[pick])
+
+    frontier = []
+    for level in levels:
+        count_a, count_b = best(level)
+        frontier.append(
+            _frontier_point(
+                level,
+                count_a + count_b,
+                count_a * classes[0] + count_b * classes[1],
+                prefixes[0][count_a] + prefixes[1][count_b],
+            )
+        )
+    count_a, count_b = best(budget)
+    return np.concatenate((orders[0][:count_a], orders[1][:count_b])), frontier
+
+
+def _frontier_point(level: float, count: int, capex: float, savings: float) -> Dict[str, float]:
+    return {
+        "budget": round(float(level), 2),
+        "vehicles": int(count),
+        "capex": round(float(capex), 2),
+        "annual_savings": round(float(savings), 2),
+    }
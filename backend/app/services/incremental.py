@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from ..config import settings
+from .load_profile import ChargingState
+
+
+class IncrementalStateError(ValueError):
+    """Raised when a base analysis cannot be extended with new tours."""
+
+
+VEHICLE_DAY_KEYS = ["vehicleid", "date"]
+
+# How each per-(vehicle, day) column combines when the same day shows up again.
+VEHICLE_DAY_AGGREGATIONS: Dict[str, str] = {
+    "tour_count": "sum",
+    "row_count": "sum",
+    "mileage": "sum",
+    "fuel": "sum",
+    "energy_kwh": "sum",
+    "feasible_tours": "sum",
+    "first_start": "min",
+    "last_start": "max",
+}
+
+_ANALYSIS_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+@dataclass
+class IncrementalState:
+    """Per-(vehicle, day) aggregates and ingested tour ids of one analysis."""
+
+    energy_limit_kwh: float
+    vehicle_days: pd.DataFrame
+    vehicles: pd.DataFrame
+    tour_ids: pd.Index
+    # Outlier mode the aggregates were built with. States saved before these
+    # fields existed unpickle with the defaults (no exclusion, thresholds unknown).
+    exclude_outliers: bool = False
+    outlier_thresholds: Optional[Dict[str, float]] = None
+    # Consumption (per 100 km) of every ingested tour, indexed by vehicleid,
+    # and each vehicle's median, MAD and sample size over it. New tours are
+    # judged against the merged statistics, and only vehicles whose archived
+    # flags they move are read back. None for states saved before these
+    # existed; those re-read every touched vehicle.
+    consumption: Optional[pd.Series] = None
+    outlier_statistics: Optional[pd.DataFrame] = None
+    # Where the SoC simulation stopped; incremental runs continue from it.
+    # None when it has to be rebuilt from the retained tours.
+    charging: Optional[ChargingState] = None
+
+    def check_compatible(
+        self,
+        *,
+        energy_limit_kwh: float,
+        exclude_outliers: bool,
+        outlier_thresholds: Dict[str, float],
+    ) -> None:
+        """Reject new tours that would be judged differently from the base."""
+        if float(energy_limit_kwh) != float(self.energy_limit_kwh):
+            raise IncrementalStateError(
+                "Energy limit differs from the base analysis; run a full analysis instead"
+            )
+        if bool(exclude_outliers) != bool(self.exclude_outliers):
+            raise IncrementalStateError(
+                "Outlier exclusion differs from the base analysis; run a full analysis instead"
+            )
+        if self.outlier_thresholds is not None and outlier_thresholds != self.outlier_thresholds:
+            raise IncrementalStateError(
+                "Outlier thresholds differ from the base analysis; run a full analysis instead"
+            )
+
+    def select_new_tours(self, tours: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+        identified = tours["tourid"].notna()
+        known = identified & tours["tourid"].isin(self.tour_ids)
+        fresh = tours[identified & ~known]
+        summary = {
+            "new_tours": int(len(fresh)),
+            "duplicate_tours": int(known.sum()),
+            # Tours without an id cannot be told apart from already-ingested ones.
+            "unidentified_tours": int((~identified).sum()),
+        }
+        return fresh, summary
+
+    def extend(
+        self,
+        *,
+        energy_limit_kwh: float,
+        exclude_outliers: bool,
+        outlier_thresholds: Dict[str, float],
+        vehicle_days: pd.DataFrame,
+        vehicles: pd.DataFrame,
+        tour_ids: pd.Index,
+        consumption: pd.Series,
+        outlier_statistics: Optional[pd.DataFrame],
+        charging: Optional[ChargingState],
+        replaced_vehicles: Sequence[int] = (),
+    ) -> "IncrementalState":
+        """Merge new per-(vehicle, day) sums into the base.
+
+        ``vehicle_days`` of ``replaced_vehicles`` cover their whole history and
+        replace the base rows instead of adding to them. ``consumption``
+        covers the newly ingested tours only, ``outlier_statistics`` the
+        merged history of the vehicles they belong to.
+        """
+        self.check_compatible(
+            energy_limit_kwh=energy_limit_kwh,
+            exclude_outliers=exclude_outliers,
+            outlier_thresholds=outlier_thresholds,
+        )
+        base_days = self.vehicle_days
+        if len(replaced_vehicles):
+            base_days = base_days[
+                ~base_days.index.get_level_values("vehicleid").isin(replaced_vehicles)
+            ]
+        combined_days = (
+            pd.concat([base_days, vehicle_days])
+            .groupby(level=VEHICLE_DAY_KEYS, sort=True)
+            .agg(VEHICLE_DAY_AGGREGATIONS)
+        )
+        combined_vehicles = (
+            pd.concat([self.vehicles, vehicles], ignore_index=True)
+            .drop_duplicates(subset="vehicleid", keep="last")
+            .reset_index(drop=True)
+        )
+        return IncrementalState(
+            energy_limit_kwh=self.energy_limit_kwh,
+            vehicle_days=combined_days,
+            vehicles=combined_vehicles,
+            tour_ids=self.tour_ids.append(tour_ids).unique(),
+            exclude_outliers=self.exclude_outliers,
+            outlier_thresholds=dict(outlier_thresholds),
+            consumption=(
+                None
+                if self.consumption is None
+                else pd.concat([self.consumption, consumption])
+            ),
+            outlier_statistics=(
+                None
+                if self.outlier_statistics is None
+                else pd.concat(
+                    [
+                        self.outlier_statistics.drop(
+                            index=outlier_statistics.index, errors="ignore"
+                        ),
+                        outlier_statistics,
+                    ]
+                ).sort_index()
+            ),
+            charging=charging,
+        )
+
+
+class IncrementalStateStore:
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+
+    def save(self, analysis_id: str, state: IncrementalState) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self._path(analysis_id)
+        partial = target.with_suffix(".tmp")
+        pd.to_pickle(state, partial)
+        partial.replace(target)
+
+    def load(self, analysis_id: str) -> Optional[IncrementalState]:
+        if not _ANALYSIS_ID.match(analysis_id or ""):
+            return None
+        path = self._path(analysis_id)
+        if not path.exists():
+            return None
+        return pd.read_pickle(path)
+
+    def size(self, analysis_id: str) -> Optional[int]:
+        """Bytes of the stored state, or None when there is none."""
+        if not _ANALYSIS_ID.match(analysis_id or ""):
+            return None
+        try:
+            return self._path(analysis_id).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def delete(self, analysis_id: str) -> None:
+        if _ANALYSIS_ID.match(analysis_id or ""):
+            self._path(analysis_id).unlink(missing_ok=True)
+
+    def _path(self, analysis_id: str) -> Path:
+        return self.directory / f"{analysis_id}.pkl"
+
+
+@lru_cache()
+def get_state_store() -> IncrementalStateStore:
+    return IncrementalStateStore(settings.data_dir / "incremental")
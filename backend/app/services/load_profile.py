@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..config import settings
+from .soc_simulation import (
+    ChargingParameters,
+    merge_vehicle_soc,
+    simulate_tours,
+    summarise_simulation,
+    vehicle_soc,
+)
+from .types import ChargingRegime
+
+PERCENTILES = (50, 90, 95, 99)
+
+_MINUTES_PER_DAY = 24 * 60
+
+
+class LoadProfileError(ValueError):
+    """Raised when a load profile cannot be built with the requested options."""
+
+
+class ChargingStateError(ValueError):
+    """Raised when tours cannot continue a stored charging simulation."""
+
+
+def check_resolution(resolution_minutes: int) -> None:
+    if resolution_minutes <= 0 or _MINUTES_PER_DAY % resolution_minutes:
+        raise LoadProfileError("Load profile resolution must divide a day (e.g. 5, 15, 30, 60 minutes)")
+
+
+def charging_intervals(
+    levels: pd.DataFrame,
+    parameters: ChargingParameters,
+    regime: ChargingRegime = "depot",
+) -> pd.DataFrame:
+    """One charging session per idle gap that the regime charges in.
+
+    A session starts at a tour's end and lasts until the battery is full again
+    or the next tour starts, whichever is first. The last tour of each vehicle
+    charges at the depot until full. Levels come from ``simulate_tours``, so
+    each session delivers exactly the energy the SoC simulation credited. That
+    includes refilling a shortfall below zero, since the simulation lets SoC
+    go negative. ``final`` marks those last sessions, which later tours of
+    the vehicle would cut short.
+    """
+    capacity = parameters.battery_capacity_kwh
+    after = levels[f"{regime}_soc"].to_numpy()
+    deficit = capacity - np.minimum(after, capacity)
+
+    last = np.ones(len(levels), dtype=bool)
+    last[:-1] = levels["first"].to_numpy()[1:]
+    next_gap = np.full(len(levels), np.inf)
+    next_gap[:-1] = levels["gap_hours"].to_numpy()[1:]
+    next_gap = np.where(last, np.inf, next_gap)
+    next_overnight = np.zeros(len(levels), dtype=bool)
+    next_overnight[:-1] = levels["overnight"].to_numpy()[1:]
+    next_opportunity = np.zeros(len(levels), dtype=bool)
+    if regime == "opportunity":
+        next_opportunity[:-1] = levels["opportunity_gap"].to_numpy()[1:]
+
+    power = np.select(
+        [last | next_overnight, next_opportunity & ~last],
+        [parameters.depot_charger_kw, parameters.opportunity_charger_kw],
+        default=0.0,
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hours = np.where(power > 0.0, np.minimum(deficit / power, next_gap), 0.0)
+    keep = hours > 0.0
+
+    start = levels["endtime"].to_numpy()[keep]
+    return pd.DataFrame(
+        {
+            "vehicleid": levels["vehicleid"].to_numpy()[keep],
+            "start": start,
+            "stop": start + (hours[keep] * 3600e9).astype("timedelta64[ns]"),
+            "power_kw": power[keep],
+            "energy_kwh": power[keep] * hours[keep],
+            "final": last[keep],
+        }
+    )
+
+
+def load_profile(
+    intervals: pd.DataFrame,
+    resolution_minutes: int,
+) -> Dict[str, object]:
+    """Aggregate concurrent charging load with a sorted sweep over interval edges.
+
+    Every session contributes ``+kW`` at its start and ``-kW`` at its stop.
+    After one O(n log n) sort, a cumulative sum gives the exact piecewise-
+    constant load. Each bin reports its mean (from the integrated load) and
+    its peak. The bins are then folded onto the time of day.
+    """
+    check_resolution(resolution_minutes)
+    summary: Dict[str, object] = {
+        "resolution_minutes": resolution_minutes,
+        "sessions": int(len(intervals)),
+        "energy_kwh": round(float(intervals["energy_kwh"].sum()), 2),
+        "peak_kw": 0.0,
+        "peak_at": None,
+        "peak_concurrent_vehicles": 0,
+        "percentiles_kw": {f"p{q}": 0.0 for q in PERCENTILES},
+        "time_of_day": [],
+    }
+    if intervals.empty:
+        return summary
+
+    origin = pd.Timestamp(intervals["start"].min()).normalize()
+    starts = (intervals["start"] - origin).dt.total_seconds().to_numpy()
+    stops = (intervals["stop"] - origin).dt.total_seconds().to_numpy()
+    power = intervals["power_kw"].to_numpy(dtype=np.float64)
+
+    times, load, vehicles = _sweep(starts, stops, power)
+
+    width = resolution_minutes * 60.0
+    bins_per_day = _MINUTES_PER_DAY // resolution_minutes
+    days = int(np.ceil(times[-1] / width / bins_per_day)) or 1
+    edges = np.arange(days * bins_per_day + 1) * width
+
+    # Load in force at each bin start, raised by any change inside the bin.
+    at_edge = np.searchsorted(times, edges[:-1], side="right") - 1
+    peak = np.where(at_edge >= 0, load[np.clip(at_edge, 0, None)], 0.0)
+    concurrent = np.where(at_edge >= 0, vehicles[np.clip(at_edge, 0, None)], 0)
+    knot_bins = np.minimum((times // width).astype(np.int64), len(peak) - 1)
+    np.maximum.at(peak, knot_bins, load)
+    np.maximum.at(concurrent, knot_bins, vehicles)
+
+    # Integrated load is piecewise linear between sweep knots.
+    area = np.concatenate(([0.0], np.cumsum(load[:-1] * np.diff(times))))
+    mean = np.diff(np.interp(edges, times, area)) / width
+
+    by_day_peak = peak.reshape(days, bins_per_day)
+    by_day_mean = mean.reshape(days, bins_per_day)
+    by_day_vehicles = concurrent.reshape(days, bins_per_day)
+    time_of_day = pd.DataFrame(
+        {
+            "time": _time_labels(resolution_minutes),
+            "mean_kw": by_day_mean.mean(axis=0),
+            "peak_kw": by_day_peak.max(axis=0),
+            "p95_kw": np.percentile(by_day_peak, 95, axis=0),
+            "max_vehicles": by_day_vehicles.max(axis=0),
+        }
+    )
+
+    top = int(np.argmax(load))
+    summary.update(
+        peak_kw=round(float(load[top]), 2),
+        peak_at=(origin + pd.Timedelta(seconds=float(times[top]))).isoformat(),
+        peak_concurrent_vehicles=int(vehicles.max()),
+        percentiles_kw={
+            f"p{q}": round(float(value), 2)
+            for q, value in zip(PERCENTILES, np.percentile(peak, PERCENTILES))
+        },
+        time_of_day=time_of_day.round(2).to_dict("records"),
+    )
+    return summary
+
+
+@dataclass(frozen=True)
+class ChargingState:
+    """Where a charging simulation stopped, so later tours can continue it.
+
+    ``vehicles`` holds the ``vehicle_soc`` rows and ``last_tours`` the
+    ``simulate_tours`` row of each vehicle's latest tour. ``sessions`` are
+    the charging intervals so far. Continuing a vehicle only replaces its
+    final session, so the stored history is never simulated again.
+    """
+
+    parameters: ChargingParameters
+    regime: ChargingRegime
+    vehicles: pd.DataFrame
+    last_tours: pd.DataFrame
+    sessions: pd.DataFrame
+
+    @classmethod
+    def simulate(
+        cls,
+        tours: pd.DataFrame,
+        parameters: ChargingParameters,
+        regime: ChargingRegime = "depot",
+    ) -> "ChargingState":
+        levels = simulate_tours(tours, parameters)
+        return cls(
+            parameters=parameters,
+            regime=regime,
+            vehicles=vehicle_soc(levels, parameters),
+            last_tours=_last_tours(levels),
+            sessions=charging_intervals(levels, parameters, regime),
+        )
+
+    def extend(self, tours: pd.DataFrame, *, rebuilt: Sequence[int] = ()) -> "ChargingState":
+        """Continue the simulation with tours that follow each vehicle's last one.
+
+        Vehicles in ``rebuilt`` are dropped and simulated afresh, so
+        ``tours`` must hold their whole history.
+        """
+        vehicles = self.vehicles[~self.vehicles["vehicleid"].isin(rebuilt)]
+        last_tours = self.last_tours[~self.last_tours["vehicleid"].isin(rebuilt)]
+        sessions = self.sessions[~self.sessions["vehicleid"].isin(rebuilt)]
+        if tours.empty:
+            return ChargingState(self.parameters, self.regime, vehicles, last_tours, sessions)
+
+        if len(_late_vehicles(last_tours, tours)):
+            raise ChargingStateError("Tours precede the last simulated tour of their vehicle")
+
+        levels = simulate_tours(tours, self.parameters, initial=last_tours)
+        touched = tours["vehicleid"].unique()
+        continued = last_tours["vehicleid"].isin(touched)
+        return ChargingState(
+            parameters=self.parameters,
+            regime=self.regime,
+            vehicles=merge_vehicle_soc(
+                [vehicles, vehicle_soc(levels, self.parameters)], self.parameters
+            ),
+            last_tours=pd.concat(
+                [last_tours[~continued], _last_tours(levels)], ignore_index=True
+            ),
+            sessions=pd.concat(
+                [
+                    sessions[~(sessions["final"] & sessions["vehicleid"].isin(touched))],
+                    charging_intervals(levels, self.parameters, self.regime),
+                ],
+                ignore_index=True,
+            ),
+        )
+
+    def late_vehicles(self, tours: pd.DataFrame) -> np.ndarray:
+        """Vehicles with tours at or before their last simulated tour."""
+        return _late_vehicles(self.last_tours, tours)
+
+    def sections(
+        self,
+        resolution_minutes: Optional[int] = None,
+    ) -> Tuple[Dict[str, object], Dict[str, object]]:
+        """SoC summary and load profile of every tour simulated so far."""
+        simulation = summarise_simulation(self.vehicles, self.parameters)
+        profile = load_profile(
+            self.sessions,
+            resolution_minutes or settings.load_profile_resolution_minutes,
+        )
+        profile["regime"] = self.regime
+        return simulation, profile
+
+
+def charging_sections(
+    tours: pd.DataFrame,
+    parameters: ChargingParameters,
+    *,
+    resolution_minutes: Optional[int] = None,
+    regime: ChargingRegime = "depot",
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """SoC summary and load profile from one simulation pass."""
+    return ChargingState.simulate(tours, parameters, regime).sections(resolution_minutes)
+
+
+def _late_vehicles(last_tours: pd.DataFrame, tours: pd.DataFrame) -> np.ndarray:
+    first_start = pd.to_datetime(tours["starttime"]).groupby(tours["vehicleid"]).min()
+    previous = last_tours.set_index("vehicleid")["starttime"].reindex(first_start.index)
+    return first_start.index[(first_start <= previous).to_numpy()].to_numpy()
+
+
+def _last_tours(levels: pd.DataFrame) -> pd.DataFrame:
+    last = np.ones(len(levels), dtype=bool)
+    last[:-1] = levels["first"].to_numpy()[1:]
+    return levels[last].reset_index(drop=True)
+
+
+def _sweep(
+    starts: np.ndarray,
+    stops: np.ndarray,
+    power: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    times = np.concatenate((starts, stops))
+    deltas = np.concatenate((power, -power))
+    counts = np.concatenate((np.ones(len(starts), dtype=np.int64), -np.ones(len(stops), dtype=np.int64)))
+    # Stops sort before starts at the same instant, so back-to-back sessions
+    # never count as overlapping.
+    order = np.lexsort((deltas > 0, times))
+    times = times[order]
+    load = np.cumsum(deltas[order])
+    vehicles = np.cumsum(counts[order])
+
+    # Keep the settled value after the last event at each instant.
+    settled = np.ones(len(times), dtype=bool)
+    settled[:-1] = times[1:] != times[:-1]
+    load = np.clip(np.round(load[settled], 6), 0.0, None)
+    return times[settled], load, vehicles[settled]
+
+
+def _time_labels(resolution_minutes: int) -> List[str]:
+    return [
+        f"{minute // 60:02d}:{minute % 60:02d}"
+        for minute in range(0, _MINUTES_PER_DAY, resolution_minutes)
+    ]
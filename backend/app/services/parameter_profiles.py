@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import uuid
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional
+
+from ..config import settings
+from .excel_processor import TechnologyKey, TechnologyParameters
+from .storage import connect, database_path
+from .tabular_processor import ParameterSet, parse_parameter_document
+
+
+class ProfileNotFoundError(LookupError):
+    """Raised when a parameter profile id is unknown."""
+
+
+class ProfileConflictError(ValueError):
+    """Raised when a profile name is already taken."""
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parameter_profiles (
+    profile_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL,
+    document TEXT NOT NULL
+)
+"""
+
+
+@dataclass(frozen=True)
+class ParameterProfile:
+    profile_id: str
+    name: str
+    created_at: str
+    energy_limit_kwh: Optional[float]
+    period_months: Optional[float]
+    tco_parameters: Mapping[TechnologyKey, TechnologyParameters]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "created_at": self.created_at,
+            "energy_limit_kwh": self.energy_limit_kwh,
+            "period_months": self.period_months,
+            "tco_parameters": {k: v.to_dict() for k, v in self.tco_parameters.items()},
+        }
+
+    def to_parameter_set(self) -> ParameterSet:
+        return ParameterSet(
+            energy_limit_kwh=(
+                self.energy_limit_kwh
+                if self.energy_limit_kwh is not None
+                else settings.default_energy_limit_kwh
+            ),
+            period_months=self.period_months,
+            tco_parameters=dict(self.tco_parameters),
+        )
+
+
+class ParameterProfileStore:
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = Path(db_path)
+        self._cache: Dict[str, ParameterProfile] = {}
+        self._lock = threading.Lock()
+        self._initialised = False
+
+    def create(self, name: str, document: Dict[str, Any]) -> ParameterProfile:
+        if name is not None and not isinstance(name, str):
+            raise ValueError("Profile name must be a string")
+        name = (name or "").strip()
+        if not name:
+            raise ValueError("Profile name is required")
+        # Reuses the upload validation so stored profiles are always analysable.
+        parsed = parse_parameter_document(document)
+        stored = {
+            "energy_limit_kwh": (
+                parsed.energy_limit_kwh
+                if document.get("energy_limit_kwh") not in (None, "")
+                else None
+            ),
+            "period_months": parsed.period_months,
+            "tco_parameters": {
+                key: params.to_dict() for key, params in parsed.tco_parameters.items()
+            },
+        }
+        profile_id = uuid.uuid4().hex
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+        with self._connect() as conn:
+            try:
+                conn.execute(
+                    "INSERT INTO parameter_profiles (profile_id, name, created_at, document) "
+                    "VALUES (?, ?, ?, ?)",
+                    (profile_id, name, created_at, json.dumps(stored)),
+                )
+            except sqlite3.IntegrityError as exc:
+                raise ProfileConflictError(f"Profile name {name!r} already exists") from exc
+
+        profile = _build_profile(profile_id, name, created_at, stored)
+        with self._lock:
+            self._cache[profile_id] = profile
+        return profile
+
+    def get(self, profile_id: str) -> ParameterProfile:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT profile_id, name, created_at, document FROM parameter_profiles "
+                "WHERE profile_id = ?",
+                (profile_id,),
+            ).fetchone()
+        if row is None:
+            with self._lock:
+                self._cache.pop(profile_id, None)
+            raise ProfileNotFoundError(profile_id)
+        return self._from_row(row)
+
+    def list(self) -> List[ParameterProfile]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT profile_id, name, created_at, document FROM parameter_profiles "
+                "ORDER BY created_at, name"
+            ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def delete(self, profile_id: str) -> None:
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM parameter_profiles WHERE profile_id = ?",
+                (profile_id,),
+            ).rowcount
+        with self._lock:
+            self._cache.pop(profile_id, None)
+        if not deleted:
+            raise ProfileNotFoundError(profile_id)
+
+    def _from_row(self, row: sqlite3.Row) -> ParameterProfile:
+        # Rows are never updated, so a parsed profile is reused for its id. The
+        # row itself is always read, so deletes by other workers are seen.
+        with self._lock:
+            cached = self._cache.get(row["profile_id"])
+        if cached is not None:
+            return cached
+        profile = _build_profile(
+            row["profile_id"], row["name"], row["created_at"], json.loads(row["document"])
+        )
+        with self._lock:
+            self._cache[profile.profile_id] = profile
+        return profile
+
+    def _connect(self):
+        if not self._initialised:
+            with connect(self.db_path) as conn:
+                conn.execute(_SCHEMA)
+            self._initialised = True
+        return connect(self.db_path)
+
+
+def diff_parameters(
+    profile: ParameterProfile,
+    workbook_parameters: Mapping[TechnologyKey, TechnologyParameters],
+) -> Dict[str, object]:
+    differences: List[Dict[str, object]] = []
+    for key, profile_params in profile.tco_parameters.items():
+        workbook_params = workbook_parameters.get(key)
+        if workbook_params is None:
+            continue
+        for item in fields(TechnologyParameters):
+            left = getattr(profile_params, item.name)
+            right = getattr(workbook_params, item.name)
+            if left != right:
+                differences.append(
+                    {
+                        "technology": key,
+                        "parameter": item.name,
+                        "profile": left,
+                        "workbook": right,
+                        "delta": right - left,
+                    }
+                )
+    return {
+        "profile_id": profile.profile_id,
+        "identical": not differences,
+        "differences": differences,
+    }
+
+
+def _build_profile(
+    profile_id: str,
+    name: str,
+    created_at: str,
+    stored: Dict[str, Any],
+) -> ParameterProfile:
+    tco_parameters = {
+        key: TechnologyParameters.from_dict(values)
+        for key, values in stored["tco_parameters"].items()
+    }
+    return ParameterProfile(
+        profile_id=profile_id,
+        name=name,
+        created_at=created_at,
+        energy_limit_kwh=stored.get("energy_limit_kwh"),
+        period_months=stored.get("period_months"),
+        tco_parameters=MappingProxyType(tco_parameters),
+    )
+
+
+@lru_cache()
+def get_profile_store() -> ParameterProfileStore:
+    return ParameterProfileStore(database_path())
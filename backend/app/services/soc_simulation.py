@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from ..config import settings
+
+# Enriched-tour columns the simulation reads.
+SIMULATION_COLUMNS = [
+    "vehicleid",
+    "date",
+    "starttime",
+    "endtime",
+    "estimated electricity consumption (kWh)",
+]
+
+
+@dataclass(frozen=True)
+class ChargingParameters:
+    battery_capacity_kwh: float
+    depot_charger_kw: float
+    opportunity_charger_kw: float
+    min_charge_gap_minutes: float
+
+    @classmethod
+    def from_settings(
+        cls,
+        energy_limit_kwh: float,
+        *,
+        battery_capacity_kwh: Optional[float] = None,
+        depot_charger_kw: Optional[float] = None,
+        opportunity_charger_kw: Optional[float] = None,
+        min_charge_gap_minutes: Optional[float] = None,
+    ) -> "ChargingParameters":
+        """Fill unset values from settings; capacity defaults to the daily energy limit."""
+        capacity = battery_capacity_kwh or settings.battery_capacity_kwh or energy_limit_kwh
+        return cls(
+            battery_capacity_kwh=float(capacity),
+            depot_charger_kw=float(
+                settings.depot_charger_kw if depot_charger_kw is None else depot_charger_kw
+            ),
+            opportunity_charger_kw=float(
+                settings.opportunity_charger_kw
+                if opportunity_charger_kw is None
+                else opportunity_charger_kw
+            ),
+            min_charge_gap_minutes=float(
+                settings.min_charge_gap_minutes
+                if min_charge_gap_minutes is None
+                else min_charge_gap_minutes
+            ),
+        )
+
+    def to_dict(self) -> Dict[str, float]:
+        return asdict(self)
+
+
+def simulate_tours(
+    tours: pd.DataFrame,
+    parameters: ChargingParameters,
+    initial: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Per-tour state of charge after each tour, under two charging regimes.
+
+    Tours must be sorted by vehicle and start time. Each vehicle starts full.
+    Gaps that cross midnight charge at the depot; same-day gaps of at least
+    ``min_charge_gap_minutes`` also charge at an opportunity charger in the
+    opportunity regime. Charging stops at capacity, and SoC may go negative
+    so shortfalls stay measurable.
+
+    The capped recurrence ``L_i = min(C, L_{i-1} - e_{i-1} + c_i)`` has the
+    closed form ``L_i = S_i + C - cummax(S)_i`` with ``S`` the per-vehicle
+    running sum of ``c_i - e_{i-1}``. The whole run is therefore a few grouped
+    cumulative passes, with no per-tour Python loop. Gap columns describe the
+    gap *before* each tour.
+
+    ``initial`` holds earlier output rows, one per vehicle: the last tour
+    simulated so far. Vehicles found there continue from its SoC instead of
+    starting full. That row leads the vehicle's output with ``resumed`` set.
+    """
+    capacity = parameters.battery_capacity_kwh
+    resumed = np.zeros(len(tours), dtype=bool)
+    if initial is not None:
+        carried = initial[initial["vehicleid"].isin(tours["vehicleid"].unique())]
+        if len(carried):
+            tours = pd.concat(
+                [carried.assign(resumed=True), tours.assign(resumed=False)],
+                ignore_index=True,
+            ).sort_values("vehicleid", kind="stable", ignore_index=True)
+            resumed = tours["resumed"].to_numpy(dtype=bool)
+    vehicle = tours["vehicleid"].to_numpy()
+    start = pd.to_datetime(tours["starttime"]).to_numpy()
+    end = pd.to_datetime(tours["endtime"]).to_numpy()
+    # Without an end time the tour is taken to end when it started.
+    end = np.where(np.isnat(end), start, end)
+    energy = tours["estimated electricity consumption (kWh)"].fillna(0.0).to_numpy(dtype=np.float64)
+    day = pd.to_datetime(tours["date"]).to_numpy()
+
+    first = np.ones(len(tours), dtype=bool)
+    first[1:] = vehicle[1:] != vehicle[:-1]
+
+    gap_hours = np.zeros(len(tours), dtype=np.float64)
+    gap_hours[1:] = (start[1:] - end[:-1]) / np.timedelta64(1, "h")
+    gap_hours = np.where(first, 0.0, np.clip(np.nan_to_num(gap_hours), 0.0, None))
+    overnight = np.zeros(len(tours), dtype=bool)
+    overnight[1:] = day[1:] != day[:-1]
+    overnight &= ~first
+    opportunity_gap = ~first & ~overnight & (gap_hours * 60.0 >= parameters.min_charge_gap_minutes)
+
+    depot_charge = np.where(overnight, gap_hours * parameters.depot_charger_kw, 0.0)
+    opportunity_charge = depot_charge + np.where(
+        opportunity_gap, gap_hours * parameters.opportunity_charger_kw, 0.0
+    )
+
+    # A resumed row starts full like any first tour; using up exactly the
+    # capacity it lacked leaves it at its recorded SoC.
+    depot_energy = energy
+    opportunity_energy = energy
+    if resumed.any():
+        depot_energy = np.where(resumed, capacity - tours["depot_soc"].to_numpy(), energy)
+        opportunity_energy = np.where(
+            resumed, capacity - tours["opportunity_soc"].to_numpy(), energy
+        )
+
+    groups = pd.Series(np.cumsum(first))
+    depot_after = _post_tour_levels(groups, first, depot_charge, depot_energy, capacity)
+    opportunity_after = _post_tour_levels(
+        groups, first, opportunity_charge, opportunity_energy, capacity
+    )
+
+    # An opportunity stop counts when the gap qualifies and the battery had room.
+    previous_level = np.full(len(tours), capacity)
+    previous_level[1:] = opportunity_after[:-1]
+    opportunity_stop = opportunity_gap & (previous_level < capacity)
+
+    return pd.DataFrame(
+        {
+            "vehicleid": vehicle,
+            "date": day,
+            "starttime": start,
+            "endtime": end,
+            "first": first,
+            "gap_hours": gap_hours,
+            "overnight": overnight,
+            "opportunity_gap": opportunity_gap,
+            "depot_soc": depot_after,
+            "opportunity_soc": opportunity_after,
+            "opportunity_stop": opportunity_stop,
+            "resumed": resumed,
+        }
+    )
+
+
+def simulate_soc(tours: pd.DataFrame, parameters: ChargingParameters) -> pd.DataFrame:
+    """Per-vehicle minimum SoC, charge needs and feasibility; see ``simulate_tours``."""
+    if tours.empty:
+        return _empty_result()
+    return vehicle_soc(simulate_tours(tours, parameters), parameters)
+
+
+def vehicle_soc(levels: pd.DataFrame, parameters: ChargingParameters) -> pd.DataFrame:
+    """Aggregate ``simulate_tours`` output to one row per vehicle."""
+    # Resumed rows were counted when they were first simulated.
+    levels = levels[~levels["resumed"].to_numpy(dtype=bool)]
+    if levels.empty:
+        return _empty_result()
+
+    frame = levels.assign(needs_charge=levels["depot_soc"] < 0.0)
+    result = frame.groupby("vehicleid", sort=False).agg(
+        tour_count=("first", "size"),
+        depot_min_soc_kwh=("depot_soc", "min"),
+        opportunity_min_soc_kwh=("opportunity_soc", "min"),
+        tours_needing_charge=("needs_charge", "sum"),
+        opportunity_charge_stops=("opportunity_stop", "sum"),
+    )
+    return _with_feasibility(result, parameters).reset_index()
+
+
+def merge_vehicle_soc(frames: Sequence[pd.DataFrame], parameters: ChargingParameters) -> pd.DataFrame:
+    """Combine ``vehicle_soc`` results of consecutive runs over the same vehicles."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _empty_result()
+    result = pd.concat(frames, ignore_index=True).groupby("vehicleid", sort=True).agg(
+        tour_count=("tour_count", "sum"),
+        depot_min_soc_kwh=("depot_min_soc_kwh", "min"),
+        opportunity_min_soc_kwh=("opportunity_min_soc_kwh", "min"),
+        tours_needing_charge=("tours_needing_charge", "sum"),
+        opportunity_charge_stops=("opportunity_charge_stops", "sum"),
+    )
+    return _with_feasibility(result, parameters).reset_index()
+
+
+def summarise_simulation(
+    vehicles: pd.DataFrame,
+    parameters: ChargingParameters,
+) -> Dict[str, object]:
+    summary: Dict[str, object] = {
+        "parameters": parameters.to_dict(),
+        "vehicles_simulated": int(len(vehicles)),
+        "depot_feasible_vehicles": 0,
+        "opportunity_feasible_vehicles": 0,
+        "opportunity_only_vehicles": 0,
+        "tours_needing_charge": 0,
+        "depot_min_soc_kwh": None,
+        "opportunity_min_soc_kwh": None,
+        "vehicles": [],
+    }
+    if vehicles.empty:
+        return summary
+
+    depot = vehicles["depot_feasible"].astype(bool)
+    opportunity = vehicles["opportunity_feasible"].astype(bool)
+    counts = ["tour_count", "tours_needing_charge", "opportunity_charge_stops"]
+    summary.update(
+        depot_feasible_vehicles=int(depot.sum()),
+        opportunity_feasible_vehicles=int(opportunity.sum()),
+        opportunity_only_vehicles=int((opportunity & ~depot).sum()),
+        tours_needing_charge=int(vehicles["tours_needing_charge"].sum()),
+        depot_min_soc_kwh=round(float(vehicles["depot_min_soc_kwh"].min()), 2),
+        opportunity_min_soc_kwh=round(float(vehicles["opportunity_min_soc_kwh"].min()), 2),
+        vehicles=vehicles.astype({col: int for col in counts}).round(2).to_dict("records"),
+    )
+    return summary
+
+
+def _with_feasibility(result: pd.DataFrame, parameters: ChargingParameters) -> pd.DataFrame:
+    capacity = parameters.battery_capacity_kwh
+    result["depot_feasible"] = result["depot_min_soc_kwh"] >= 0.0
+    result["opportunity_feasible"] = result["opportunity_min_soc_kwh"] >= 0.0
+    result["depot_min_soc_pct"] = result["depot_min_soc_kwh"] / capacity * 100.0
+    result["opportunity_min_soc_pct"] = result["opportunity_min_soc_kwh"] / capacity * 100.0
+    return result
+
+
+def _post_tour_levels(
+    groups: pd.Series,
+    first: np.ndarray,
+    charge: np.ndarray,
+    energy: np.ndarray,
+    capacity: float,
+) -> np.ndarray:
+    previous_energy = np.zeros(len(energy), dtype=np.float64)
+    previous_energy[1:] = energy[:-1]
+    # A vehicle's first tour starts full: seed its running sum with the capacity.
+    steps = pd.Series(np.where(first, capacity, charge - previous_energy))
+    running = steps.groupby(groups).cumsum()
+    peak = running.groupby(groups).cummax()
+    before_tour = running.to_numpy() + capacity - peak.to_numpy()
+    return before_tour - energy
+
+
+def _empty_result() -> pd.DataFrame:
+    return pd.DataFrame(
+        columns=[
+            "vehicleid",
+            "tour_count",
+            "depot_min_soc_kwh",
+            "opportunity_min_soc_kwh",
+            "tours_needing_charge",
+            "opportunity_charge_stops",
+            "depot_feasible",
+            "opportunity_feasible",
+            "depot_min_soc_pct",
+            "opportunity_min_soc_pct",
+        ]
+    )
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+DISTRIBUTION_FIELDS = ("economy_per_year", "annual_energy_kwh", "feasible_rate")
+PERCENTILES = (5, 25, 50, 75, 95)
+EXTREME_COLUMNS = ["vehicleid", "licenseno", "fueltypes", "economy_per_year", "cost_bev"]
+
+
+class StatisticsError(ValueError):
+    """Raised when distribution statistics are requested with invalid options."""
+
+
+def top_k(values: np.ndarray, k: int, *, largest: bool = True) -> np.ndarray:
+    """Positions of the ``k`` largest (or smallest) values, best first.
+
+    ``np.argpartition`` selects the k candidates in linear time; only those
+    k are then sorted. NaN values are never selected ahead of numbers.
+    """
+    k = min(k, len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    keys = -values if largest else values
+    picked = np.argpartition(keys, k - 1)[:k] if k < len(keys) else np.arange(len(keys))
+    return picked[np.lexsort((picked, keys[picked]))]
+
+
+def economy_extremes(vehicles: pd.DataFrame, k: int) -> Dict[str, List[Dict[str, object]]]:
+    """Top ``k`` savers and top ``k`` risks by annual BEV economy."""
+    if k < 1:
+        raise StatisticsError("Extremes need k of at least 1")
+    economy = vehicles["economy_per_year"].to_numpy(dtype=np.float64)
+    columns = vehicles[EXTREME_COLUMNS]
+    return {
+        "top_savers": columns.iloc[top_k(economy, k, largest=True)].to_dict("records"),
+        "top_risks": columns.iloc[top_k(economy, k, largest=False)].to_dict("records"),
+    }
+
+
+def distribution_summary(
+    vehicles: pd.DataFrame,
+    bins: int,
+    fields: Sequence[str] = DISTRIBUTION_FIELDS,
+) -> Dict[str, object]:
+    """Percentiles and fixed-width histograms per field, fleet-wide and per fuel type.
+
+    Histogram edges span each field's fleet range, so fuel types share bins
+    and their counts are directly comparable. All groups are counted with a
+    single ``np.bincount`` over ``group * bins + bin`` codes; percentiles use
+    partition-based selection rather than a full sort.
+    """
+    if bins < 1:
+        raise StatisticsError("Histograms need at least one bin")
+    codes, fuel_types = pd.factorize(vehicles["fueltypes"].fillna("unknown"), sort=True)
+    summary: Dict[str, object] = {
+        "bins": bins,
+        "percentiles": list(PERCENTILES),
+        "fields": {},
+    }
+    for field in fields:
+        values = vehicles[field].to_numpy(dtype=np.float64)
+        finite = np.isfinite(values)
+        summary["fields"][field] = _field_distribution(
+            values[finite], codes[finite], list(fuel_types), bins
+        )
+    return summary
+
+
+def _field_distribution(
+    values: np.ndarray,
+    codes: np.ndarray,
+    fuel_types: List[str],
+    bins: int,
+) -> Dict[str, object]:
+    if not len(values):
+        return {"edges": [], "groups": {}}
+    low, high = float(values.min()), float(values.max())
+    edges = np.linspace(low, high if high > low else low + 1.0, bins + 1)
+    # Values equal to the upper edge belong in the last bin.
+    slots = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, bins - 1)
+    counts = np.bincount(codes * bins + slots, minlength=len(fuel_types) * bins).reshape(
+        len(fuel_types), bins
+    )
+
+    groups = {"all": _group_stats(values, counts.sum(axis=0))}
+    for code, fuel_type in enumerate(fuel_types):
+        members = values[codes == code]
+        if len(members):
+            groups[fuel_type] = _group_stats(members, counts[code])
+    return {"edges": np.round(edges, 4).tolist(), "groups": groups}
+
+
+def _group_stats(values: np.ndarray, histogram: np.ndarray) -> Dict[str, object]:
+    return {
+        "count": int(len(values)),
+        "mean": round(float(values.mean()), 2),
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "percentiles": {
+            f"p{q}": round(float(value), 2)
+            for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+        },
+        "histogram": histogram.astype(int).tolist(),
+    }
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from ..config import settings
+from .excel_processor import (
+    TOUR_COLUMNS,
+    VEHICLE_COLUMNS,
+    AnalysisOptions,
+    ExcelProcessor,
+    TechnologyKey,
+    TechnologyParameters,
+)
+from .validation import (
+    INPUT_TOUR_COLUMNS,
+    REQUIRED_TOUR_COLUMNS,
+    InputValidationError,
+    ValidationReport,
+    check_headers,
+)
+
+
+TABULAR_SUFFIXES = {".csv", ".parquet", ".pq"}
+BUNDLE_SUFFIXES = {".zip"}
+
+_TECHNOLOGIES: List[TechnologyKey] = ["diesel", "lng", "bev"]
+
+
+class TelemetryInputError(InputValidationError):
+    """Raised when uploaded telemetry files cannot be ingested."""
+
+
+@dataclass(frozen=True)
+class ParameterSet:
+    energy_limit_kwh: float
+    period_months: Optional[float]
+    tco_parameters: Dict[TechnologyKey, TechnologyParameters]
+
+
+@dataclass(frozen=True)
+class TelemetryBundle:
+    tours_path: Path
+    vehicles_path: Path
+    parameters_path: Optional[Path] = None
+
+
+def parse_parameter_document(data: Any) -> ParameterSet:
+    """Validate a JSON parameter document shaped like the ``tco_parameters`` payload."""
+    if not isinstance(data, dict):
+        raise TelemetryInputError("Parameters must be a JSON object")
+
+    raw_tco = data.get("tco_parameters")
+    if not isinstance(raw_tco, dict):
+        raise TelemetryInputError("Parameters must include a 'tco_parameters' object")
+
+    tco_parameters: Dict[TechnologyKey, TechnologyParameters] = {}
+    for key in _TECHNOLOGIES:
+        values = raw_tco.get(key)
+        if not isinstance(values, dict):
+            raise TelemetryInputError(f"Missing TCO parameters for '{key}'")
+        try:
+            tco_parameters[key] = TechnologyParameters.from_dict(values)
+        except ValueError as exc:
+            raise TelemetryInputError(f"{key}: {exc}") from exc
+
+    try:
+        raw_limit = data.get("energy_limit_kwh")
+        energy_limit = (
+            float(raw_limit)
+            if raw_limit not in (None, "")
+            else settings.default_energy_limit_kwh
+        )
+        raw_period = data.get("period_months")
+        period_months = float(raw_period) if raw_period not in (None, "") else None
+    except (TypeError, ValueError) as exc:
+        raise TelemetryInputError("energy_limit_kwh and period_months must be numeric") from exc
+
+    return ParameterSet(
+        energy_limit_kwh=energy_limit,
+        period_months=period_months,
+        tco_parameters=tco_parameters,
+    )
+
+
+def load_parameter_document(text: str) -> ParameterSet:
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as exc:
+        raise TelemetryInputError("Parameters are not valid JSON") from exc
+    return parse_parameter_document(data)
+
+
+def extract_bundle(archive_path: Path, target_dir: Path) -> TelemetryBundle:
+    """Extract the tours/vehicles (and optional parameters.json) members of a zip upload."""
+    try:
+        archive = zipfile.ZipFile(archive_path)
+    except zipfile.BadZipFile as exc:
+        raise TelemetryInputError("Upload is not a valid zip archive") from exc
+
+    found: Dict[str, Path] = {}
+    with archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            member = Path(info.filename)
+            stem = member.stem.lower()
+            suffix = member.suffix.lower()
+            if stem in {"tours", "vehicles"} and suffix in TABULAR_SUFFIXES:
+                role = stem
+            elif stem == "parameters" and suffix == ".json":
+                role = "parameters"
+            else:
+                continue
+            if role in found:
+                raise TelemetryInputError(f"Archive contains more than one {role} file")
+            # Members are written under fixed names so archive paths never escape target_dir.
+            destination = target_dir / f"bundle-{role}{suffix}"
+            with archive.open(info) as source, destination.open("wb") as sink:
+                while chunk := source.read(1024 * 1024):
+                    sink.write(chunk)
+            found[role] = destination
+
+    if "tours" not in found or "vehicles" not in found:
+        raise TelemetryInputError(
+            "Archive must contain a tours and a vehicles file (.csv or .parquet)"
+        )
+    return TelemetryBundle(
+        tours_path=found["tours"],
+        vehicles_path=found["vehicles"],
+        parameters_path=found.get("parameters"),
+    )
+
+
+class TabularProcessor(ExcelProcessor):
+    """Runs the workbook analysis over tours/vehicles exported as CSV or Parquet."""
+
+    def __init__(
+        self,
+        tours_path: Path,
+        vehicles_path: Path,
+        parameters: ParameterSet,
+        options: Optional[AnalysisOptions] = None,
+    ) -> None:
+        super().__init__(
+            tours_path,
+            tco_parameters=parameters.tco_parameters,
+            energy_limit_kwh=parameters.energy_limit_kwh,
+            options=options,
+        )
+        self.tours_path = Path(tours_path)
+        self.vehicles_path = Path(vehicles_path)
+        self.parameters = parameters
+
+    def _read_parameters(self) -> tuple[float, Optional[float], Dict[TechnologyKey, TechnologyParameters]]:
+        return (
+            self.parameters.energy_limit_kwh,
+            self.parameters.period_months,
+            dict(self.parameters.tco_parameters),
+        )
+
+    def _check_headers(self, report: ValidationReport) -> None:
+        check_headers(
+            _table_columns(self.tours_path),
+            sheet="tours",
+            required=REQUIRED_TOUR_COLUMNS,
+            expected=INPUT_TOUR_COLUMNS,
+            report=report,
+        )
+        check_headers(
+            _table_columns(self.vehicles_path),
+            sheet="vehicles",
+            required=VEHICLE_COLUMNS,
+            expected=VEHICLE_COLUMNS,
+            report=report,
+        )
+
+    def _load_tours(self) -> pd.DataFrame:
+        return self._conform_tours(self._read_table(self.tours_path, TOUR_COLUMNS))
+
+    def _load_vehicles(self) -> pd.DataFrame:
+        df = self._read_table(self.vehicles_path, VEHICLE_COLUMNS)
+        df["fueltypes"] = df["fueltypes"].apply(self._normalise_fuel_type)
+        return df[VEHICLE_COLUMNS]
+
+    @staticmethod
+    def _read_table(path: Path, columns: List[str]) -> pd.DataFrame:
+        suffix = path.suffix.lower()
+        if suffix == ".csv":
+            return _read_csv(path, columns)
+        if suffix in {".parquet", ".pq"}:
+            return _read_parquet(path, columns)
+        raise TelemetryInputError(f"Unsupported telemetry format: {suffix or path.name}")
+
+
+def _table_columns(path: Path) -> List[str]:
+    """Column names from the CSV header or Parquet schema, without reading rows."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        try:
+            return [str(col) for col in pd.read_csv(path, nrows=0).columns]
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as exc:
+            raise TelemetryInputError(f"Could not read {path.name}: {exc}") from exc
+    if suffix in {".parquet", ".pq"}:
+        try:
+            return list(pq.ParquetFile(path).schema_arrow.names)
+        except Exception as exc:
+            raise TelemetryInputError(f"Could not read {path.name}: {exc}") from exc
+    raise TelemetryInputError(f"Unsupported telemetry format: {suffix or path.name}")
+
+
+def _read_csv(path: Path, columns: List[str]) -> pd.DataFrame:
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+    except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError) as exc:
+        raise TelemetryInputError(f"Could not read {path.name}: {exc}") from exc
+
+    # One projected read: validation and aggregation need the whole table, so
+    # only unused columns are worth skipping.
+    wanted = [col for col in columns if col in header]
+    try:
+        return pd.read_csv(path, usecols=wanted)
+    except (pd.errors.ParserError, UnicodeDecodeError) as exc:
+        raise TelemetryInputError(f"Could not read {path.name}: {exc}") from exc
+
+
+def _read_parquet(path: Path, columns: List[str]) -> pd.DataFrame:
+    try:
+        names = pq.read_schema(path).names
+        wanted = [col for col in columns if col in names]
+        return pq.read_table(path, columns=wanted).to_pandas()
+    except Exception as exc:
+        raise TelemetryInputError(f"Could not read {path.name}: {exc}") from exc
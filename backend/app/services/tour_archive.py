@@ -0,0 +1,447 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import re
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..config import settings
+from .storage import connect, database_path
+
+
+class ArchiveNotFoundError(LookupError):
+    """Raised when no enriched tours were retained for an analysis."""
+
+
+# Columns written by ExcelProcessor._prepare_tours, in export order.
+ENRICHED_TOUR_COLUMNS = [
+    "tourid",
+    "vehicleid",
+    "date",
+    "starttime",
+    "endtime",
+    "mileage",
+    "fuelconsumption",
+    "duration (h)",
+    "average speed (km/h)",
+    "consumption (per 100 km)",
+    "outlier",
+    "outlier reason",
+    "estimated electricity consumption (kWh)",
+    "feasibility by tourid",
+    "feasible tour",
+    "infeasible tour",
+    "estimated electricity daily consumption (kWh)",
+    "feasibility by day",
+    "feasible day",
+    "infeasible day",
+]
+
+_ANALYSIS_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Segments are sorted by vehicleid, so each vehicle occupies one contiguous
+# row range per segment.
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tour_segments (
+        segment_id TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tour_segment_ranges (
+        segment_id TEXT NOT NULL REFERENCES tour_segments (segment_id) ON DELETE CASCADE,
+        vehicleid INTEGER NOT NULL,
+        row_start INTEGER NOT NULL,
+        row_stop INTEGER NOT NULL,
+        PRIMARY KEY (segment_id, vehicleid)
+    )
+    """,
+]
+
+
+class TourArchive:
+    """Enriched tours per analysis, kept as immutable Parquet segments.
+
+    A full analysis writes one segment sorted by vehicle/date/starttime. An
+    incremental analysis references its base's segments and adds one segment
+    for the new tours only, so retention cost follows the delta as well.
+    Vehicles whose earlier tours were re-judged are written to the new
+    segment in full and marked superseded in the base segments. Each
+    segment's vehicle row ranges are indexed in SQLite so one vehicle's
+    tours are read from the overlapping row groups only.
+
+    Saves hold a shared lock on the archive directory and deletes an
+    exclusive one, across workers. Orphaned segments are therefore only
+    swept while no save has a segment written but not yet in its manifest.
+    """
+
+    def __init__(self, directory: Path, db_path: Path) -> None:
+        self.directory = Path(directory)
+        self.db_path = Path(db_path)
+        self._initialised = False
+
+    def save(
+        self,
+        analysis_id: str,
+        tours: pd.DataFrame,
+        *,
+        base_analysis_id: Optional[str] = None,
+        replaced_vehicles: Iterable[int] = (),
+        exclude_outliers: bool = False,
+    ) -> List[str]:
+        """Retain ``tours`` for an analysis.
+
+        ``replaced_vehicles`` hold their whole history in ``tours``, so their
+        rows in the base segments are hidden from every read.
+        """
+        with self._locked(exclusive=False):
+            segments: List[str] = []
+            superseded: Dict[str, List[int]] = {}
+            if base_analysis_id:
+                base = self._manifest(base_analysis_id)
+                segments = list(base["segments"])
+                superseded = dict(base.get("superseded", {}))
+                replaced = {int(vehicleid) for vehicleid in replaced_vehicles}
+                if replaced:
+                    for segment_id in segments:
+                        superseded[segment_id] = sorted(
+                            replaced.union(superseded.get(segment_id, []))
+                        )
+            if not tours.empty:
+                segments.append(self._write_segment(tours))
+            self._write_manifest(
+                analysis_id,
+                {
+                    "segments": segments,
+                    "superseded": superseded,
+                    "exclude_outliers": exclude_outliers,
+                },
+            )
+        return segments
+
+    def segments(self, analysis_id: str) -> List[str]:
+        return self._manifest(analysis_id)["segments"]
+
+    def excludes_outliers(self, analysis_id: str) -> bool:
+        """Whether the analysis left outlier tours out of its totals."""
+        return bool(self._manifest(analysis_id).get("exclude_outliers", False))
+
+    def segment_path(self, segment_id: str) -> Path:
+        return self.directory / "segments" / f"{segment_id}.parquet"
+
+    def iter_batches(
+        self,
+        analysis_id: str,
+        batch_rows: int,
+        columns: Optional[List[str]] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """Enriched tours of an analysis, ``batch_rows`` at a time.
+
+        The manifest is resolved eagerly so an unknown id raises before any
+        batch is produced.
+        """
+        manifest = self._manifest(analysis_id)
+        superseded = _superseded(manifest)
+        sources = [
+            (self.segment_path(segment_id), superseded.get(segment_id, set()))
+            for segment_id in manifest["segments"]
+        ]
+        return _iter_parquet(sources, batch_rows, columns)
+
+    def load_columns(
+        self,
+        analysis_id: str,
+        columns: List[str],
+        *,
+        vehicleids: Optional[Sequence[int]] = None,
+        counted_only: bool = False,
+    ) -> pd.DataFrame:
+        """Selected columns of retained tours, ordered by vehicle and start time.
+
+        ``counted_only`` drops the outlier tours an analysis run with
+        ``exclude_outliers`` left out of its totals. Columns missing from
+        older segments come back as NaN.
+        """
+        manifest = self._manifest(analysis_id)
+        superseded = _superseded(manifest)
+        drop_outliers = counted_only and bool(manifest.get("exclude_outliers", False))
+        if vehicleids is not None and not len(vehicleids):
+            return pd.DataFrame(columns=columns)
+        frames = [
+            _read_segment(
+                self.segment_path(segment_id),
+                columns,
+                superseded=superseded.get(segment_id, set()),
+                vehicleids=vehicleids,
+                drop_outliers=drop_outliers,
+            )
+            for segment_id in manifest["segments"]
+        ]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        if len(frames) == 1:
+            return frames[0]
+        # Segments are each sorted; only incremental histories need a merge.
+        return pd.concat(frames, ignore_index=True).sort_values(
+            ["vehicleid", "starttime"], kind="stable", ignore_index=True
+        )
+
+    def vehicle_tours(self, analysis_id: str, vehicleid: int) -> pd.DataFrame:
+        """One vehicle's enriched tours, read through the row-range index."""
+        manifest = self._manifest(analysis_id)
+        segments = manifest["segments"]
+        superseded = _superseded(manifest)
+        self._ensure_indexed(segments)
+        with self._connect() as conn:
+            ranges = conn.execute(
+                f"SELECT segment_id, row_start, row_stop FROM tour_segment_ranges "
+                f"WHERE vehicleid = ? AND segment_id IN ({', '.join('?' for _ in segments)})",
+                (int(vehicleid), *segments),
+            ).fetchall()
+        order = {segment_id: position for position, segment_id in enumerate(segments)}
+        frames = [
+            _read_row_range(self.segment_path(row["segment_id"]), row["row_start"], row["row_stop"])
+            for row in sorted(ranges, key=lambda row: order[row["segment_id"]])
+            if int(vehicleid) not in superseded.get(row["segment_id"], set())
+        ]
+        if not frames:
+            return pd.DataFrame(columns=ENRICHED_TOUR_COLUMNS)
+        tours = pd.concat(frames, ignore_index=True)
+        if len(frames) > 1:
+            tours = tours.sort_values(["date", "starttime"], kind="stable", ignore_index=True)
+        return tours
+
+    def delete(self, analysis_id: str) -> None:
+        path = self._manifest_path(analysis_id)
+        if path is None or not path.exists():
+            return
+        with self._locked(exclusive=True):
+            if not path.exists():
+                return
+            path.unlink()
+            # Segments are shared with incremental descendants; drop only orphans.
+            referenced = set()
+            for manifest in (self.directory / "manifests").glob("*.json"):
+                referenced.update(json.loads(manifest.read_text(encoding="utf-8"))["segments"])
+            orphans = [
+                segment
+                for segment in (self.directory / "segments").glob("*.parquet")
+                if segment.stem not in referenced
+            ]
+            with self._connect() as conn:
+                conn.executemany(
+                    "DELETE FROM tour_segments WHERE segment_id = ?",
+                    ((segment.stem,) for segment in orphans),
+                )
+            for segment in orphans:
+                segment.unlink(missing_ok=True)
+
+    @contextmanager
+    def _locked(self, *, exclusive: bool) -> Iterator[None]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # flock is tied to this open file, so threads and workers exclude each other alike.
+        with open(self.directory / ".lock", "ab") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _write_segment(self, tours: pd.DataFrame) -> str:
+        segment_id = uuid.uuid4().hex
+        target = self.segment_path(segment_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        frame = tours[[col for col in ENRICHED_TOUR_COLUMNS if col in tours.columns]]
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Mixed-type identifier columns (e.g. tourid typed in by hand) are kept as text.
+            mixed = frame.select_dtypes(include="object").columns.drop("date", errors="ignore")
+            frame = frame.astype({col: "string" for col in mixed})
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        partial = target.with_suffix(".tmp")
+        pq.write_table(
+            table,
+            partial,
+            row_group_size=settings.archive_row_group_rows,
+            compression="zstd",
+        )
+        partial.replace(target)
+        self._index_segment(segment_id, frame["vehicleid"])
+        return segment_id
+
+    def _index_segment(self, segment_id: str, vehicleids: pd.Series) -> None:
+        values = vehicleids.to_numpy()
+        count = len(values)
+        boundaries = np.flatnonzero(values[1:] != values[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if count else np.empty(0, dtype=np.int64)
+        stops = np.concatenate((boundaries, [count])) if count else np.empty(0, dtype=np.int64)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tour_segments (segment_id, row_count) VALUES (?, ?)",
+                (segment_id, count),
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO tour_segment_ranges "
+                "(segment_id, vehicleid, row_start, row_stop) VALUES (?, ?, ?, ?)",
+                (
+                    (segment_id, int(values[start]), int(start), int(stop))
+                    for start, stop in zip(starts, stops)
+                    if pd.notna(values[start])
+                ),
+            )
+
+    def _ensure_indexed(self, segments: List[str]) -> None:
+        if not segments:
+            return
+        with self._connect() as conn:
+            indexed = {
+                row["segment_id"]
+                for row in conn.execute(
+                    f"SELECT segment_id FROM tour_segments "
+                    f"WHERE segment_id IN ({', '.join('?' for _ in segments)})",
+                    segments,
+                )
+            }
+        # Segments written before the index existed are indexed on first use.
+        for segment_id in segments:
+            if segment_id not in indexed:
+                vehicleids = pq.read_table(self.segment_path(segment_id), columns=["vehicleid"])
+                self._index_segment(segment_id, vehicleids.column("vehicleid").to_pandas())
+
+    def _connect(self):
+        if not self._initialised:
+            with connect(self.db_path) as conn:
+                for statement in _SCHEMA:
+                    conn.execute(statement)
+            self._initialised = True
+        return connect(self.db_path)
+
+    def _manifest(self, analysis_id: str) -> Dict[str, object]:
+        path = self._manifest_path(analysis_id)
+        if path is None or not path.exists():
+            raise ArchiveNotFoundError(analysis_id)
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _write_manifest(self, analysis_id: str, manifest: Dict[str, object]) -> None:
+        path = self._manifest_path(analysis_id)
+        if path is None:
+            raise ValueError(f"Invalid analysis id {analysis_id!r}")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".tmp")
+        partial.write_text(json.dumps(manifest), encoding="utf-8")
+        partial.replace(path)
+
+    def _manifest_path(self, analysis_id: Optional[str]) -> Optional[Path]:
+        if not _ANALYSIS_ID.match(analysis_id or ""):
+            return None
+        return self.directory / "manifests" / f"{analysis_id}.json"
+
+
+def _superseded(manifest: Dict[str, object]) -> Dict[str, Set[int]]:
+    return {
+        segment_id: set(vehicleids)
+        for segment_id, vehicleids in manifest.get("superseded", {}).items()
+    }
+
+
+def _read_segment(
+    path: Path,
+    columns: List[str],
+    *,
+    superseded: Set[int],
+    vehicleids: Optional[Sequence[int]],
+    drop_outliers: bool,
+) -> pd.DataFrame:
+    available = set(pq.read_schema(path).names)
+    filters = []
+    if superseded:
+        filters.append(("vehicleid", "not in", sorted(superseded)))
+    if vehicleids is not None:
+        filters.append(("vehicleid", "in", [int(vehicleid) for vehicleid in vehicleids]))
+    # Segments written before outlier flagging hold no outliers to drop.
+    if drop_outliers and "outlier" in available:
+        filters.append(("outlier", "==", 0))
+    table = pq.read_table(
+        path,
+        columns=[col for col in columns if col in available],
+        filters=filters or None,
+    )
+    return table.to_pandas().reindex(columns=columns)
+
+
+def _iter_parquet(
+    sources: List[Tuple[Path, Set[int]]],
+    batch_rows: int,
+    columns: Optional[List[str]],
+) -> Iterator[pd.DataFrame]:
+    for path, superseded in sources:
+        parquet_file = pq.ParquetFile(path)
+        read = columns
+        if superseded and columns is not None and "vehicleid" not in columns:
+            read = [*columns, "vehicleid"]
+        for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=read):
+            frame = batch.to_pandas()
+            if superseded:
+                frame = frame.loc[~frame["vehicleid"].isin(superseded), columns or frame.columns]
+                if frame.empty:
+                    continue
+            yield frame
+
+
+def daily_energy(
+    tours: pd.DataFrame,
+    energy_limit_kwh: float,
+    *,
+    exclude_outliers: bool = False,
+) -> pd.DataFrame:
+    """Per-day totals for one vehicle's tours, judged against the analysis limit.
+
+    With ``exclude_outliers`` the days count only the tours the analysis did.
+    """
+    if exclude_outliers and "outlier" in tours.columns:
+        tours = tours[tours["outlier"] != 1]
+    days = (
+        tours.groupby("date", sort=True)
+        .agg(
+            tour_count=("vehicleid", "size"),
+            mileage=("mileage", "sum"),
+            fuel=("fuelconsumption", "sum"),
+            energy_kwh=("estimated electricity consumption (kWh)", "sum"),
+        )
+        .reset_index()
+    )
+    days["feasible"] = days["energy_kwh"] <= energy_limit_kwh
+    return days
+
+
+def _read_row_range(path: Path, row_start: int, row_stop: int) -> pd.DataFrame:
+    """Read rows ``[row_start, row_stop)`` touching only the row groups that hold them."""
+    parquet_file = pq.ParquetFile(path)
+    metadata = parquet_file.metadata
+    groups: List[int] = []
+    first_offset = 0
+    offset = 0
+    for index in range(metadata.num_row_groups):
+        group_rows = metadata.row_group(index).num_rows
+        if offset + group_rows > row_start and offset < row_stop:
+            if not groups:
+                first_offset = offset
+            groups.append(index)
+        offset += group_rows
+        if offset >= row_stop:
+            break
+    table = parquet_file.read_row_groups(groups)
+    return table.slice(row_start - first_offset, row_stop - row_start).to_pandas()
+
+
+@lru_cache()
+def get_tour_archive() -> TourArchive:
+    return TourArchive(settings.data_dir / "tours", database_path())
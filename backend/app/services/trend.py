@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .types import TREND_RESOLUTIONS, TrendResolution
+
+TREND_COLUMNS = [
+    "tour_count",
+    "mileage_sum",
+    "fuel_sum",
+    "energy_sum",
+    "feasible_tours",
+    "row_count",
+]
+
+_PERIOD_FREQ: Dict[TrendResolution, str] = {
+    "week": "W-SUN",
+    "month": "M",
+}
+
+
+def daily_trend_frame(vehicle_days: pd.DataFrame) -> pd.DataFrame:
+    """Collapse per-(vehicle, day) aggregates into one additive row per date."""
+    per_date = vehicle_days.groupby(level="date").sum(numeric_only=True)
+    frame = pd.DataFrame(
+        {
+            "tour_count": per_date["tour_count"],
+            "mileage_sum": per_date["mileage"],
+            "fuel_sum": per_date["fuel"],
+            "energy_sum": per_date["energy_kwh"],
+            "feasible_tours": per_date["feasible_tours"],
+            "row_count": per_date["row_count"],
+        },
+        columns=TREND_COLUMNS,
+    )
+    frame.index = pd.DatetimeIndex(pd.to_datetime(frame.index), name="date")
+    return frame
+
+
+def resample_trend(daily: pd.DataFrame, resolution: TrendResolution) -> pd.DataFrame:
+    if resolution == "day" or daily.empty:
+        return daily
+    # Weeks are labelled by their Monday, months by their first day.
+    periods = daily.index.to_period(_PERIOD_FREQ[resolution]).start_time
+    resampled = daily.groupby(periods).sum()
+    resampled.index = pd.DatetimeIndex(resampled.index, name="date")
+    return resampled
+
+
+def downsample_lttb(
+    frame: pd.DataFrame,
+    max_points: Optional[int],
+    value_column: str = "mileage_sum",
+) -> pd.DataFrame:
+    """Largest-Triangle-Three-Buckets selection of at most ``max_points`` rows.
+
+    Only whole rows are kept, so every emitted point is a real period; the
+    first and last rows always survive.
+    """
+    count = len(frame)
+    if not max_points or max_points >= count or count <= 2:
+        return frame
+    if max_points < 3:
+        return frame.iloc[[0, count - 1]]
+
+    x = frame.index.asi8.astype(np.float64) if isinstance(frame.index, pd.DatetimeIndex) else np.arange(count, dtype=np.float64)
+    y = frame[value_column].to_numpy(dtype=np.float64)
+
+    edges = np.linspace(1, count - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_start, next_stop = stop, edges[bucket + 2] if bucket + 2 < len(edges) else count
+        avg_x = x[next_start:next_stop].mean()
+        avg_y = y[next_start:next_stop].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return frame.iloc[selected]
+
+
+def trend_records(frame: pd.DataFrame, resolution: TrendResolution) -> List[Dict[str, float]]:
+    label_format = "%Y-%m" if resolution == "month" else "%Y-%m-%d"
+    records = pd.DataFrame(
+        {
+            "date": frame.index.strftime(label_format),
+            "tour_count": frame["tour_count"].to_numpy(),
+            "mileage_sum": frame["mileage_sum"].to_numpy(),
+            "fuel_sum": frame["fuel_sum"].to_numpy(),
+            "energy_sum": frame["energy_sum"].to_numpy(),
+            "feasible_rate": (
+                frame["feasible_tours"]
+                .div(frame["row_count"].replace({0: np.nan}))
+                .fillna(0.0)
+                .to_numpy()
+            ),
+        }
+    )
+    return records.round(2).to_dict("records")
@@ -0,0 +1,11 @@
+from typing import List, Literal
+
+TechnologyKey = Literal["diesel", "lng", "bev"]
+
+TrendResolution = Literal["day", "week", "month"]
+
+TREND_RESOLUTIONS: List[TrendResolution] = ["day", "week", "month"]
+
+ExportFormat = Literal["csv", "xlsx"]
+
+ChargingRegime = Literal["depot", "opportunity"]
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+REQUIRED_TOUR_COLUMNS = ["vehicleid", "starttime"]
+# Raw telemetry columns; the rest of TOUR_COLUMNS is derived by the analysis.
+INPUT_TOUR_COLUMNS = ["tourid", "vehicleid", "starttime", "endtime", "mileage", "fuelconsumption"]
+NUMERIC_TOUR_COLUMNS = ["mileage", "fuelconsumption"]
+
+
+class InputValidationError(ValueError):
+    """Raised when an upload is structurally unusable for an analysis."""
+
+
+@dataclass
+class ValidationIssue:
+    sheet: str
+    check: str
+    # "quarantined" rows are left out of the analysis; "flagged" rows stay in.
+    action: str
+    count: int
+    samples: List[Dict[str, object]]
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "sheet": self.sheet,
+            "check": self.check,
+            "action": self.action,
+            "count": int(self.count),
+            "samples": self.samples,
+        }
+
+
+@dataclass
+class ValidationReport:
+    tours_checked: int = 0
+    tours_quarantined: int = 0
+    vehicles_checked: int = 0
+    vehicles_quarantined: int = 0
+    missing_columns: Dict[str, List[str]] = field(default_factory=dict)
+    issues: List[ValidationIssue] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "tours_checked": int(self.tours_checked),
+            "tours_quarantined": int(self.tours_quarantined),
+            "vehicles_checked": int(self.vehicles_checked),
+            "vehicles_quarantined": int(self.vehicles_quarantined),
+            "missing_columns": self.missing_columns,
+            "issues": [issue.to_dict() for issue in self.issues],
+        }
+
+
+def scan_workbook_headers(path: Path, sheets: Sequence[str]) -> Dict[str, List[str]]:
+    """Header row of each sheet, read without parsing any data rows.
+
+    Missing sheets and unreadable files raise ``InputValidationError`` here,
+    before the full parse of a workbook that could never be analysed.
+    """
+    try:
+        wb = load_workbook(filename=path, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile, KeyError, OSError) as exc:
+        raise InputValidationError(f"Could not open workbook: {exc}") from exc
+    try:
+        missing = [sheet for sheet in sheets if sheet not in wb.sheetnames]
+        if missing:
+            raise InputValidationError(f"Workbook is missing sheets: {', '.join(missing)}")
+        headers: Dict[str, List[str]] = {}
+        for sheet in sheets:
+            first_row = next(wb[sheet].iter_rows(max_row=1, values_only=True), ())
+            headers[sheet] = [str(value).strip() for value in first_row if value is not None]
+    finally:
+        wb.close()
+    return headers
+
+
+def check_headers(
+    columns: Sequence[str],
+    *,
+    sheet: str,
+    required: Sequence[str],
+    expected: Sequence[str],
+    report: ValidationReport,
+) -> None:
+    present = set(columns)
+    missing = [col for col in required if col not in present]
+    if missing:
+        raise InputValidationError(f"{sheet} is missing required columns: {', '.join(missing)}")
+    absent = [col for col in expected if col not in present]
+    if absent:
+        report.missing_columns[sheet] = absent
+
+
+def validate_vehicles(
+    vehicles: pd.DataFrame,
+    report: ValidationReport,
+    sample_rows: int,
+) -> pd.DataFrame:
+    """Drop vehicles without a usable id or listed twice (first listing wins)."""
+    ids = pd.to_numeric(vehicles["vehicleid"], errors="coerce")
+    invalid = _invalid_ids(ids)
+    duplicate = ids.duplicated(keep="first").to_numpy() & ~invalid
+    quarantine = _record(
+        vehicles,
+        report,
+        sheet="vehicles",
+        sample_rows=sample_rows,
+        checks=[
+            ("invalid vehicleid", "quarantined", invalid),
+            ("duplicate vehicleid", "quarantined", duplicate),
+        ],
+    )
+    report.vehicles_checked = len(vehicles)
+    report.vehicles_quarantined = int(quarantine.sum())
+    clean = vehicles.loc[~quarantine].copy()
+    clean["vehicleid"] = ids[~quarantine].astype(np.int64)
+    return clean
+
+
+def validate_tours(
+    tours: pd.DataFrame,
+    known_vehicleids: pd.Series,
+    report: ValidationReport,
+    sample_rows: int,
+) -> pd.DataFrame:
+    """Quarantine tours that cannot be analysed and flag suspicious ones.
+
+    Every check is one vectorised mask over whole columns. Tours without a
+    usable vehicle id or start time, with non-numeric mileage or fuel, with a
+    repeated ``tourid`` (first occurrence wins) or for a vehicle missing from
+    the vehicles sheet are quarantined; only tours that pass the other checks
+    compete for a ``tourid``. Negative figures and unreadable end times are
+    only flagged; the outlier stage marks those tours downstream.
+    Columns come back coerced to the types the analysis expects.
+    """
+    ids = pd.to_numeric(tours["vehicleid"], errors="coerce")
+    start = _to_naive_utc(tours["starttime"])
+    end = _to_naive_utc(tours["endtime"])
+    numeric = {col: pd.to_numeric(tours[col], errors="coerce") for col in NUMERIC_TOUR_COLUMNS}
+
+    invalid_id = _invalid_ids(ids)
+    invalid_start = start.isna().to_numpy()
+    non_numeric = {
+        col: (tours[col].notna() & values.isna()).to_numpy() for col, values in numeric.items()
+    }
+    unknown = ~invalid_id & ~ids.isin(known_vehicleids).to_numpy()
+    # A quarantined first occurrence must not take a valid tour down with it.
+    tourids = tours["tourid"]
+    eligible = tourids.notna().to_numpy() & ~(
+        invalid_id | invalid_start | unknown | np.logical_or.reduce(list(non_numeric.values()))
+    )
+    duplicate = np.zeros(len(tours), dtype=bool)
+    duplicate[eligible] = tourids[eligible].duplicated(keep="first").to_numpy()
+    checks = [
+        ("invalid vehicleid", "quarantined", invalid_id),
+        ("invalid starttime", "quarantined", invalid_start),
+        *((f"non-numeric {col}", "quarantined", mask) for col, mask in non_numeric.items()),
+        ("duplicate tourid", "quarantined", duplicate),
+        ("unknown vehicleid", "quarantined", unknown),
+        ("invalid endtime", "flagged", (tours["endtime"].notna() & end.isna()).to_numpy()),
+        *(
+            (f"negative {col}", "flagged", (values < 0).to_numpy())
+            for col, values in numeric.items()
+        ),
+    ]
+    quarantine = _record(
+        tours[INPUT_TOUR_COLUMNS],
+        report,
+        sheet="tours",
+        sample_rows=sample_rows,
+        checks=checks,
+    )
+    report.tours_checked = len(tours)
+    report.tours_quarantined = int(quarantine.sum())
+
+    keep = ~quarantine
+    clean = tours.loc[keep].copy()
+    clean["vehicleid"] = ids[keep].astype(np.int64)
+    clean["starttime"] = start[keep]
+    clean["endtime"] = end[keep]
+    for col, values in numeric.items():
+        clean[col] = values[keep]
+    return clean
+
+
+def _record(
+    frame: pd.DataFrame,
+    report: ValidationReport,
+    *,
+    sheet: str,
+    sample_rows: int,
+    checks: List[Tuple[str, str, np.ndarray]],
+) -> np.ndarray:
+    quarantine = np.zeros(len(frame), dtype=bool)
+    for check, action, mask in checks:
+        count = int(mask.sum())
+        if not count:
+            continue
+        if action == "quarantined":
+            quarantine |= mask
+        report.issues.append(
+            ValidationIssue(sheet, check, action, count, _samples(frame, mask, sample_rows))
+        )
+    return quarantine
+
+
+def _samples(frame: pd.DataFrame, mask: np.ndarray, sample_rows: int) -> List[Dict[str, object]]:
+    positions = np.flatnonzero(mask)[:sample_rows]
+    # Spreadsheet row numbers: the header is row 1.
+    sample = frame.iloc[positions].assign(row=positions + 2)
+    return json.loads(
+        sample.to_json(orient="records", date_format="iso", date_unit="s", default_handler=str)
+    )
+
+
+def _invalid_ids(ids: pd.Series) -> np.ndarray:
+    values = ids.to_numpy(dtype=np.float64)
+    return ~np.isfinite(values) | (values != np.floor(values))
+
+
+def _to_naive_utc(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(values, errors="coerce", utc=True).dt.tz_convert(None)
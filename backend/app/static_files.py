@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import mimetypes
+import os
+import re
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_SUFFIXES = {
+    ".html",
+    ".js",
+    ".mjs",
+    ".css",
+    ".json",
+    ".map",
+    ".svg",
+    ".txt",
+    ".xml",
+    ".wasm",
+}
+MIN_COMPRESS_BYTES = 1024
+
+# Vite emits content-hashed names such as assets/index-4f3a9c1e.js, and only
+# into its assetsDir; files copied from public/ (apple-touch-icon.png, ...)
+# keep their names and must revalidate.
+HASHED_ASSETS_DIR = "assets"
+_HASHED_NAME = re.compile(r"-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+# Preferred first when the client accepts several.
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles for the bundled SPA with precompressed variants and cache headers.
+
+    ``precompress()`` writes ``.br``/``.gz`` siblings next to compressible
+    assets (skipping ones already up to date, e.g. produced at build time) and
+    registers them; requests then get the best variant their
+    ``Accept-Encoding`` allows. Content-hashed files in Vite's ``assets/``
+    directory are marked immutable, everything else revalidates through ETag/Last-Modified. Unknown paths
+    without a file extension fall back to ``index.html`` for client routing.
+    """
+
+    def __init__(self, *, directory: Path, index: str = "index.html", **kwargs) -> None:
+        super().__init__(directory=directory, html=True, **kwargs)
+        self.root = Path(directory).resolve()
+        self.index = index
+        self._variants: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self.precompressed = False
+
+    def precompress(self) -> int:
+        """Create or refresh compressed siblings; returns the number written."""
+        brotli = _brotli()
+        written = 0
+        variants: Dict[str, Dict[str, str]] = {}
+        for path in self.root.rglob("*"):
+            if not path.is_file() or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+                continue
+            source_stat = path.stat()
+            if source_stat.st_size < MIN_COMPRESS_BYTES:
+                continue
+
+            data: Optional[bytes] = None
+            available: Dict[str, str] = {}
+            for encoding, suffix in _ENCODINGS:
+                target = path.with_name(path.name + suffix)
+                if not _is_fresh(target, source_stat):
+                    if encoding == "br" and brotli is None:
+                        continue
+                    if data is None:
+                        data = path.read_bytes()
+                    compressed = (
+                        brotli.compress(data, quality=11)
+                        if encoding == "br"
+                        else gzip.compress(data, compresslevel=9, mtime=0)
+                    )
+                    if len(compressed) >= len(data):
+                        continue
+                    try:
+                        _atomic_write(target, compressed)
+                    except OSError as exc:
+                        logger.warning("Cannot write %s: %s", target, exc)
+                        continue
+                    written += 1
+                available[encoding] = str(target)
+            if available:
+                variants[str(path.resolve())] = available
+
+        with self._lock:
+            self._variants = variants
+        self.precompressed = True
+        logger.info("Precompressed %d static variants for %d assets", written, len(variants))
+        return written
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404 or not _is_client_route(path):
+                raise
+        index_path = self.root / self.index
+        try:
+            index_stat = os.stat(index_path)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404)
+        return self.file_response(index_path, index_stat, scope)
+
+    def file_response(
+        self,
+        full_path: os.PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        original = str(Path(full_path).resolve())
+        media_type = mimetypes.guess_type(original)[0] or "application/octet-stream"
+
+        served_path: str = original
+        served_stat = stat_result
+        encoding: Optional[str] = None
+        with self._lock:
+            available = self._variants.get(original, {})
+        if available:
+            accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+            for candidate, _ in _ENCODINGS:
+                variant = available.get(candidate)
+                if variant is None or candidate not in accepted:
+                    continue
+                try:
+                    served_stat = os.stat(variant)
+                except FileNotFoundError:
+                    continue
+                served_path, encoding = variant, candidate
+                break
+
+        response = FileResponse(
+            served_path,
+            status_code=status_code,
+            stat_result=served_stat,
+            media_type=media_type,
+        )
+        if encoding is not None:
+            response.headers["content-encoding"] = encoding
+        if Path(original).suffix.lower() in COMPRESSIBLE_SUFFIXES:
+            response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = (
+            IMMUTABLE_CACHE if self._is_hashed_asset(Path(original)) else REVALIDATE_CACHE
+        )
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    def _is_hashed_asset(self, path: Path) -> bool:
+        try:
+            relative = path.relative_to(self.root)
+        except ValueError:
+            return False
+        return (
+            len(relative.parts) == 2
+            and relative.parts[0] == HASHED_ASSETS_DIR
+            and _HASHED_NAME.search(relative.name) is not None
+        )
+
+
+def _is_client_route(path: str) -> bool:
+    # "reports/42" is an SPA route; "assets/missing.js" is a genuine 404.
+    name = path.rstrip("/").rsplit("/", 1)[-1]
+    return "." not in name
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token)
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _ in _ENCODINGS)
+    return accepted
+
+
+def _is_fresh(target: Path, source_stat: os.stat_result) -> bool:
+    try:
+        return target.stat().st_mtime >= source_stat.st_mtime
+    except FileNotFoundError:
+        return False
+
+
+def _atomic_write(target: Path, data: bytes) -> None:
+    # A unique partial file per writer, so concurrent precompress runs never
+    # interleave their bytes; the last rename wins with a complete file.
+    with tempfile.NamedTemporaryFile(
+        dir=target.parent, prefix=f".{target.name}.", suffix=".tmp", delete=False
+    ) as partial:
+        partial.write(data)
+    try:
+        os.chmod(partial.name, 0o644)
+        os.replace(partial.name, target)
+    except OSError:
+        os.unlink(partial.name)
+        raise
+
+
+if __name__ == "__main__":
+    # Build-time use: python -m app.static_files [static-dir]
+    logging.basicConfig(level=logging.INFO)
+    default_dir = Path(__file__).resolve().parent.parent / "static"
+    directory = Path(sys.argv[1]) if len(sys.argv) > 1 else default_dir
+    PrecompressedStaticFiles(directory=directory).precompress()
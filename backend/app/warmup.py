@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import importlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Imported in order; the first entries dominate and include their dependencies.
+ANALYSIS_MODULES = (
+    "numpy",
+    "pandas",
+    "openpyxl",
+    "pyarrow.parquet",
+    "app.services.excel_processor",
+    "app.services.tabular_processor",
+    "app.services.parameter_profiles",
+    "app.services.analysis_store",
+    "app.services.tour_archive",
+)
+
+_lock = threading.Lock()
+_ready = threading.Event()
+_state: Dict[str, object] = {
+    "status": "cold",
+    "started_at": None,
+    "warmup_seconds": None,
+    "modules": {},
+    "error": None,
+}
+
+
+def warm_analysis_stack() -> None:
+    """Import the analysis stack once, recording per-module import time.
+
+    Safe to call from any thread; callers arriving while another thread is
+    importing block until it finishes instead of importing concurrently.
+    """
+    if _ready.is_set():
+        return
+    with _lock:
+        if _ready.is_set():
+            return
+        _state["status"] = "warming"
+        started = time.perf_counter()
+        _state["started_at"] = time.time()
+        timings: Dict[str, float] = {}
+        try:
+            for name in ANALYSIS_MODULES:
+                timings[name] = _timed_import(name)
+        except Exception as exc:
+            _state["status"] = "failed"
+            _state["error"] = repr(exc)
+            logger.exception("Warming the analysis stack failed")
+            raise
+        finally:
+            _state["modules"] = timings
+        _state["warmup_seconds"] = round(time.perf_counter() - started, 4)
+        _state["status"] = "ready"
+        _ready.set()
+    logger.info("Analysis stack ready in %.2fs", _state["warmup_seconds"])
+
+
+def start_background_warmup() -> Optional[threading.Thread]:
+    if _ready.is_set():
+        return None
+    thread = threading.Thread(
+        target=_warm_quietly,
+        name="analysis-warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def warmup_status() -> Dict[str, object]:
+    return dict(_state)
+
+
+def _warm_quietly() -> None:
+    try:
+        warm_analysis_stack()
+    except Exception:  # pragma: no cover - already logged, retried on first request
+        pass
+
+
+def _timed_import(name: str) -> float:
+    started = time.perf_counter()
+    importlib.import_module(name)
+    return round(time.perf_counter() - started, 4)
@@ -0,0 +1,32 @@
+"""Multi-worker launch: ``gunicorn -c gunicorn.conf.py app.main:app``.
+
+The app and the pandas/openpyxl analysis stack are imported once in the
+master before forking, so every worker starts warm and shares those pages
+copy-on-write instead of paying the import cost per process. The static
+frontend is precompressed there too, so workers do not race on the same
+.br/.gz files.
+
+Admission control runs in each worker. The ADMISSION_* limits are for the
+whole service and are split evenly across WEB_CONCURRENCY workers, with at
+least one analysis slot per worker. Use a single worker if the limits must
+hold exactly.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Exported so the app (imported after this file) splits admission limits by it.
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn_worker.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+
+
+def on_starting(server):
+    from app.main import precompress_frontend
+    from app.warmup import warm_analysis_stack, warmup_status
+
+    warm_analysis_stack()
+    server.log.info("Analysis stack preloaded: %s", warmup_status()["modules"])
+    precompress_frontend()
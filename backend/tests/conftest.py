@@ -0,0 +1,126 @@
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Settings are read at import time, so the store location is fixed before the app loads.
+os.environ["MAEVA_DATA_DIR"] = tempfile.mkdtemp(prefix="maeva-tests-")
+os.environ["ENABLE_AI_SUMMARY"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from app.main import app
+
+TOUR_HEADER = ["tourid", "vehicleid", "starttime", "endtime", "mileage", "fuelconsumption"]
+
+# TCO-calculation rows 2-24, columns B/C/D = diesel/LNG/BEV.
+TCO_VALUES = {
+    2: (100000, 110000, 250000),
+    3: (6, 6, 6),
+    4: (0, 0, 40),
+    5: (15, 15, 15),
+    6: (100000, 110000, 250000),
+    7: (0.1, 0.11, 0.08),
+    8: (500, 400, 0),
+    9: (3000, 3000, 3500),
+    10: (100000, 100000, 100000),
+    11: (6, 6, 6),
+    12: (500, 500, 500),
+    13: (80, 80, 80),
+    14: (1.4, 1.1, 0.25),
+    15: (1.6, 1.3, 0.45),
+    16: (1, 1, 0),
+    17: (5, 0, 0),
+    18: (0.4, 0, 0),
+    19: (0, 0, 0),
+    20: (0, 0, 0),
+    21: (30, 30, 0),
+    22: (60, 60, 60),
+    23: (4, 4, 4),
+    24: (10, 10, 10),
+}
+
+
+@pytest.fixture(scope="session")
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """Write tours (rows in TOUR_HEADER order) and vehicles into an analysable workbook."""
+
+    def write(name, tours, vehicles=None, energy_limit_kwh=600.0):
+        wb = Workbook()
+        sheet = wb.active
+        sheet.title = "tours"
+        sheet.append(TOUR_HEADER)
+        sheet["AE1"] = energy_limit_kwh
+        for row in tours:
+            sheet.append(list(row))
+        if vehicles is None:
+            ids = sorted({row[1] for row in tours if isinstance(row[1], int)})
+            vehicles = [(vid, f"AB-{vid:03d}", "LNG" if vid % 4 == 0 else "Diesel") for vid in ids]
+        vehicle_sheet = wb.create_sheet("vehicles")
+        vehicle_sheet.append(["vehicleid", "licenseno", "fueltypes"])
+        for row in vehicles:
+            vehicle_sheet.append(list(row))
+        tco = wb.create_sheet("TCO-calculation")
+        for row, values in TCO_VALUES.items():
+            for column, value in zip("BCD", values):
+                tco[f"{column}{row}"] = value
+        path = Path(tmp_path) / name
+        wb.save(path)
+        return path
+
+    return write
+
+
+@pytest.fixture
+def fleet():
+    """Deterministic tour rows: one to three tours per vehicle and day from 2024-01-01."""
+
+    def generate(vehicles=6, days=16, seed=1):
+        rng = random.Random(seed)
+        rows = []
+        tourid = 1
+        for day in range(days):
+            for vehicleid in range(1, vehicles + 1):
+                start = datetime(2024, 1, 1) + timedelta(days=day, hours=6)
+                for _ in range(rng.randint(1, 3)):
+                    end = start + timedelta(hours=rng.uniform(1, 4))
+                    mileage = rng.uniform(20, 200)
+                    fuel = mileage * rng.uniform(0.25, 0.35)
+                    rows.append(
+                        [
+                            tourid,
+                            vehicleid,
+                            start.replace(microsecond=0),
+                            end.replace(microsecond=0),
+                            mileage,
+                            fuel,
+                        ]
+                    )
+                    tourid += 1
+                    start = end + timedelta(hours=rng.uniform(0.2, 2))
+        return rows
+
+    return generate
+
+
+@pytest.fixture
+def analyse(client):
+    def run(path, **form):
+        data = {
+            key: str(value).lower() if isinstance(value, bool) else value
+            for key, value in form.items()
+        }
+        with open(path, "rb") as handle:
+            response = client.post("/api/analyze", files={"file": (path.name, handle)}, data=data)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return run
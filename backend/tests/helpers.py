@@ -0,0 +1,29 @@
+import math
+from datetime import datetime, timedelta
+
+
+def assert_close(left, right, path="payload"):
+    """Compare JSON payloads, allowing float noise from a different summation order."""
+    if isinstance(left, dict):
+        assert left.keys() == right.keys(), path
+        for key in left:
+            assert_close(left[key], right[key], f"{path}.{key}")
+    elif isinstance(left, list):
+        assert len(left) == len(right), path
+        for index, (a, b) in enumerate(zip(left, right)):
+            assert_close(a, b, f"{path}[{index}]")
+    elif isinstance(left, float) or isinstance(right, float):
+        assert math.isclose(left, right, rel_tol=1e-9, abs_tol=0.011), (path, left, right)
+    else:
+        assert left == right, (path, left, right)
+
+
+def plausible_tours(vehicles, days):
+    # Two-hour tours at 40 km/h and 30-32 l/100 km.
+    rows = []
+    for day in range(days):
+        for vehicleid in range(1, vehicles + 1):
+            start = datetime(2024, 1, 1 + day, 6)
+            fuel = 24.0 + day % 3 * 0.8
+            rows.append([len(rows) + 1, vehicleid, start, start + timedelta(hours=2), 80.0, fuel])
+    return rows
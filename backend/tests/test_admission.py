@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, AdmissionRejected
+from app.api import routes
+from app.services.incremental import get_state_store
+
+
+def controller(**limits):
+    settings = {
+        "max_concurrent": 1,
+        "memory_budget_bytes": 1000,
+        "max_queue": 8,
+        "max_client_queue": 4,
+        "queue_timeout_seconds": 5.0,
+        **limits,
+    }
+    return AdmissionController(**settings)
+
+
+def run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, 5.0))
+
+
+def test_queued_clients_are_served_round_robin():
+    admission = controller()
+    order = []
+
+    async def job(client_id, name, hold=0.01):
+        async with admission.slot(client_id, 10):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def scenario():
+        first = asyncio.create_task(job("a", "a1", hold=0.05))
+        await asyncio.sleep(0)
+        queued = [("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2")]
+        tasks = [asyncio.create_task(job(client, name)) for client, name in queued]
+        await asyncio.sleep(0)
+        assert admission.metrics()["queued"] == 4
+        await asyncio.gather(first, *tasks)
+
+    run(scenario())
+
+    assert order == ["a1", "a2", "b1", "a3", "b2"]
+    metrics = admission.metrics()
+    assert metrics["completed_total"] == 5
+    assert metrics["running"] == metrics["queued"] == 0
+
+
+def test_memory_budget_holds_back_a_second_large_job():
+    admission = controller(max_concurrent=4)
+    running = []
+
+    async def job(cost):
+        async with admission.slot(str(cost), cost):
+            running.append(admission.metrics()["running"])
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        await asyncio.gather(job(700), job(600), job(200))
+
+    run(scenario())
+
+    # 700 and 200 fit together; 600 waits until 700 is done.
+    assert running == [1, 2, 2]
+
+
+def test_oversized_jobs_run_alone():
+    admission = controller(max_concurrent=4)
+
+    async def scenario():
+        async with admission.slot("a", 5000):
+            assert admission.metrics()["running"] == 1
+
+    run(scenario())
+    assert admission.metrics()["completed_total"] == 1
+
+
+def test_full_queues_and_timeouts_are_rejected():
+    admission = controller(max_queue=1, max_client_queue=1, queue_timeout_seconds=0.05)
+
+    async def scenario():
+        await admission.acquire("a", 10)
+        waiting = asyncio.create_task(admission.acquire("b", 10))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected, match="queue is full") as rejected:
+            await admission.acquire("c", 10)
+        assert rejected.value.retry_after >= 1.0
+        with pytest.raises(AdmissionRejected, match="Timed out"):
+            await waiting
+
+    run(scenario())
+
+    metrics = admission.metrics()
+    assert metrics["rejected_total"] == 2
+    assert metrics["timed_out_total"] == 1
+    assert metrics["queued"] == 0
+
+
+def test_busy_service_answers_503_with_retry_after(client, workbook, fleet, monkeypatch):
+    busy = controller(max_queue=0)
+    asyncio.run(busy.acquire("someone else", 10))
+    monkeypatch.setattr(routes, "get_admission_controller", lambda: busy)
+
+    with open(workbook("busy.xlsx", fleet(vehicles=2, days=2)), "rb") as handle:
+        response = client.post("/api/analyze", files={"file": ("busy.xlsx", handle)})
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_incremental_cost_includes_the_base_state(client, workbook, fleet, analyse, monkeypatch):
+    admission = controller(max_concurrent=4, memory_budget_bytes=2**40)
+    costs = []
+    slot = admission.slot
+
+    def recording_slot(client_id, cost):
+        costs.append(cost)
+        return slot(client_id, cost)
+
+    monkeypatch.setattr(admission, "slot", recording_slot)
+    monkeypatch.setattr(routes, "get_admission_controller", lambda: admission)
+    rows = fleet(vehicles=3, days=4)
+    first = workbook("first.xlsx", rows[: len(rows) // 2])
+    second = workbook("second.xlsx", rows[len(rows) // 2 :])
+
+    base = analyse(first)
+    analyse(second, base_analysis_id=base["analysis_id"])
+
+    state_bytes = get_state_store().size(base["analysis_id"])
+    upload_costs = [
+        admission.estimate_cost(path.stat().st_size, ".xlsx") for path in (first, second)
+    ]
+    assert costs == [upload_costs[0], upload_costs[1] + admission.estimate_state_cost(state_bytes)]
+    with open(second, "rb") as handle:
+        unknown = client.post(
+            "/api/analyze",
+            files={"file": ("second.xlsx", handle)},
+            data={"base_analysis_id": "f" * 32},
+        )
+    assert unknown.status_code == 404
+    assert len(costs) == 2
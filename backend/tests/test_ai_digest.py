@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.config import settings
+from app.services.ai_client import _compose_prompt
+from app.services.ai_digest import build_digest, dumps_compact, estimate_tokens
+from app.services.trend import TREND_COLUMNS
+
+SECTIONS = ["overview", "fuel_mix", "distribution", "extremes", "outliers", "trend", "charging"]
+
+
+@pytest.fixture
+def analysis(workbook, fleet, analyse):
+    return analyse(workbook("digest.xlsx", fleet(vehicles=8, days=10, seed=3)))
+
+
+def daily_frame(days=31, slope=2.0):
+    index = pd.DatetimeIndex(pd.date_range("2024-01-01", periods=days), name="date")
+    frame = pd.DataFrame(0.0, index=index, columns=TREND_COLUMNS)
+    frame["tour_count"] = 10.0
+    frame["mileage_sum"] = 100.0 + slope * np.arange(days)
+    frame["energy_sum"] = 50.0
+    return frame
+
+
+def test_every_section_fits_a_generous_budget(analysis):
+    digest, report = build_digest(analysis, 100_000, daily_frame())
+
+    assert list(digest) == SECTIONS
+    assert report["dropped_sections"] == []
+    assert report["digest_tokens_estimate"] == estimate_tokens(dumps_compact(digest))
+    # Without the full daily series there is no trend to fit.
+    assert "trend" not in build_digest(analysis, 100_000)[0]
+
+
+@pytest.mark.parametrize("budget", [0, 10, 40, 80, 150, 250, 400, 800])
+def test_digest_never_exceeds_its_budget(analysis, budget):
+    full, _ = build_digest(analysis, 100_000, daily_frame())
+
+    digest, report = build_digest(analysis, budget, daily_frame())
+
+    assert report["digest_tokens_estimate"] <= max(budget, estimate_tokens("{}"))
+    assert report["sections"] == list(digest)
+    assert set(digest) | set(report["dropped_sections"]) == set(SECTIONS)
+    # Sections keep their priority order and shrink rather than vanish when they can.
+    assert list(digest) == [name for name in SECTIONS if name in digest]
+    for name, section in digest.items():
+        assert len(dumps_compact(section)) <= len(dumps_compact(full[name]))
+
+
+def test_trend_slopes_come_from_the_daily_series(analysis):
+    digest, _ = build_digest({**analysis, "trend_resolution": "week"}, 100_000, daily_frame())
+
+    slopes = digest["trend"]["slopes"]
+    assert digest["trend"]["from"] == "2024-01-01"
+    assert digest["trend"]["to"] == "2024-01-31"
+    assert slopes["mileage_sum"]["slope_per_period"] == pytest.approx(2.0 * 49)
+    assert slopes["mileage_sum"]["change_pct"] == pytest.approx(2.0 * 30 / 130 * 100, abs=0.1)
+    assert slopes["energy_sum"] == {"slope_per_period": 0.0, "change_pct": 0.0}
+
+
+def test_prompt_fits_the_configured_budget(analysis):
+    prompt, report = _compose_prompt(analysis, daily_frame())
+
+    assert report["prompt_tokens_estimate"] == estimate_tokens(prompt)
+    assert report["prompt_tokens_estimate"] <= settings.ai_token_budget
+    digest, _ = build_digest(analysis, report["token_budget"], daily_frame())
+    assert prompt.endswith(dumps_compact(digest))
@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta
+
+
+def tours_in(year, vehicles, days=4, mileage=80.0):
+    rows = []
+    for day in range(days):
+        for vehicleid in vehicles:
+            start = datetime(year, 3, 1 + day, 6)
+            rows.append(
+                [
+                    len(rows) + 1,
+                    vehicleid,
+                    start,
+                    start + timedelta(hours=2),
+                    mileage,
+                    mileage * 0.3,
+                ]
+            )
+    return rows
+
+
+def test_analyses_are_listed_fetched_and_deleted(client, workbook, analyse):
+    older = analyse(workbook("older.xlsx", tours_in(2031, [1, 2])))
+    newer = analyse(workbook("newer.xlsx", tours_in(2032, [2, 3])))
+
+    listed = client.get("/api/analyses", params={"start_date": "2031-01-01"}).json()
+    assert [entry["analysis_id"] for entry in listed] == [
+        newer["analysis_id"],
+        older["analysis_id"],
+    ]
+    assert listed[1]["source_name"] == "older.xlsx"
+    assert listed[1]["total_tours"] == 8
+    by_vehicle = client.get(
+        "/api/analyses", params={"vehicleid": 1, "start_date": "2031-01-01"}
+    ).json()
+    assert [entry["analysis_id"] for entry in by_vehicle] == [older["analysis_id"]]
+    window = client.get(
+        "/api/analyses", params={"start_date": "2031-06-01", "end_date": "2032-01-01"}
+    ).json()
+    assert window == []
+    assert (
+        len(client.get("/api/analyses", params={"start_date": "2031-01-01", "limit": 1}).json())
+        == 1
+    )
+
+    stored = client.get(f"/api/analyses/{older['analysis_id']}").json()
+    assert [vehicle["vehicleid"] for vehicle in stored["vehicles"]] == [1, 2]
+    assert stored["total_vehicles"] == older["total_vehicles"]
+
+    assert client.delete(f"/api/analyses/{older['analysis_id']}").status_code == 204
+    assert client.get(f"/api/analyses/{older['analysis_id']}").status_code == 404
+    assert client.delete(f"/api/analyses/{older['analysis_id']}").status_code == 404
+    assert client.get(f"/api/analyses/{older['analysis_id']}/export/tours").status_code == 404
+
+
+def test_diff_reports_added_removed_and_changed_vehicles(client, workbook, analyse):
+    base_rows = tours_in(2033, [1, 2, 3])
+    other_rows = [list(row) for row in base_rows if row[1] != 3] + [
+        [row[0] + 100, 4, *row[2:]] for row in base_rows if row[1] == 3
+    ]
+    for row in other_rows:
+        if row[1] == 1:
+            row[4], row[5] = 160.0, 48.0
+    base = analyse(workbook("base.xlsx", base_rows))
+    other = analyse(workbook("other.xlsx", other_rows))
+    url = f"/api/analyses/{base['analysis_id']}/diff/{other['analysis_id']}"
+
+    diff = client.get(url).json()
+    full = client.get(url, params={"changed_only": "false"}).json()
+
+    assert diff["vehicle_status_counts"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    statuses = {vehicle["vehicleid"]: vehicle["status"] for vehicle in diff["vehicles"]}
+    assert statuses == {1: "changed", 3: "removed", 4: "added"}
+    changed = next(vehicle for vehicle in diff["vehicles"] if vehicle["vehicleid"] == 1)
+    mileage = changed["annual_mileage"]
+    assert mileage["delta"] == mileage["other"] - mileage["base"] > 0
+    removed = next(vehicle for vehicle in diff["vehicles"] if vehicle["vehicleid"] == 3)
+    assert removed["tour_count"] == {"base": 4, "other": None, "delta": None}
+    assert [vehicle["vehicleid"] for vehicle in full["vehicles"]] == [1, 2, 3, 4]
+    assert diff["base"]["analysis_id"] == base["analysis_id"]
+    assert client.get(f"/api/analyses/{base['analysis_id']}/diff/missing").status_code == 404
@@ -0,0 +1,46 @@
+import pyarrow.parquet as pq
+
+from app.services.tour_archive import get_tour_archive
+from helpers import plausible_tours
+
+
+def test_vehicle_tours_and_days(client, workbook, analyse):
+    rows = plausible_tours(vehicles=4, days=5)
+    rows.append(
+        [len(rows) + 1, 3, rows[2][2].replace(hour=12), rows[2][3].replace(hour=14), 80.0, 24.0]
+    )
+    analysis = analyse(workbook("drill.xlsx", rows, energy_limit_kwh=150.0))
+    url = f"/api/analyses/{analysis['analysis_id']}/vehicles"
+
+    drill = client.get(f"{url}/3/tours").json()
+
+    assert drill["vehicleid"] == 3
+    assert drill["energy_limit_kwh"] == 150.0
+    assert drill["tour_count"] == 6
+    assert {tour["vehicleid"] for tour in drill["tours"]} == {3}
+    assert [tour["tourid"] for tour in drill["tours"]] == [3, 21, 7, 11, 15, 19]
+    assert [day["tour_count"] for day in drill["days"]] == [2, 1, 1, 1, 1]
+    first_day = drill["days"][0]
+    assert first_day["energy_kwh"] > 150.0 and first_day["feasible"] is False
+    assert all(day["feasible"] for day in drill["days"][1:])
+    assert client.get(f"{url}/99/tours").status_code == 404
+    assert client.get("/api/analyses/missing/vehicles/3/tours").status_code == 404
+
+
+def test_incremental_vehicle_tours_span_segments(client, workbook, analyse):
+    rows = plausible_tours(vehicles=3, days=6)
+    base = analyse(workbook("early.xlsx", rows[:9]))
+    later = analyse(workbook("late.xlsx", rows[9:]), base_analysis_id=base["analysis_id"])
+    archive = get_tour_archive()
+    segments = archive.segments(later["analysis_id"])
+    # Segments are sorted by vehicle, so each vehicle is one contiguous row range.
+    for segment in segments:
+        vehicleids = pq.read_table(archive.segment_path(segment), columns=["vehicleid"])
+        column = vehicleids.column("vehicleid").to_pylist()
+        assert column == sorted(column)
+
+    drill = client.get(f"/api/analyses/{later['analysis_id']}/vehicles/2/tours").json()
+
+    assert len(segments) == 2
+    assert [tour["tourid"] for tour in drill["tours"]] == [row[0] for row in rows if row[1] == 2]
+    assert [day["date"] for day in drill["days"]] == [f"2024-01-0{day}" for day in range(1, 7)]
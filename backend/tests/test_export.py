@@ -0,0 +1,96 @@
+import io
+import threading
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from app.services import export
+from app.services.export import iter_csv, iter_xlsx
+from app.services.storage import database_path
+from app.services.tour_archive import ENRICHED_TOUR_COLUMNS, TourArchive
+from helpers import plausible_tours
+
+
+def test_exports_stream_the_stored_results(client, workbook, analyse):
+    rows = plausible_tours(vehicles=3, days=4)
+    analysis = analyse(workbook("export.xlsx", rows))
+    url = f"/api/analyses/{analysis['analysis_id']}/export"
+
+    vehicles_csv = client.get(f"{url}/vehicles")
+    tours_csv = client.get(f"{url}/tours")
+    tours_xlsx = client.get(f"{url}/tours", params={"format": "xlsx"})
+
+    assert vehicles_csv.headers["content-type"].startswith("text/csv")
+    assert "content-length" not in vehicles_csv.headers
+    assert vehicles_csv.headers["content-disposition"].endswith('-vehicles.csv"')
+    vehicles = pd.read_csv(io.StringIO(vehicles_csv.text))
+    assert vehicles["vehicleid"].tolist() == [1, 2, 3]
+    assert vehicles["tour_count"].tolist() == [4, 4, 4]
+    tours = pd.read_csv(io.StringIO(tours_csv.text))
+    assert tours.columns.tolist() == ENRICHED_TOUR_COLUMNS
+    assert sorted(tours["tourid"]) == [row[0] for row in rows]
+    sheet = load_workbook(io.BytesIO(tours_xlsx.content), read_only=True)["tours"]
+    cells = list(sheet.values)
+    assert list(cells[0]) == ENRICHED_TOUR_COLUMNS
+    assert len(cells) == len(rows) + 1
+    assert client.get("/api/analyses/missing/export/tours").status_code == 404
+
+
+def test_batches_are_encoded_one_at_a_time(monkeypatch):
+    batches = [
+        pd.DataFrame({"a": [1, 2], "b": ["x", None]}),
+        pd.DataFrame(),
+        pd.DataFrame({"a": [3]}),
+    ]
+    monkeypatch.setattr(export, "XLSX_MAX_ROWS", 3)
+
+    csv = b"".join(iter_csv(["a", "b"], iter(batches))).decode()
+    book = load_workbook(io.BytesIO(b"".join(iter_xlsx("rows", ["a", "b"], iter(batches)))))
+
+    assert csv.splitlines() == ["a,b", "1,x", "2,", "3,"]
+    # Rows beyond the sheet limit continue on a numbered sheet.
+    assert book.sheetnames == ["rows", "rows (2)"]
+    assert list(book["rows"].values) == [("a", "b"), (1, "x"), (2, None)]
+    assert list(book["rows (2)"].values) == [("a", "b"), (3, None)]
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return TourArchive(tmp_path / "tours", database_path())
+
+
+def archived_tours(vehicleids):
+    rows = [
+        row for row in plausible_tours(vehicles=max(vehicleids), days=2) if row[1] in vehicleids
+    ]
+    frame = pd.DataFrame(
+        rows, columns=["tourid", "vehicleid", "starttime", "endtime", "mileage", "fuelconsumption"]
+    )
+    return frame.assign(date=frame["starttime"].dt.normalize())
+
+
+def test_delete_waits_for_a_save_in_flight(archive, monkeypatch):
+    # A second instance stands in for another worker sharing the directory.
+    other_worker = TourArchive(archive.directory, archive.db_path)
+    archive.save("a" * 32, archived_tours([1]))
+    other_worker.save("b" * 32, archived_tours([2]))
+    deleting = threading.Thread(target=other_worker.delete, args=("b" * 32,))
+    write_manifest = archive._write_manifest
+
+    def racing_write(analysis_id, manifest):
+        # The new segment is on disk but not yet referenced by any manifest.
+        deleting.start()
+        deleting.join(timeout=0.3)
+        assert deleting.is_alive()
+        write_manifest(analysis_id, manifest)
+
+    monkeypatch.setattr(archive, "_write_manifest", racing_write)
+    segments = archive.save("c" * 32, archived_tours([1, 2]), base_analysis_id="a" * 32)
+    deleting.join()
+
+    assert all(archive.segment_path(segment).exists() for segment in segments)
+    history = archive.load_columns("c" * 32, ["vehicleid", "starttime"])
+    assert history["vehicleid"].tolist() == [1, 1, 1, 1, 2, 2]
+    assert not list((archive.directory / "segments").glob("*.tmp"))
+    assert len(list((archive.directory / "segments").glob("*.parquet"))) == 2
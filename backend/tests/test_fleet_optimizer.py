@@ -0,0 +1,100 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.fleet_optimizer import (
+    OptimisationError,
+    conversion_candidates,
+    optimise_conversions,
+)
+
+
+def candidates(savings, costs):
+    return pd.DataFrame(
+        {
+            "vehicleid": range(len(savings)),
+            "licenseno": [f"AB-{i:03d}" for i in range(len(savings))],
+            "fueltypes": "diesel",
+            "economy_per_year": savings,
+            "capex": costs,
+        }
+    )
+
+
+def exhaustive(savings, costs, budget):
+    best = 0.0
+    for size in range(1, len(savings) + 1):
+        for subset in itertools.combinations(range(len(savings)), size):
+            subset = list(subset)
+            if costs[subset].sum() <= budget * (1 + 1e-9):
+                best = max(best, savings[subset].sum())
+    return best
+
+
+COST_CLASSES = {
+    "greedy": [120000.0],
+    "two_class": [190000.0, 233333.3],
+}
+
+
+@pytest.mark.parametrize("method", list(COST_CLASSES))
+def test_matches_exhaustive_search(method):
+    classes = COST_CLASSES[method]
+    rng = np.random.default_rng(len(classes))
+    for _ in range(25):
+        count = int(rng.integers(len(classes), 10))
+        savings = rng.uniform(100, 5000, count).round(2)
+        # Every class appears at least once, so the expected method is used.
+        costs = rng.permutation(np.r_[classes, rng.choice(classes, count - len(classes))])
+        budget = float(rng.uniform(0, costs.sum() * 1.1))
+
+        result = optimise_conversions(candidates(savings, costs), budget, frontier_points=6)
+
+        assert result["method"] == method
+        assert result["capex_total"] <= budget + 1e-6
+        optimum = exhaustive(savings, costs, budget)
+        assert result["annual_savings"] == pytest.approx(optimum, abs=0.01)
+        levels = np.linspace(0.0, max(budget, costs.sum()), 6)
+        for point, level in zip(result["frontier"], levels):
+            assert point["annual_savings"] == pytest.approx(
+                exhaustive(savings, costs, level), abs=0.01
+            )
+
+
+def test_opportunity_vehicles_form_the_second_capex_class():
+    vehicles = pd.DataFrame(
+        {
+            "vehicleid": [1, 2, 3, 4],
+            "licenseno": ["AB-001", "AB-002", "AB-003", "AB-004"],
+            "fueltypes": "Diesel",
+            "feasibility_flag": ["yes", "no", "no", "yes"],
+            "economy_per_year": [4000.0, 3000.0, 5000.0, -10.0],
+        }
+    )
+    opportunity_feasible = pd.Series({1: True, 2: True, 3: False, 4: True})
+
+    frame = conversion_candidates(
+        vehicles, 200000.0, opportunity_feasible=opportunity_feasible, opportunity_surcharge=30000.0
+    )
+    result = optimise_conversions(frame, 230000.0)
+
+    assert frame["vehicleid"].tolist() == [1, 2]
+    assert frame["capex"].tolist() == [200000.0, 230000.0]
+    assert result["method"] == "two_class"
+    assert [vehicle["vehicleid"] for vehicle in result["selected"]] == [1]
+
+
+def test_rejects_invalid_inputs():
+    frame = candidates(np.array([100.0]), np.array([1000.0]))
+    with pytest.raises(OptimisationError):
+        optimise_conversions(frame, -1.0)
+    with pytest.raises(OptimisationError):
+        optimise_conversions(frame, 10.0, frontier_points=1)
+    with pytest.raises(OptimisationError):
+        optimise_conversions(candidates(np.array([100.0]), np.array([0.0])), 10.0)
+    with pytest.raises(OptimisationError, match="two capex values"):
+        optimise_conversions(
+            candidates(np.array([100.0, 200.0, 300.0]), np.array([1000.0, 1100.0, 1200.0])), 10.0
+        )
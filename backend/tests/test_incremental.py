@@ -0,0 +1,202 @@
+import io
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from app.services.tour_archive import TourArchive, get_tour_archive
+from helpers import assert_close
+
+# Payload sections that must not depend on how the tours were split across uploads.
+# tour_quality and validation describe each upload and are left out.
+COMPARED = [
+    "start_date",
+    "end_date",
+    "total_vehicles",
+    "total_tours",
+    "total_mileage",
+    "total_energy_kwh",
+    "vehicles",
+    "fuel_summary",
+    "feasibility_breakdown",
+    "cost_efficiency_breakdown",
+    "both_yes_count",
+    "economy_extremes",
+    "daily_trend",
+    "charging_simulation",
+    "load_profile",
+    "distribution",
+    "exclude_outliers",
+]
+
+
+def exported_tours(client, analysis_id):
+    response = client.get(f"/api/analyses/{analysis_id}/export/tours")
+    assert response.status_code == 200
+    return pd.read_csv(io.StringIO(response.text)).sort_values("tourid").reset_index(drop=True)
+
+
+def with_outliers(rows):
+    rows = [list(row) for row in rows]
+    rows[3][4] = 0.0  # zero mileage
+    rows[10][5] *= 6  # consumption outlier in the base period
+    rows[-8][5] *= 6  # consumption outlier in the new period
+    rows[-3][5] = -2.0  # negative fuel
+    return rows
+
+
+@pytest.mark.parametrize("exclude_outliers", [False, True])
+def test_incremental_run_matches_full_analysis(
+    client, workbook, fleet, analyse, exclude_outliers
+):
+    rows = with_outliers(fleet(vehicles=6, days=16, seed=5))
+    cutoff = datetime(2024, 1, 9)
+    base_rows = [row for row in rows if row[2] < cutoff]
+    # The second upload overlaps the first by two days; known tour ids are skipped.
+    new_rows = [row for row in rows if row[2] >= cutoff - timedelta(days=2)]
+
+    full = analyse(workbook("full.xlsx", rows), exclude_outliers=exclude_outliers)
+    base = analyse(workbook("base.xlsx", base_rows), exclude_outliers=exclude_outliers)
+    incremental = analyse(
+        workbook("new.xlsx", new_rows),
+        exclude_outliers=exclude_outliers,
+        base_analysis_id=base["analysis_id"],
+    )
+
+    assert incremental["incremental"]["new_tours"] == len(rows) - len(base_rows)
+    assert incremental["incremental"]["duplicate_tours"] == len(new_rows) - (
+        len(rows) - len(base_rows)
+    )
+    assert full["tour_quality"]["outlier_tours"] >= 4
+    for key in COMPARED:
+        assert_close(incremental[key], full[key], key)
+
+    full_tours = exported_tours(client, full["analysis_id"])
+    incremental_tours = exported_tours(client, incremental["analysis_id"])
+    assert not incremental_tours["tourid"].duplicated().any()
+    assert incremental_tours["tourid"].tolist() == full_tours["tourid"].tolist()
+    assert incremental_tours["outlier"].tolist() == full_tours["outlier"].tolist()
+
+
+def test_history_outlier_flags_are_rejudged(client, workbook, analyse, monkeypatch):
+    # Vehicle 1's fifth tour only stands out once later tours tighten its
+    # consumption spread, so an archived flag flips during the incremental run.
+    def rows(consumptions):
+        result = []
+        for day, fuel in enumerate(consumptions):
+            start = datetime(2024, 1, 1 + day, 6)
+            for vehicleid in (1, 2):
+                result.append(
+                    [
+                        day * 2 + vehicleid,
+                        vehicleid,
+                        start,
+                        start + timedelta(hours=2),
+                        100.0,
+                        fuel if vehicleid == 1 else 30.0 + day % 3,
+                    ]
+                )
+        return result
+
+    early = rows([30, 30, 30, 31, 45])
+    complete = rows([30, 30, 30, 31, 45, 29, 31, 32, 28, 30])
+
+    base = analyse(workbook("early.xlsx", early), exclude_outliers=True)
+    full = analyse(workbook("complete.xlsx", complete), exclude_outliers=True)
+    read = recording_reads(monkeypatch)
+    incremental = analyse(
+        workbook("complete.xlsx", complete),
+        exclude_outliers=True,
+        base_analysis_id=base["analysis_id"],
+    )
+    monkeypatch.undo()
+
+    # Vehicle 2's spread barely moves, so only vehicle 1's history is read back.
+    assert read == [[1]]
+    assert base["tour_quality"]["outlier_tours"] != full["tour_quality"]["outlier_tours"]
+    for key in COMPARED:
+        assert_close(incremental[key], full[key], key)
+    full_tours = exported_tours(client, full["analysis_id"])
+    incremental_tours = exported_tours(client, incremental["analysis_id"])
+    assert incremental_tours["outlier"].tolist() == full_tours["outlier"].tolist()
+    drill_down = client.get(f"/api/analyses/{incremental['analysis_id']}/vehicles/1/tours").json()
+    expected = client.get(f"/api/analyses/{full['analysis_id']}/vehicles/1/tours").json()
+    assert drill_down["tour_count"] == expected["tour_count"]
+    assert [tour["outlier"] for tour in drill_down["tours"]] == [
+        tour["outlier"] for tour in expected["tours"]
+    ]
+
+
+def recording_reads(monkeypatch):
+    archive = get_tour_archive()
+    read = []
+
+    def load_columns(analysis_id, columns, **kwargs):
+        read.append(kwargs.get("vehicleids"))
+        return TourArchive.load_columns(archive, analysis_id, columns, **kwargs)
+
+    monkeypatch.setattr(archive, "load_columns", load_columns)
+    return read
+
+
+def test_late_tours_rebuild_only_their_vehicle(client, workbook, fleet, analyse, monkeypatch):
+    rows = fleet(vehicles=4, days=10, seed=7)
+    cutoff = datetime(2024, 1, 6)
+    # One of vehicle 2's early tours only arrives with the second upload.
+    late = next(row for row in rows if row[1] == 2 and row[2] < datetime(2024, 1, 3))
+    base_rows = [row for row in rows if row[2] < cutoff and row is not late]
+    new_rows = [row for row in rows if row[2] >= cutoff or row is late]
+
+    full = analyse(workbook("full.xlsx", rows))
+    base = analyse(workbook("base.xlsx", base_rows))
+    read = recording_reads(monkeypatch)
+    incremental = analyse(workbook("new.xlsx", new_rows), base_analysis_id=base["analysis_id"])
+    monkeypatch.undo()
+
+    assert read == [[2]]
+    for key in COMPARED:
+        assert_close(incremental[key], full[key], key)
+
+
+def test_other_charging_parameters_resimulate_the_history(
+    client, workbook, fleet, analyse, monkeypatch
+):
+    rows = fleet(vehicles=3, days=12, seed=9)
+    parts = [
+        [row for row in rows if row[2] < datetime(2024, 1, 5)],
+        [row for row in rows if datetime(2024, 1, 5) <= row[2] < datetime(2024, 1, 9)],
+        [row for row in rows if row[2] >= datetime(2024, 1, 9)],
+    ]
+    charging = {"battery_capacity_kwh": 150.0, "depot_charger_kw": 20.0}
+
+    full = analyse(workbook("full.xlsx", rows), **charging)
+    base = analyse(workbook("base.xlsx", parts[0]))
+    middle = analyse(
+        workbook("middle.xlsx", parts[1]), base_analysis_id=base["analysis_id"], **charging
+    )
+    read = recording_reads(monkeypatch)
+    latest = analyse(
+        workbook("latest.xlsx", parts[2]), base_analysis_id=middle["analysis_id"], **charging
+    )
+    monkeypatch.undo()
+
+    # The middle run simulated the whole history once; the latest continues from it.
+    assert middle["charging_simulation"]["parameters"]["battery_capacity_kwh"] == 150.0
+    assert read == []
+    for key in ("charging_simulation", "load_profile"):
+        assert_close(latest[key], full[key], key)
+
+
+def test_outlier_mode_must_match_the_base(client, workbook, fleet, analyse):
+    rows = fleet(vehicles=2, days=6, seed=2)
+    base = analyse(workbook("base.xlsx", rows[: len(rows) // 2]), exclude_outliers=True)
+
+    with open(workbook("rest.xlsx", rows[len(rows) // 2 :]), "rb") as handle:
+        response = client.post(
+            "/api/analyze",
+            files={"file": ("rest.xlsx", handle)},
+            data={"exclude_outliers": "false", "base_analysis_id": base["analysis_id"]},
+        )
+
+    assert response.status_code == 400
+    assert "Outlier exclusion" in response.json()["detail"]
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.load_profile import LoadProfileError, load_profile
+
+DAY_SECONDS = 86400.0
+
+
+def random_sessions(seed, count=60, days=3):
+    rng = np.random.default_rng(seed)
+    origin = pd.Timestamp("2024-05-06")
+    # Whole minutes so sessions often touch, start or stop on a bin edge.
+    start = origin + pd.to_timedelta(rng.integers(0, days * 1440 - 600, count), unit="min")
+    duration = pd.to_timedelta(rng.choice([15, 30, 45, 60, 95, 240, 480], count), unit="min")
+    power = rng.choice([11.0, 22.0, 50.0, 150.0], count)
+    sessions = pd.DataFrame({"start": start, "stop": start + duration, "power_kw": power})
+    sessions["energy_kwh"] = sessions["power_kw"] * duration.total_seconds() / 3600.0
+    return sessions
+
+
+def brute_force_bins(sessions, resolution_minutes):
+    """Per-bin mean and peak load from direct overlap sums."""
+    origin = sessions["start"].min().normalize()
+    starts = (sessions["start"] - origin).dt.total_seconds().to_numpy()
+    stops = (sessions["stop"] - origin).dt.total_seconds().to_numpy()
+    power = sessions["power_kw"].to_numpy()
+    width = resolution_minutes * 60.0
+    days = int(np.ceil(stops.max() / DAY_SECONDS))
+    edges = np.arange(days * DAY_SECONDS // width + 1) * width
+
+    def load_at(moment):
+        active = (starts <= moment) & (stops > moment)
+        return power[active].sum(), int(active.sum())
+
+    events = np.concatenate((starts, stops))
+    mean, peak, vehicles = [], [], []
+    for left, right in zip(edges[:-1], edges[1:]):
+        overlap = np.clip(np.minimum(stops, right) - np.maximum(starts, left), 0.0, None)
+        mean.append((overlap * power).sum() / width)
+        moments = [left, *events[(events > left) & (events < right)]]
+        levels = [load_at(moment) for moment in moments]
+        peak.append(max(level for level, _ in levels))
+        vehicles.append(max(count for _, count in levels))
+    shape = (days, -1)
+    return (
+        np.reshape(mean, shape),
+        np.reshape(peak, shape),
+        np.reshape(vehicles, shape),
+    )
+
+
+@pytest.mark.parametrize("seed,resolution", [(0, 15), (1, 60), (2, 5), (3, 30)])
+def test_sweep_matches_brute_force(seed, resolution):
+    sessions = random_sessions(seed)
+    mean, peak, vehicles = brute_force_bins(sessions, resolution)
+
+    profile = load_profile(sessions, resolution)
+
+    by_time = pd.DataFrame(profile["time_of_day"])
+    np.testing.assert_allclose(by_time["mean_kw"], mean.mean(axis=0), atol=0.006)
+    np.testing.assert_allclose(by_time["peak_kw"], peak.max(axis=0), atol=0.006)
+    np.testing.assert_allclose(by_time["p95_kw"], np.percentile(peak, 95, axis=0), atol=0.006)
+    np.testing.assert_array_equal(by_time["max_vehicles"], vehicles.max(axis=0))
+    assert profile["peak_kw"] == pytest.approx(peak.max())
+    assert profile["peak_concurrent_vehicles"] == vehicles.max()
+    assert profile["energy_kwh"] == pytest.approx(sessions["energy_kwh"].sum(), abs=0.006)
+    # Mean load integrates back to the delivered energy.
+    hours_per_bin = resolution / 60.0
+    assert mean.sum() * hours_per_bin == pytest.approx(sessions["energy_kwh"].sum())
+
+
+def test_back_to_back_sessions_do_not_overlap():
+    start = pd.Timestamp("2024-05-06 10:00")
+    sessions = pd.DataFrame(
+        {
+            "start": [start, start + pd.Timedelta(hours=1)],
+            "stop": [start + pd.Timedelta(hours=1), start + pd.Timedelta(hours=2)],
+            "power_kw": [50.0, 50.0],
+            "energy_kwh": [50.0, 50.0],
+        }
+    )
+
+    profile = load_profile(sessions, 60)
+
+    assert profile["peak_kw"] == 50.0
+    assert profile["peak_concurrent_vehicles"] == 1
+
+
+def test_resolution_must_divide_a_day():
+    with pytest.raises(LoadProfileError):
+        load_profile(random_sessions(0), 7)
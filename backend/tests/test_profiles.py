@@ -0,0 +1,123 @@
+import pytest
+from openpyxl import load_workbook
+
+from app.services.parameter_profiles import ParameterProfileStore, ProfileNotFoundError
+from app.services.storage import database_path
+
+
+@pytest.fixture
+def tco_document(workbook, fleet, analyse):
+    reference = analyse(workbook("fleet.xlsx", fleet(vehicles=3, days=3, seed=4)))
+    return {"tco_parameters": reference["tco_parameters"]}
+
+
+def upload(client, url, path, **data):
+    with open(path, "rb") as handle:
+        return client.post(url, files={"file": (path.name, handle)}, data=data)
+
+
+def test_profile_lifecycle(client, tco_document):
+    created = client.post("/api/profiles", json={"name": " Fleet 2024 ", **tco_document})
+    assert created.status_code == 201
+    profile = created.json()
+    assert profile["name"] == "Fleet 2024"
+    assert profile["tco_parameters"] == tco_document["tco_parameters"]
+
+    assert client.get(f"/api/profiles/{profile['profile_id']}").json() == profile
+    assert profile in client.get("/api/profiles").json()
+    duplicate = client.post("/api/profiles", json={"name": "Fleet 2024", **tco_document})
+    assert duplicate.status_code == 409
+
+    assert client.delete(f"/api/profiles/{profile['profile_id']}").status_code == 204
+    assert client.get(f"/api/profiles/{profile['profile_id']}").status_code == 404
+    assert client.delete(f"/api/profiles/{profile['profile_id']}").status_code == 404
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"name": ""},
+        {"name": 123},
+        {"name": ["a"]},
+        {"name": "broken", "tco_parameters": {}},
+    ],
+)
+def test_invalid_profiles_are_rejected(client, tco_document, payload):
+    response = client.post("/api/profiles", json={**tco_document, **payload})
+
+    assert response.status_code == 400
+
+
+def test_deletes_are_seen_by_other_workers(client, tco_document):
+    profile = client.post("/api/profiles", json={"name": "shared", **tco_document}).json()
+    other_worker = ParameterProfileStore(database_path())
+    assert other_worker.get(profile["profile_id"]).name == "shared"
+
+    client.delete(f"/api/profiles/{profile['profile_id']}")
+
+    with pytest.raises(ProfileNotFoundError):
+        other_worker.get(profile["profile_id"])
+    assert profile["profile_id"] not in {p.profile_id for p in other_worker.list()}
+
+
+def test_analysis_with_profile_ignores_the_workbook_parameters(
+    client, workbook, fleet, tco_document, tmp_path
+):
+    rows = fleet(vehicles=3, days=3, seed=4)
+    reference_path = workbook("reference.xlsx", rows)
+    # Without its TCO sheet the workbook is only analysable through a profile.
+    stripped = load_workbook(reference_path)
+    del stripped["TCO-calculation"]
+    stripped_path = tmp_path / "stripped.xlsx"
+    stripped.save(stripped_path)
+    profile = client.post("/api/profiles", json={"name": "analysis", **tco_document}).json()
+
+    without = upload(client, "/api/analyze", stripped_path)
+    with_profile = upload(client, "/api/analyze", stripped_path, profile_id=profile["profile_id"])
+
+    assert without.status_code == 400
+    assert with_profile.status_code == 200
+    assert with_profile.json()["tco_parameters"] == tco_document["tco_parameters"]
+    unknown = upload(client, "/api/analyze", reference_path, profile_id="missing")
+    assert unknown.status_code == 404
+
+
+def test_diff_against_a_workbook(client, workbook, fleet, tco_document, tmp_path):
+    profile = client.post("/api/profiles", json={"name": "diff", **tco_document}).json()
+    path = workbook("changed.xlsx", fleet(vehicles=2, days=2, seed=1))
+    changed = load_workbook(path)
+    changed["TCO-calculation"]["D2"] = 260000
+    changed.save(path)
+    url = f"/api/profiles/{profile['profile_id']}/diff"
+
+    diff = upload(client, url, path).json()
+
+    assert diff["identical"] is False
+    assert diff["differences"] == [
+        {
+            "technology": "bev",
+            "parameter": "vehicle_price",
+            "profile": 250000.0,
+            "workbook": 260000.0,
+            "delta": 10000.0,
+        }
+    ]
+
+
+def test_diff_rejects_unreadable_workbooks(client, workbook, fleet, tco_document, tmp_path):
+    profile = client.post("/api/profiles", json={"name": "unreadable", **tco_document}).json()
+    url = f"/api/profiles/{profile['profile_id']}/diff"
+    corrupt = tmp_path / "corrupt.xlsx"
+    corrupt.write_bytes(b"not a workbook")
+    text_cell = workbook("text.xlsx", fleet(vehicles=2, days=2, seed=1))
+    book = load_workbook(text_cell)
+    book["TCO-calculation"]["B2"] = "n/a"
+    book.save(text_cell)
+    sheetless = workbook("sheetless.xlsx", fleet(vehicles=2, days=2, seed=1))
+    book = load_workbook(sheetless)
+    del book["TCO-calculation"]
+    book.save(sheetless)
+
+    for path in (corrupt, text_cell, sheetless):
+        response = upload(client, url, path)
+        assert response.status_code == 400, path.name
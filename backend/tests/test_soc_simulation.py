@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.load_profile import charging_intervals
+from app.services.soc_simulation import ChargingParameters, simulate_soc, simulate_tours
+
+ENERGY = "estimated electricity consumption (kWh)"
+
+PARAMETERS = ChargingParameters(
+    battery_capacity_kwh=150.0,
+    depot_charger_kw=20.0,
+    opportunity_charger_kw=90.0,
+    min_charge_gap_minutes=30.0,
+)
+
+
+def random_tours(seed, vehicles=5, tours_per_vehicle=40):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for vehicleid in range(1, vehicles + 1):
+        # Gaps from overlapping (negative) to multi-day, so every branch is hit.
+        gaps = rng.choice([-0.5, 0.1, 0.4, 1.0, 3.0, 14.0, 40.0], tours_per_vehicle)
+        durations = rng.uniform(0.5, 5.0, tours_per_vehicle)
+        start = pd.Timestamp("2024-03-01 05:00")
+        rows = []
+        for gap, duration in zip(gaps, durations):
+            start = start + pd.Timedelta(hours=float(max(gap, -duration / 2)))
+            end = start + pd.Timedelta(hours=float(duration))
+            rows.append((vehicleid, start, end))
+            start = end
+        frame = pd.DataFrame(rows, columns=["vehicleid", "starttime", "endtime"])
+        frame[ENERGY] = rng.uniform(0.0, 90.0, len(frame))
+        frames.append(frame)
+    tours = pd.concat(frames, ignore_index=True)
+    tours.loc[rng.choice(len(tours), 5, replace=False), "endtime"] = pd.NaT
+    tours.loc[rng.choice(len(tours), 5, replace=False), ENERGY] = np.nan
+    tours = tours.sort_values(["vehicleid", "starttime"], kind="stable").reset_index(drop=True)
+    tours["date"] = tours["starttime"].dt.normalize()
+    return tours
+
+
+def reference_levels(tours, parameters):
+    """Tour-by-tour loop over the charging rules in ``simulate_tours``' docstring."""
+    capacity = parameters.battery_capacity_kwh
+    keys = ("depot", "opportunity", "stop", "depot_credit", "opportunity_credit")
+    columns = {key: [] for key in keys}
+    after = {}
+    previous_vehicle = previous_date = previous_end = None
+    for row in tours.rename(columns={ENERGY: "energy"}).itertuples(index=False):
+        end = row.starttime if pd.isna(row.endtime) else row.endtime
+        energy = 0.0 if pd.isna(row.energy) else row.energy
+        stop = False
+        if row.vehicleid != previous_vehicle:
+            before = {"depot": capacity, "opportunity": capacity}
+            credit = {"depot": 0.0, "opportunity": 0.0}
+        else:
+            gap = max((row.starttime - previous_end).total_seconds() / 3600.0, 0.0)
+            overnight = row.date != previous_date
+            opportunity = not overnight and gap * 60.0 >= parameters.min_charge_gap_minutes
+            depot_charge = gap * parameters.depot_charger_kw if overnight else 0.0
+            charge = {
+                "depot": depot_charge,
+                "opportunity": depot_charge
+                + (gap * parameters.opportunity_charger_kw if opportunity else 0.0),
+            }
+            before = {regime: min(capacity, after[regime] + charge[regime]) for regime in charge}
+            credit = {regime: before[regime] - after[regime] for regime in charge}
+            stop = opportunity and after["opportunity"] < capacity
+        after = {regime: before[regime] - energy for regime in before}
+        for regime in ("depot", "opportunity"):
+            columns[regime].append(after[regime])
+            columns[f"{regime}_credit"].append(credit[regime])
+        columns["stop"].append(stop)
+        previous_vehicle, previous_date, previous_end = row.vehicleid, row.date, end
+    return {key: np.asarray(values) for key, values in columns.items()}
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_simulate_tours_matches_reference_loop(seed):
+    tours = random_tours(seed)
+    expected = reference_levels(tours, PARAMETERS)
+
+    levels = simulate_tours(tours, PARAMETERS)
+
+    np.testing.assert_allclose(levels["depot_soc"], expected["depot"], atol=1e-6)
+    np.testing.assert_allclose(levels["opportunity_soc"], expected["opportunity"], atol=1e-6)
+    np.testing.assert_array_equal(levels["opportunity_stop"], expected["stop"])
+    assert (levels["depot_soc"] < 0).any()
+
+
+@pytest.mark.parametrize("regime", ["depot", "opportunity"])
+def test_charging_sessions_deliver_the_credited_energy(regime):
+    tours = random_tours(3)
+    expected = reference_levels(tours, PARAMETERS)
+    levels = simulate_tours(tours, PARAMETERS)
+    last = np.r_[levels["first"].to_numpy()[1:], True]
+    # Gap charging plus the final refill of each vehicle, including below-zero shortfalls.
+    refill = (PARAMETERS.battery_capacity_kwh - levels[f"{regime}_soc"].to_numpy())[last].sum()
+
+    sessions = charging_intervals(levels, PARAMETERS, regime)
+
+    assert sessions["energy_kwh"].sum() == pytest.approx(
+        expected[f"{regime}_credit"].sum() + refill, rel=1e-9
+    )
+
+
+def test_simulate_soc_aggregates_per_vehicle():
+    tours = random_tours(4)
+    expected = reference_levels(tours, PARAMETERS)
+    reference = pd.DataFrame(
+        {"vehicleid": tours["vehicleid"], "depot": expected["depot"], "stop": expected["stop"]}
+    ).groupby("vehicleid")
+
+    result = simulate_soc(tours, PARAMETERS).set_index("vehicleid").sort_index()
+
+    np.testing.assert_allclose(result["depot_min_soc_kwh"], reference["depot"].min(), atol=1e-6)
+    np.testing.assert_array_equal(
+        result["tours_needing_charge"], reference["depot"].apply(lambda s: (s < 0).sum())
+    )
+    np.testing.assert_array_equal(result["opportunity_charge_stops"], reference["stop"].sum())
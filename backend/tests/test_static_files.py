@@ -0,0 +1,87 @@
+import gzip
+import threading
+
+import brotli
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.static_files import IMMUTABLE_CACHE, REVALIDATE_CACHE, PrecompressedStaticFiles
+
+SCRIPT = b"console.log('maeva');\n" * 200
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(b"<!doctype html><div id=root></div>" * 50)
+    (tmp_path / "assets" / "index-4f3a9c1e.js").write_bytes(SCRIPT)
+    (tmp_path / "favicon.svg").write_bytes(b"<svg/>")
+    return tmp_path
+
+
+def serve(directory):
+    frontend = PrecompressedStaticFiles(directory=directory)
+    frontend.precompress()
+    app = FastAPI()
+    app.mount("/", frontend)
+    return TestClient(app)
+
+
+def test_best_accepted_encoding_is_served(site):
+    client = serve(site)
+    url = "/assets/index-4f3a9c1e.js"
+
+    br = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    gz = client.get(url, headers={"Accept-Encoding": "gzip, br;q=0"})
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+
+    assert br.headers["content-encoding"] == "br"
+    assert gz.headers["content-encoding"] == "gzip"
+    assert "content-encoding" not in plain.headers
+    # The test client decodes both encodings transparently.
+    assert br.content == gz.content == plain.content == SCRIPT
+    assert br.headers["vary"] == "Accept-Encoding"
+    assert br.headers["content-type"].startswith("text/javascript")
+    # Files below the size threshold are left alone.
+    assert not (site / "favicon.svg.gz").exists()
+
+
+def test_cache_headers_and_revalidation(site):
+    client = serve(site)
+
+    asset = client.get("/assets/index-4f3a9c1e.js")
+    index = client.get("/index.html")
+    revalidated = client.get("/index.html", headers={"If-None-Match": index.headers["etag"]})
+
+    assert asset.headers["cache-control"] == IMMUTABLE_CACHE
+    assert index.headers["cache-control"] == REVALIDATE_CACHE
+    assert client.get("/favicon.svg").headers["cache-control"] == REVALIDATE_CACHE
+    assert revalidated.status_code == 304
+
+
+def test_client_routes_fall_back_to_the_index(site):
+    client = serve(site)
+
+    route = client.get("/reports/42")
+
+    assert route.status_code == 200
+    assert route.content == (site / "index.html").read_bytes()
+    assert client.get("/assets/missing.js").status_code == 404
+
+
+def test_concurrent_precompress_runs_leave_complete_variants(site):
+    workers = [PrecompressedStaticFiles(directory=site) for _ in range(4)]
+    threads = [threading.Thread(target=frontend.precompress) for frontend in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    script = site / "assets" / "index-4f3a9c1e.js"
+    assert brotli.decompress(script.with_name(script.name + ".br").read_bytes()) == SCRIPT
+    assert gzip.decompress(script.with_name(script.name + ".gz").read_bytes()) == SCRIPT
+    assert not list(site.rglob("*.tmp"))
+    assert all(frontend.precompressed for frontend in workers)
+    # Fresh variants are not written again.
+    assert PrecompressedStaticFiles(directory=site).precompress() == 0
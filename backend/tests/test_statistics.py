@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.statistics import (
+    PERCENTILES,
+    StatisticsError,
+    distribution_summary,
+    economy_extremes,
+    top_k,
+)
+
+
+def fleet_vehicles(count=60, seed=5):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "vehicleid": np.arange(1, count + 1),
+            "licenseno": [f"AB-{i:03d}" for i in range(1, count + 1)],
+            "fueltypes": rng.choice(["Diesel", "LNG", None], count),
+            "economy_per_year": rng.normal(0, 5000, count).round(2),
+            "annual_energy_kwh": rng.uniform(10000, 90000, count),
+            "feasible_rate": rng.uniform(0, 1, count),
+            "cost_bev": rng.uniform(1e5, 3e5, count),
+        }
+    )
+
+
+@pytest.mark.parametrize("k", [1, 5, 59, 60, 100])
+def test_top_k_matches_a_full_sort(k):
+    values = np.random.default_rng(k).integers(0, 20, 60).astype(float)
+    values[[3, 17]] = np.nan
+
+    largest = top_k(values, k)
+    smallest = top_k(values, k, largest=False)
+
+    # Best first, NaN never ahead of a number.
+    np.testing.assert_array_equal(values[largest], -np.sort(-values)[:k])
+    np.testing.assert_array_equal(values[smallest], np.sort(values)[:k])
+    assert len(set(largest)) == len(largest) == min(k, len(values))
+    assert top_k(values, 0).tolist() == []
+
+
+def test_economy_extremes():
+    vehicles = fleet_vehicles()
+    ranked = vehicles.sort_values("economy_per_year", kind="stable")
+
+    extremes = economy_extremes(vehicles, 3)
+
+    assert [row["vehicleid"] for row in extremes["top_savers"]] == ranked["vehicleid"].tolist()[
+        :-4:-1
+    ]
+    assert [row["vehicleid"] for row in extremes["top_risks"]] == ranked["vehicleid"].tolist()[:3]
+    with pytest.raises(StatisticsError):
+        economy_extremes(vehicles, 0)
+
+
+def test_distribution_matches_numpy():
+    vehicles = fleet_vehicles()
+    vehicles.loc[4, "feasible_rate"] = np.nan
+
+    summary = distribution_summary(vehicles, bins=7)
+
+    energy = summary["fields"]["annual_energy_kwh"]
+    values = vehicles["annual_energy_kwh"].to_numpy()
+    histogram, edges = np.histogram(values, bins=7)
+    assert energy["groups"]["all"]["histogram"] == histogram.tolist()
+    np.testing.assert_allclose(energy["edges"], edges, atol=1e-3)
+    expected = np.percentile(values, PERCENTILES).round(2)
+    assert list(energy["groups"]["all"]["percentiles"].values()) == expected.tolist()
+    per_fuel = [energy["groups"][fuel]["histogram"] for fuel in ("Diesel", "LNG", "unknown")]
+    assert np.sum(per_fuel, axis=0).tolist() == histogram.tolist()
+    assert summary["fields"]["feasible_rate"]["groups"]["all"]["count"] == 59
+    with pytest.raises(StatisticsError):
+        distribution_summary(vehicles, bins=0)
+
+
+def test_statistics_endpoint(client, workbook, fleet, analyse):
+    analysis = analyse(workbook("stats.xlsx", fleet(vehicles=8, days=3, seed=2)), extremes_k=2)
+
+    response = client.get(
+        f"/api/analyses/{analysis['analysis_id']}/statistics", params={"k": 3, "bins": 4}
+    )
+
+    assert len(analysis["economy_extremes"]["top_savers"]) == 2
+    body = response.json()
+    assert len(body["economy_extremes"]["top_risks"]) == 3
+    assert body["distribution"]["bins"] == 4
+    groups = body["distribution"]["fields"]["economy_per_year"]["groups"]
+    assert sum(groups["all"]["histogram"]) == 8
+    assert client.get("/api/analyses/missing/statistics").status_code == 404
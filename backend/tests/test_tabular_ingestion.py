@@ -0,0 +1,134 @@
+import io
+import json
+import zipfile
+
+import pandas as pd
+import pytest
+
+from app.services.validation import INPUT_TOUR_COLUMNS
+from helpers import assert_close
+
+COMPARED = ["total_tours", "total_energy_kwh", "vehicles", "feasibility_breakdown"]
+
+
+@pytest.fixture
+def telemetry(tmp_path, workbook, fleet, analyse):
+    """The same fleet as a workbook analysis, CSV/Parquet files and a parameter document."""
+    rows = fleet(vehicles=4, days=6, seed=8)
+    reference = analyse(workbook("fleet.xlsx", rows))
+    tours = pd.DataFrame(rows, columns=INPUT_TOUR_COLUMNS)
+    vehicles = pd.DataFrame(
+        {
+            "vehicleid": [1, 2, 3, 4],
+            "licenseno": [f"AB-{i:03d}" for i in range(1, 5)],
+            "fueltypes": ["Diesel", "Diesel", "Diesel", "LNG"],
+        }
+    )
+    tours.to_csv(tmp_path / "tours.csv", index=False)
+    tours.to_parquet(tmp_path / "tours.parquet")
+    vehicles.to_parquet(tmp_path / "vehicles.parquet")
+    vehicles.to_csv(tmp_path / "vehicles.csv", index=False)
+    parameters = {
+        "energy_limit_kwh": reference["energy_limit_kwh"],
+        "tco_parameters": reference["tco_parameters"],
+    }
+    return tmp_path, reference, parameters, tours
+
+
+def post(client, files, **data):
+    handles = {name: (path.name, path.read_bytes()) for name, path in files.items()}
+    return client.post("/api/analyze", files=handles, data=data)
+
+
+@pytest.mark.parametrize(
+    "tours_name,vehicles_name",
+    [("tours.csv", "vehicles.parquet"), ("tours.parquet", "vehicles.csv")],
+)
+def test_separate_uploads_match_the_workbook(client, telemetry, tours_name, vehicles_name):
+    directory, reference, parameters, _ = telemetry
+
+    response = post(
+        client,
+        {"tours": directory / tours_name, "vehicles": directory / vehicles_name},
+        parameters=json.dumps(parameters),
+    )
+
+    assert response.status_code == 200, response.text
+    result = response.json()
+    for key in COMPARED:
+        assert_close(result[key], reference[key], key)
+
+
+def test_zip_bundle_with_parameters(client, telemetry):
+    directory, reference, parameters, _ = telemetry
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.write(directory / "tours.csv", "export/tours.csv")
+        archive.write(directory / "vehicles.parquet", "vehicles.parquet")
+        archive.writestr("parameters.json", json.dumps(parameters))
+
+    response = client.post("/api/analyze", files={"file": ("bundle.zip", buffer.getvalue())})
+
+    assert response.status_code == 200, response.text
+    assert response.json()["total_tours"] == reference["total_tours"]
+
+
+def test_incremental_tabular_upload(client, telemetry):
+    directory, reference, parameters, tours = telemetry
+    half = len(tours) // 2
+    tours.iloc[:half].to_csv(directory / "first.csv", index=False)
+    tours.iloc[half:].to_parquet(directory / "second.parquet")
+    vehicles = directory / "vehicles.parquet"
+    document = json.dumps(parameters)
+
+    base = post(
+        client, {"tours": directory / "first.csv", "vehicles": vehicles}, parameters=document
+    )
+    extended = post(
+        client,
+        {"tours": directory / "second.parquet", "vehicles": vehicles},
+        parameters=document,
+        base_analysis_id=base.json()["analysis_id"],
+    )
+
+    assert extended.status_code == 200, extended.text
+    assert extended.json()["total_tours"] == reference["total_tours"]
+    assert extended.json()["incremental"]["new_tours"] == len(tours) - half
+
+
+@pytest.mark.parametrize(
+    "parameters,detail",
+    [
+        (None, "TCO parameters are required"),
+        ('{"tco_parameters": {}}', "Missing TCO parameters"),
+        ("not json", "not valid JSON"),
+    ],
+)
+def test_unusable_parameters_are_rejected(client, telemetry, parameters, detail):
+    directory = telemetry[0]
+    data = {} if parameters is None else {"parameters": parameters}
+
+    response = post(
+        client, {"tours": directory / "tours.csv", "vehicles": directory / "vehicles.csv"}, **data
+    )
+
+    assert response.status_code == 400
+    assert detail in response.json()["detail"]
+
+
+def test_unusable_files_are_rejected(client, telemetry):
+    directory, _, parameters, _ = telemetry
+    (directory / "bundle.zip").write_bytes(b"no zip here")
+
+    bad_zip = post(client, {"file": directory / "bundle.zip"})
+    # A vehicles table uploaded as tours lacks the required tour columns.
+    wrong_table = post(
+        client,
+        {"tours": directory / "vehicles.csv", "vehicles": directory / "vehicles.csv"},
+        parameters=json.dumps(parameters),
+    )
+
+    assert bad_zip.status_code == 400
+    assert "not a valid zip archive" in bad_zip.json()["detail"]
+    assert wrong_table.status_code == 400
+    assert "missing required columns" in wrong_table.json()["detail"]
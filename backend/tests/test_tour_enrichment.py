@@ -0,0 +1,49 @@
+import io
+
+import pandas as pd
+
+from helpers import plausible_tours
+
+
+def test_outliers_are_flagged_and_excluded(client, workbook, analyse):
+    rows = plausible_tours(vehicles=3, days=8)
+    rows[0][4] = 0.0  # zero mileage
+    rows[1][4] = -5.0  # negative mileage
+    rows[2][5] = -1.0  # negative fuel
+    rows[3][4] = 5000.0  # implausible speed
+    rows[4][5] *= 8  # consumption outlier
+    path = workbook("outliers.xlsx", rows)
+
+    kept = analyse(path, exclude_outliers=False)
+    excluded = analyse(path, exclude_outliers=True)
+
+    quality = excluded["tour_quality"]
+    assert quality["excluded_from_tco"] is True
+    assert quality["by_reason"] == {
+        "zero mileage": 1,
+        "negative mileage": 1,
+        "negative fuel": 1,
+        "implausible speed": 1,
+        "consumption outlier": 1,
+    }
+    assert kept["total_tours"] == len(rows)
+    assert excluded["total_tours"] == len(rows) - 5
+    tours = pd.read_csv(
+        io.StringIO(client.get(f"/api/analyses/{excluded['analysis_id']}/export/tours").text)
+    )
+    flagged = tours.loc[tours["outlier"] == 1].sort_values("tourid")
+    assert flagged["tourid"].tolist() == [row[0] for row in rows[:5]]
+
+
+def test_excluding_every_tour_is_a_client_error(client, workbook):
+    rows = [[*row[:4], 0.0, row[5]] for row in plausible_tours(vehicles=2, days=3)]
+
+    with open(workbook("stationary.xlsx", rows), "rb") as handle:
+        response = client.post(
+            "/api/analyze",
+            files={"file": ("stationary.xlsx", handle)},
+            data={"exclude_outliers": "true"},
+        )
+
+    assert response.status_code == 400
+    assert "excluded as outliers" in response.json()["detail"]
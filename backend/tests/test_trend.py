@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from app.services.trend import TREND_COLUMNS, downsample_lttb, resample_trend
+
+
+def daily_frame(values):
+    index = pd.DatetimeIndex(pd.date_range("2024-01-01", periods=len(values)), name="date")
+    frame = pd.DataFrame(0.0, index=index, columns=TREND_COLUMNS)
+    frame["mileage_sum"] = values
+    frame["tour_count"] = 1.0
+    return frame
+
+
+def test_lttb_keeps_the_ends_and_the_spikes():
+    values = np.zeros(100)
+    values[37] = 500.0
+    values[71] = -300.0
+    frame = daily_frame(values)
+
+    sampled = downsample_lttb(frame, 10)
+
+    assert len(sampled) == 10
+    assert sampled.index[0] == frame.index[0]
+    assert sampled.index[-1] == frame.index[-1]
+    assert sampled.index.is_monotonic_increasing
+    assert {frame.index[37], frame.index[71]} <= set(sampled.index)
+    assert downsample_lttb(frame, 2).index.tolist() == [frame.index[0], frame.index[-1]]
+    assert downsample_lttb(frame, None) is frame
+    assert downsample_lttb(frame, 100) is frame
+
+
+def test_weeks_and_months_sum_their_days():
+    frame = daily_frame(np.arange(45, dtype=float))
+
+    weeks = resample_trend(frame, "week")
+    months = resample_trend(frame, "month")
+
+    # 2024-01-01 is a Monday.
+    assert weeks.index[1] == pd.Timestamp("2024-01-08")
+    assert weeks["mileage_sum"].iloc[0] == sum(range(7))
+    assert months.index.tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01")]
+    assert months["tour_count"].tolist() == [31.0, 14.0]
+    assert months["mileage_sum"].sum() == frame["mileage_sum"].sum()
+
+
+def test_stored_trend_is_filtered_and_downsampled(client, workbook, analyse):
+    rows = []
+    for day in range(40):
+        start = datetime(2024, 1, 1, 6) + timedelta(days=day)
+        mileage = 400.0 if day == 17 else 60.0 + day
+        rows.append([day + 1, 1, start, start + timedelta(hours=8), mileage, mileage * 0.3])
+    analysis = analyse(workbook("trend.xlsx", rows), trend_points=8)
+    url = f"/api/analyses/{analysis['analysis_id']}/trend"
+
+    assert len(analysis["daily_trend"]) == 8
+    daily = client.get(url, params={"max_points": 10}).json()
+    assert daily["total_points"] == 40
+    assert len(daily["trend"]) == 10
+    assert daily["trend"][0]["date"] == "2024-01-01"
+    assert daily["trend"][-1]["date"] == "2024-02-09"
+    spike = {point["date"]: point["mileage_sum"] for point in daily["trend"]}["2024-01-18"]
+    assert spike == 400.0
+
+    window = client.get(url, params={"start_date": "2024-01-10", "end_date": "2024-01-19"}).json()
+    assert window["total_points"] == 10
+    assert [point["date"] for point in window["trend"]][::9] == ["2024-01-10", "2024-01-19"]
+
+    monthly = client.get(url, params={"resolution": "month"}).json()
+    assert [point["date"] for point in monthly["trend"]] == ["2024-01", "2024-02"]
+    assert [point["tour_count"] for point in monthly["trend"]] == [31, 9]
+    assert client.get("/api/analyses/missing/trend").status_code == 404
@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from app.services.validation import (
+    INPUT_TOUR_COLUMNS,
+    InputValidationError,
+    ValidationReport,
+    check_headers,
+    validate_tours,
+    validate_vehicles,
+)
+
+START = datetime(2024, 2, 1, 6)
+
+
+def tour(tourid, vehicleid, start=START, mileage=100.0, fuel=30.0, end=None):
+    end = end or (start + timedelta(hours=2) if isinstance(start, datetime) else START)
+    return [tourid, vehicleid, start, end, mileage, fuel]
+
+
+def issues(report):
+    return {(issue.check, issue.action): issue.count for issue in report.issues}
+
+
+def test_tour_quarantine_counts_each_row_once():
+    tours = pd.DataFrame(
+        [
+            tour(1, 1),
+            tour(2, "abc"),
+            tour(3, 1.5),
+            tour(4, 1, start=None),
+            tour(5, 2, mileage="n/a"),
+            tour(6, 2, fuel="x"),
+            tour(1, 2),
+            tour(7, 99),
+            # Its tourid is taken only by a quarantined row, so it is just a bad start.
+            tour(2, 1, start="not a date"),
+            tour(8, 1, mileage=-5.0),
+            tour(9, 2, fuel=-1.0, end="tomorrow"),
+            tour(None, 2),
+            tour(None, 1),
+            # The first 7 was quarantined, so this one is kept.
+            tour(7, 1),
+        ],
+        columns=INPUT_TOUR_COLUMNS,
+    )
+    report = ValidationReport()
+
+    clean = validate_tours(tours, pd.Series([1, 2]), report, sample_rows=2)
+
+    assert issues(report) == {
+        ("invalid vehicleid", "quarantined"): 2,
+        ("invalid starttime", "quarantined"): 2,
+        ("non-numeric mileage", "quarantined"): 1,
+        ("non-numeric fuelconsumption", "quarantined"): 1,
+        ("duplicate tourid", "quarantined"): 1,
+        ("unknown vehicleid", "quarantined"): 1,
+        ("invalid endtime", "flagged"): 1,
+        ("negative mileage", "flagged"): 1,
+        ("negative fuelconsumption", "flagged"): 1,
+    }
+    assert report.tours_checked == 14
+    assert report.tours_quarantined == 8
+    assert len(clean) == 6
+    assert 7 in clean["tourid"].tolist()
+    # Tours without an id are never duplicates of each other.
+    assert clean["tourid"].isna().sum() == 2
+    assert clean["vehicleid"].dtype == "int64"
+    assert pd.api.types.is_datetime64_any_dtype(clean["starttime"])
+    samples = next(issue.samples for issue in report.issues if issue.check == "duplicate tourid")
+    assert [sample["row"] for sample in samples] == [8]
+
+
+def test_vehicle_quarantine_keeps_first_listing():
+    vehicles = pd.DataFrame(
+        {
+            "vehicleid": [1, 2, "x", 2, None, 3.0],
+            "licenseno": ["A", "B", "C", "D", "E", "F"],
+            "fueltypes": "Diesel",
+        }
+    )
+    report = ValidationReport()
+
+    clean = validate_vehicles(vehicles, report, sample_rows=5)
+
+    assert issues(report) == {
+        ("invalid vehicleid", "quarantined"): 2,
+        ("duplicate vehicleid", "quarantined"): 1,
+    }
+    assert report.vehicles_quarantined == 3
+    assert clean["vehicleid"].tolist() == [1, 2, 3]
+    assert clean["licenseno"].tolist() == ["A", "B", "F"]
+
+
+def test_missing_required_column_is_rejected():
+    report = ValidationReport()
+    with pytest.raises(InputValidationError):
+        check_headers(
+            ["tourid", "vehicleid"],
+            sheet="tours",
+            required=["vehicleid", "starttime"],
+            expected=INPUT_TOUR_COLUMNS,
+            report=report,
+        )
+
+
+def test_analysis_reports_quarantined_rows(workbook, analyse):
+    tours = [
+        tour(index, 1 + index % 2, start=START + timedelta(hours=3 * index))
+        for index in range(1, 11)
+    ]
+    tours += [tour(20, 7), tour(21, "bad"), tour(3, 1), tour(22, 2, mileage="?")]
+    vehicles = [(1, "A", "Diesel"), (2, "B", "LNG")]
+
+    result = analyse(workbook("quarantine.xlsx", tours, vehicles=vehicles))
+
+    validation = result["validation"]
+    assert validation["tours_checked"] == 14
+    assert validation["tours_quarantined"] == 4
+    assert result["total_tours"] == 10
+    assert {issue["check"]: issue["count"] for issue in validation["issues"]} == {
+        "invalid vehicleid": 1,
+        "non-numeric mileage": 1,
+        "duplicate tourid": 1,
+        "unknown vehicleid": 1,
+    }
+
+
+@pytest.mark.parametrize(
+    "sheet, cell, value, message",
+    [
+        ("tours", "AE1", "lots", "tours!AE1 (energy limit (kWh))"),
+        ("TCO-calculation", "D2", "n/a", "TCO-calculation!D2 (bev vehicle_price)"),
+        (
+            "TCO-calculation",
+            "B14",
+            datetime(2024, 1, 1),
+            "TCO-calculation!B14 (diesel own_fuel_price)",
+        ),
+    ],
+)
+def test_non_numeric_parameter_cells_are_rejected(client, workbook, sheet, cell, value, message):
+    path = workbook("cells.xlsx", [tour(1, 1), tour(2, 2)])
+    book = load_workbook(path)
+    book[sheet][cell] = value
+    book.save(path)
+
+    with open(path, "rb") as handle:
+        response = client.post("/api/analyze", files={"file": ("cells.xlsx", handle)})
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith(f"{message} must be a number")
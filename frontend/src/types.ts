@@ -55,9 +55,123 @@ export interface AISummary {
   bullets: string[];
   cautions?: string[];
   raw?: string;
+  metrics?: AISummaryMetrics;
+}
+
+export interface AISummaryMetrics {
+  token_budget: number;
+  digest_tokens_estimate: number;
+  sections: string[];
+  dropped_sections: string[];
+  prompt_chars: number;
+  prompt_tokens_estimate: number;
+  latency_ms?: number;
+  prompt_tokens?: number | null;
+  output_tokens?: number | null;
+}
+
+export interface IncrementalSummary {
+  new_tours: number;
+  duplicate_tours: number;
+  unidentified_tours: number;
+}
+
+export interface VehicleChargingResult {
+  vehicleid: number;
+  tour_count: number;
+  depot_min_soc_kwh: number;
+  opportunity_min_soc_kwh: number;
+  tours_needing_charge: number;
+  opportunity_charge_stops: number;
+  depot_feasible: boolean;
+  opportunity_feasible: boolean;
+  depot_min_soc_pct: number;
+  opportunity_min_soc_pct: number;
+}
+
+export interface ChargingSimulation {
+  parameters: {
+    battery_capacity_kwh: number;
+    depot_charger_kw: number;
+    opportunity_charger_kw: number;
+    min_charge_gap_minutes: number;
+  };
+  vehicles_simulated: number;
+  depot_feasible_vehicles: number;
+  opportunity_feasible_vehicles: number;
+  opportunity_only_vehicles: number;
+  tours_needing_charge: number;
+  depot_min_soc_kwh: number | null;
+  opportunity_min_soc_kwh: number | null;
+  vehicles: VehicleChargingResult[];
+}
+
+export interface LoadProfileBin {
+  time: string;
+  mean_kw: number;
+  peak_kw: number;
+  p95_kw: number;
+  max_vehicles: number;
+}
+
+export interface LoadProfile {
+  regime: "depot" | "opportunity";
+  resolution_minutes: number;
+  sessions: number;
+  energy_kwh: number;
+  peak_kw: number;
+  peak_at: string | null;
+  peak_concurrent_vehicles: number;
+  percentiles_kw: Record<string, number>;
+  time_of_day: LoadProfileBin[];
+}
+
+export interface TourQuality {
+  tours_checked: number;
+  outlier_tours: number;
+  excluded_from_tco: boolean;
+  by_reason: Record<string, number>;
+  median_duration_h: number | null;
+  median_speed_kmh: number | null;
+  median_consumption_per_100km: number | null;
+  mad_threshold: number;
+  max_average_speed_kmh: number;
+}
+
+export interface DistributionGroup {
+  count: number;
+  mean: number;
+  min: number;
+  max: number;
+  percentiles: Record<string, number>;
+  histogram: number[];
+}
+
+export interface Distribution {
+  bins: number;
+  percentiles: number[];
+  fields: Record<string, { edges: number[]; groups: Record<string, DistributionGroup> }>;
+}
+
+export interface ValidationIssue {
+  sheet: string;
+  check: string;
+  action: "quarantined" | "flagged";
+  count: number;
+  samples: Record<string, unknown>[];
+}
+
+export interface ValidationReport {
+  tours_checked: number;
+  tours_quarantined: number;
+  vehicles_checked: number;
+  vehicles_quarantined: number;
+  missing_columns: Record<string, string[]>;
+  issues: ValidationIssue[];
 }
 
 export interface AnalysisResponse {
+  analysis_id?: string | null;
   energy_limit_kwh: number;
   period_months: number;
   start_date: string;
@@ -76,7 +190,15 @@ export interface AnalysisResponse {
     top_risks: EconomyHighlight[];
   };
   daily_trend: DailyTrendPoint[];
+  trend_resolution?: "day" | "week" | "month";
   tco_parameters: Record<string, Record<string, number>>;
   insights: Record<string, string>;
+  incremental?: IncrementalSummary | null;
+  charging_simulation?: ChargingSimulation | null;
+  load_profile?: LoadProfile | null;
+  tour_quality?: TourQuality | null;
+  distribution?: Distribution | null;
+  validation?: ValidationReport | null;
+  exclude_outliers?: boolean;
   ai_summary?: AISummary | null;
 }